@@ -0,0 +1,46 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import sys
+
+from oslo_config import cfg
+from oslo_log import log
+
+from kuryr.lib.binding import helper
+from kuryr.lib import config
+
+LOG = log.getLogger(__name__)
+
+
+def main():
+    cfg.CONF.register_opts(config.core_opts)
+    cfg.CONF.register_opts(config.binding_opts, group=config.binding_group)
+    log.register_options(cfg.CONF)
+    cfg.CONF(sys.argv[1:], project='kuryr')
+    log.setup(cfg.CONF, 'kuryr-binding-helper')
+    if not cfg.CONF.binding.helper_socket:
+        LOG.error("[binding] helper_socket is not set")
+        return 1
+    server = helper.Server(cfg.CONF.binding.helper_socket, cfg.CONF.bindir,
+                           cfg.CONF.binding.helper_concurrency,
+                           cfg.CONF.binding.helper_timeout)
+    LOG.info("Serving binding requests on %s", server.path)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
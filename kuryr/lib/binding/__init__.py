@@ -9,12 +9,32 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import asyncio
+import collections
+import functools
+
 from oslo_config import cfg
 from oslo_utils import importutils
 
 from kuryr.lib import exceptions
 
 
+BindRequest = collections.namedtuple(
+    'BindRequest',
+    ['endpoint_id', 'port', 'subnets', 'network', 'vm_port',
+     'segmentation_id', 'driver', 'kwargs'],
+    defaults=(None, None, None, None, None))
+
+UnbindRequest = collections.namedtuple(
+    'UnbindRequest', ['endpoint_id', 'neutron_port', 'driver', 'kwargs'],
+    defaults=(None, None))
+
+# Outcome of one element of a batch operation. Exactly one of ``result``
+# (whatever the single port call would have returned) or ``error`` (the
+# exception raised for that port) is set.
+BindResult = collections.namedtuple('BindResult', ['result', 'error'])
+
+
 def _verify_driver(driver):
     if driver.__name__ not in cfg.CONF.binding.enabled_drivers:
         raise exceptions.DriverNotEnabledException(
@@ -73,3 +93,148 @@ def port_unbind(endpoint_id, neutron_port, driver=None, **kwargs):
     _verify_driver(driver)
 
     return driver.port_unbind(endpoint_id, neutron_port, **kwargs)
+
+
+def _group_by_driver(requests, request_cls):
+    groups = {}
+    for index, request in enumerate(requests):
+        request = request_cls(*request)
+        driver_name = request.driver or cfg.CONF.binding.default_driver
+        groups.setdefault(driver_name, []).append((index, request))
+    return groups
+
+
+def _load_driver(driver_name):
+    driver = importutils.import_module(driver_name)
+    _verify_driver(driver)
+    return driver
+
+
+def _port_bind_each(driver, requests):
+    results = []
+    for request in requests:
+        try:
+            result = driver.port_bind(
+                request.endpoint_id, request.port, request.subnets,
+                network=request.network, vm_port=request.vm_port,
+                segmentation_id=request.segmentation_id,
+                **(request.kwargs or {}))
+        except Exception as e:
+            results.append(BindResult(None, e))
+        else:
+            results.append(BindResult(result, None))
+    return results
+
+
+def _port_unbind_each(driver, requests):
+    results = []
+    for request in requests:
+        try:
+            result = driver.port_unbind(request.endpoint_id,
+                                        request.neutron_port,
+                                        **(request.kwargs or {}))
+        except Exception as e:
+            results.append(BindResult(None, e))
+        else:
+            results.append(BindResult(result, None))
+    return results
+
+
+def _run_many(requests, request_cls, batch_name, fallback):
+    results = [None] * len(requests)
+    for driver_name, group in _group_by_driver(requests,
+                                               request_cls).items():
+        try:
+            driver = _load_driver(driver_name)
+        except (ImportError, exceptions.DriverNotEnabledException) as e:
+            for index, _ in group:
+                results[index] = BindResult(None, e)
+            continue
+
+        driver_requests = [request for _, request in group]
+        batch_func = getattr(driver, batch_name, None)
+        if batch_func is None:
+            driver_results = fallback(driver, driver_requests)
+        else:
+            try:
+                driver_results = batch_func(driver_requests)
+            except Exception as e:
+                # The whole group failed, e.g. before its per port handling
+                driver_results = [BindResult(None, e)] * len(group)
+        for (index, _), result in zip(group, driver_results):
+            results[index] = result
+    return results
+
+
+def port_bind_many(requests):
+    """Binds several Neutron ports to network interfaces on the host.
+
+    The requests are grouped by binding driver so that every driver is
+    imported and verified only once. Drivers that provide a
+    ``port_bind_many`` function get their whole group at once and can batch
+    the netlink and host side work, the others are called port by port.
+
+    :param requests: an iterable of ``BindRequest`` or of tuples with the
+                     same fields, in the ``port_bind`` arguments order:
+                     (endpoint_id, port, subnets, network, vm_port,
+                     segmentation_id, driver, kwargs)
+    :returns: a list of ``BindResult`` in the same order as ``requests``.
+              ``result`` holds what ``port_bind`` would have returned for
+              that port and ``error`` the exception it would have raised.
+              A failing port does not prevent the other ones from being
+              bound.
+    """
+    return _run_many(list(requests), BindRequest, 'port_bind_many',
+                     _port_bind_each)
+
+
+def port_unbind_many(requests):
+    """Unbinds several Neutron ports from network interfaces on the host.
+
+    :param requests: an iterable of ``UnbindRequest`` or of tuples with the
+                     same fields: (endpoint_id, neutron_port, driver, kwargs)
+    :returns: a list of ``BindResult`` in the same order as ``requests``,
+              see ``port_bind_many``
+    """
+    return _run_many(list(requests), UnbindRequest, 'port_unbind_many',
+                     _port_unbind_each)
+
+
+async def async_port_bind(endpoint_id, port, subnets, network=None,
+                          vm_port=None, segmentation_id=None, driver=None,
+                          **kwargs):
+    """Coroutine version of ``port_bind``.
+
+    Drivers providing an ``async_port_bind`` coroutine are awaited directly,
+    the others are run in the default executor of the running event loop.
+    See ``port_bind`` for the parameters, returned values and exceptions.
+    """
+    driver = _load_driver(driver or cfg.CONF.binding.default_driver)
+
+    async_bind = getattr(driver, 'async_port_bind', None)
+    if async_bind is not None:
+        return await async_bind(endpoint_id, port, subnets, network=network,
+                                vm_port=vm_port,
+                                segmentation_id=segmentation_id, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(
+        driver.port_bind, endpoint_id, port, subnets, network=network,
+        vm_port=vm_port, segmentation_id=segmentation_id, **kwargs))
+
+
+async def async_port_unbind(endpoint_id, neutron_port, driver=None,
+                            **kwargs):
+    """Coroutine version of ``port_unbind``.
+
+    See ``async_port_bind`` and ``port_unbind``.
+    """
+    driver = _load_driver(driver or cfg.CONF.binding.default_driver)
+
+    async_unbind = getattr(driver, 'async_port_unbind', None)
+    if async_unbind is not None:
+        return await async_unbind(endpoint_id, neutron_port, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(
+        driver.port_unbind, endpoint_id, neutron_port, **kwargs))
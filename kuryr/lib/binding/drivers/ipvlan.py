@@ -14,6 +14,7 @@ from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
 
 from kuryr.lib.binding.drivers import nested
 from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding import netlink
 
 KIND = 'ipvlan'
 # We use L2 to allow broadcast frames
@@ -35,25 +36,25 @@ def port_bind(endpoint_id, port, subnets, network=None, vm_port=None,
                          python-neutronclient. Container is running inside
                          this instance (either ipvlan/macvlan or a subport)
     :param segmentation_id: ID of the segment for container traffic isolation)
-    :param kwargs:       Additional driver-specific arguments
+    :param kwargs:       Additional driver-specific arguments. ``netns``, the
+                         path, name or file descriptor of the container
+                         network namespace, makes the device be created and
+                         configured directly in it.
     :returns: the tuple of the names of the veth pair and the tuple of stdout
               and stderr returned by processutils.execute invoked with the
               executable script for binding
     :raises: kuryr.common.exceptions.VethCreationFailure,
              processutils.ProcessExecutionError
     """
-    ip = utils.get_ipdb()
     port_id = port['id']
     _, devname = utils.get_veth_pair_names(port_id)
     link_iface = nested.get_link_iface(vm_port)
     mtu = utils.get_mtu_from_network(network)
 
-    with ip.create(ifname=devname, kind=KIND,
-                   link=ip.interfaces[link_iface],
-                   mode=IPVLAN_MODE_L2) as container_iface:
-        utils._configure_container_iface(
-            container_iface, subnets,
-            fixed_ips=port.get(utils.FIXED_IP_KEY), mtu=mtu)
+    netlink.get_backend().create_link(
+        devname, KIND, link_iface, subnets,
+        fixed_ips=port.get(utils.FIXED_IP_KEY), mtu=mtu,
+        mode=IPVLAN_MODE_L2, netns=kwargs.get('netns'))
 
     return None, devname, ('', None)
 
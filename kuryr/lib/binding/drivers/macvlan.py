@@ -12,6 +12,7 @@
 """For now it only supports container-in-vm deployments"""
 from kuryr.lib.binding.drivers import nested
 from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding import netlink
 
 KIND = 'macvlan'
 # We use the bridge mode for simplicity and proximity to the usual
@@ -34,26 +35,26 @@ def port_bind(endpoint_id, port, subnets, network=None, vm_port=None,
                          python-neutronclient. Container is running inside
                          instance.
     :param segmentation_id: ID of the segment for container traffic isolation)
-    :param kwargs:       Additional driver-specific arguments
+    :param kwargs:       Additional driver-specific arguments. ``netns``, the
+                         path, name or file descriptor of the container
+                         network namespace, makes the device be created and
+                         configured directly in it.
     :returns: the tuple of the names of the veth pair and the tuple of stdout
               and stderr returned by processutils.execute invoked with the
               executable script for binding
     :raises: kuryr.common.exceptions.VethCreationFailure,
              processutils.ProcessExecutionError
     """
-    ip = utils.get_ipdb()
     port_id = port['id']
     _, devname = utils.get_veth_pair_names(port_id)
     link_iface = nested.get_link_iface(vm_port)
     mtu = utils.get_mtu_from_network(network)
 
-    with ip.create(ifname=devname, kind=KIND,
-                   link=ip.interfaces[link_iface],
-                   macvlan_mode=MACVLAN_MODE_BRIDGE) as container_iface:
-        utils._configure_container_iface(
-            container_iface, subnets,
-            fixed_ips=port.get(utils.FIXED_IP_KEY),
-            mtu=mtu, hwaddr=port[utils.MAC_ADDRESS_KEY].lower())
+    netlink.get_backend().create_link(
+        devname, KIND, link_iface, subnets,
+        fixed_ips=port.get(utils.FIXED_IP_KEY),
+        mtu=mtu, hwaddr=port[utils.MAC_ADDRESS_KEY].lower(),
+        macvlan_mode=MACVLAN_MODE_BRIDGE, netns=kwargs.get('netns'))
 
     return None, devname, ('', None)
 
@@ -15,6 +15,7 @@ import pyroute2
 from oslo_config import cfg
 
 from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding import netlink
 from kuryr.lib import exceptions
 
 
@@ -23,11 +24,8 @@ def get_link_iface(port):
     link = cfg.CONF.binding.link_iface
     if not link:
         # Guess the name from the port hwaddr
-        ip = utils.get_ipdb()
-        for name, data in ip.interfaces.items():
-            if data['address'] == port[utils.MAC_ADDRESS_KEY]:
-                link = data['ifname']
-                break
+        link = netlink.get_backend().get_ifname_by_address(
+            port[utils.MAC_ADDRESS_KEY])
     return link
 
 
@@ -36,7 +34,8 @@ def port_unbind(endpoint_id, neutron_port, **kwargs):
 
     :param endpoint_id: the ID of the Docker container as string
     :param neutron_port: a port dictionary returned from python-neutronclient
-    :param kwargs:       Additional driver-specific arguments
+    :param kwargs:       Additional driver-specific arguments. ``netns`` is
+                         the network namespace the device was created in.
     :returns: the tuple of stdout and stderr returned by processutils.execute
               invoked with the executable script for unbinding
     :raises: processutils.ProcessExecutionError, pyroute2.NetlinkError
@@ -45,7 +44,7 @@ def port_unbind(endpoint_id, neutron_port, **kwargs):
     _, devname = utils.get_veth_pair_names(port_id)
 
     try:
-        utils.remove_device(devname)
+        utils.remove_device(devname, netns=kwargs.get('netns'))
     except pyroute2.NetlinkError:
         raise exceptions.VethDeletionFailure(
             'Failed to delete the container device.')
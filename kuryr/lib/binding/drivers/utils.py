@@ -9,10 +9,16 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import asyncio
+import collections
+import functools
 import ipaddress
 
+from oslo_concurrency import processutils
 import pyroute2
 
+from kuryr.lib.binding import helper
+from kuryr.lib.binding import netlink
 from kuryr.lib import constants
 
 
@@ -23,6 +29,12 @@ IP_ADDRESS_KEY = 'ip_address'
 MAC_ADDRESS_KEY = 'mac_address'
 SUBNET_ID_KEY = 'subnet_id'
 
+# Number of the parsed subnets get_subnet_info keeps
+SUBNET_CACHE_SIZE = 1024
+
+SubnetInfo = collections.namedtuple(
+    'SubnetInfo', ['network', 'prefixlen', 'version', 'gateway'])
+
 
 def get_veth_pair_names(port_id):
     ifname = constants.VETH_PREFIX + port_id
@@ -61,27 +73,61 @@ def get_mtu_from_network(network=None):
     return mtu
 
 
-def remove_device(ifname):
+def remove_device(ifname, netns=None):
     """Removes the device with name ifname.
 
     :param ifname: the name of the device to remove
+    :param netns:  the network namespace the device is in, the default one
+                   if None
     :returns: the index the device identified by ifname had if it
               exists, otherwise None
     :raises: pyroute2.NetlinkError
     """
-    ip = get_ipdb()
+    return netlink.get_backend().remove_device(ifname, netns=netns)
 
-    dev_index = ip.interfaces.get(ifname, {}).get('index', None)
 
-    if dev_index:
-        with ip.interfaces[ifname] as iface:
-            iface.remove()
+def is_up(interface):
+    return interface.get('state', '') == 'up'
 
-    return dev_index
 
+@functools.lru_cache(maxsize=SUBNET_CACHE_SIZE)
+def _parse_subnet(subnet_id, revision_number, cidr, gateway_ip):
+    network = ipaddress.ip_network(cidr)
+    gateway = ipaddress.ip_address(gateway_ip) if gateway_ip else None
+    return SubnetInfo(network, network.prefixlen, network.version, gateway)
 
-def is_up(interface):
-    return interface.get('state', '') == 'up'
+
+def get_subnet_info(subnet):
+    """Returns the parsed CIDR and gateway of a Neutron subnet
+
+    The parsed subnets are cached by their ID and revision number, along
+    with their CIDR and gateway for the subnets without revision number.
+
+    :param subnet: the Neutron subnet dict
+    :returns: a SubnetInfo with the ipaddress network of the CIDR, its prefix
+              length and IP version, and the ipaddress address of the
+              gateway or None
+    """
+    return _parse_subnet(subnet['id'], subnet.get('revision_number'),
+                         str(subnet['cidr']), subnet.get('gateway_ip'))
+
+
+def get_ip_prefixes(subnets, fixed_ips):
+    """Yields the addresses of the fixed IPs with their prefix length
+
+    :param subnets:   an iterable of all the Neutron subnets which the
+                      endpoint is trying to join
+    :param fixed_ips: an iterable of fixed IPs of a Neutron port
+    :returns: a generator of (ip_address, prefixlen) tuples
+    """
+    subnets_dict = {subnet['id']: subnet for subnet in subnets}
+    # We assume containers always work with fixed ips, dhcp does not really
+    # make a lot of sense
+    for fixed_ip in fixed_ips:
+        if IP_ADDRESS_KEY in fixed_ip and (SUBNET_ID_KEY in fixed_ip):
+            subnet_id = fixed_ip[SUBNET_ID_KEY]
+            subnet_info = get_subnet_info(subnets_dict[subnet_id])
+            yield fixed_ip[IP_ADDRESS_KEY], subnet_info.prefixlen
 
 
 def _configure_container_iface(iface, subnets, fixed_ips, mtu=None,
@@ -95,18 +141,57 @@ def _configure_container_iface(iface, subnets, fixed_ips, mtu=None,
     :param mtu:         Maximum Transfer Unit to set for the iface
     :param hwaddr:      Hardware address to set for the iface
     """
-    subnets_dict = {subnet['id']: subnet for subnet in subnets}
-    # We assume containers always work with fixed ips, dhcp does not really
-    # make a lot of sense
-    for fixed_ip in fixed_ips:
-        if IP_ADDRESS_KEY in fixed_ip and (SUBNET_ID_KEY in fixed_ip):
-            subnet_id = fixed_ip[SUBNET_ID_KEY]
-            subnet = subnets_dict[subnet_id]
-            cidr = ipaddress.ip_network(str(subnet['cidr']))
-            iface.add_ip(fixed_ip[IP_ADDRESS_KEY], cidr.prefixlen)
+    for address, prefixlen in get_ip_prefixes(subnets, fixed_ips):
+        iface.add_ip(address, prefixlen)
     if mtu is not None:
         iface.set_mtu(mtu)
     if hwaddr is not None:
         iface.set_address(hwaddr)
     if not is_up(iface):
         iface.up()
+
+
+def execute(*cmd, check_exit_code=(0,)):
+    """Runs a binding executable
+
+    It runs in the binding helper when ``[binding] helper_socket`` is set,
+    see ``kuryr.lib.binding.helper``, and is forked otherwise.
+
+    :param cmd:             the command and its arguments
+    :param check_exit_code: the exit codes that are considered successful
+    :returns: the tuple of stdout and stderr of the command
+    :raises: processutils.ProcessExecutionError
+    """
+    client = helper.get_client()
+    if client is not None:
+        return client.execute(*cmd, check_exit_code=check_exit_code)
+    return processutils.execute(*cmd, check_exit_code=check_exit_code)
+
+
+async def async_execute(*cmd, check_exit_code=(0,)):
+    """Runs a command as an asyncio subprocess.
+
+    This is the coroutine counterpart of ``execute`` for the binding
+    executables, it does not block the running event loop while the command
+    runs.
+
+    :param cmd:             the command and its arguments
+    :param check_exit_code: the exit codes that are considered successful
+    :returns: the tuple of stdout and stderr of the command
+    :raises: processutils.ProcessExecutionError
+    """
+    client = helper.get_client()
+    if client is not None:
+        return await client.async_execute(*cmd,
+                                          check_exit_code=check_exit_code)
+    cmd = [str(arg) for arg in cmd]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    stdout = stdout.decode('utf-8', 'replace')
+    stderr = stderr.decode('utf-8', 'replace')
+    if proc.returncode not in check_exit_code:
+        raise processutils.ProcessExecutionError(
+            exit_code=proc.returncode, stdout=stdout, stderr=stderr,
+            cmd=' '.join(cmd))
+    return stdout, stderr
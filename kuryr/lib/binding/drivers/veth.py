@@ -9,16 +9,23 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import asyncio
+import functools
+import hashlib
+import json
 import os
 
 import pyroute2
 
-from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import excutils
 
+from kuryr.lib import binding
 from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding import host
+from kuryr.lib.binding import netlink
+from kuryr.lib.binding import veth_pool
 from kuryr.lib import constants
 from kuryr.lib import exceptions
 from kuryr.lib import utils as lib_utils
@@ -27,6 +34,10 @@ from kuryr.lib import utils as lib_utils
 KIND = 'veth'
 LOG = log.getLogger(__name__)
 
+_SCRIPTS = {}
+# Prefix of the binding fingerprints recorded in the host device aliases
+FINGERPRINT_PREFIX = 'kuryr:'
+
 
 def port_bind(endpoint_id, port, subnets, network=None, vm_port=None,
               segmentation_id=None, **kwargs):
@@ -44,50 +55,106 @@ def port_bind(endpoint_id, port, subnets, network=None, vm_port=None,
                          running inside this instance (either ipvlan/macvlan or
                          a subport)
     :param segmentation_id: ID of the segment for container traffic isolation)
-    :param kwargs:       Additional driver-specific arguments
+    :param kwargs:       Additional driver-specific arguments. ``netns``, the
+                         path, name or file descriptor of the container
+                         network namespace, makes the container end be
+                         created and configured directly in it.
     :returns: the tuple of the names of the veth pair and the tuple of stdout
               and stderr returned by processutils.execute invoked with the
               executable script for binding
     :raises: kuryr.common.exceptions.VethCreationFailure,
              processutils.ProcessExecutionError
     """
-    ip = utils.get_ipdb()
-    port_id = port['id']
-    host_ifname, container_ifname = utils.get_veth_pair_names(port_id)
-    mtu = utils.get_mtu_from_network(network)
+    fingerprint = _get_fingerprint(endpoint_id, port, subnets, network,
+                                   kwargs.get('netns'))
+    if _is_bound(port, fingerprint):
+        return utils.get_veth_pair_names(port['id']) + (('', ''),)
+    host_ifname, container_ifname = _create_veth_pair(
+        port, subnets, network, netns=kwargs.get('netns'))
+    stdout, stderr = _bind_host_iface(endpoint_id, port, host_ifname)
+    _record_binding(host_ifname, fingerprint)
+    return host_ifname, container_ifname, (stdout, stderr)
 
-    try:
-        with ip.create(ifname=host_ifname, kind=KIND,
-                       reuse=True, peer=container_ifname) as host_veth:
-            if not utils.is_up(host_veth):
-                host_veth.up()
-        with ip.interfaces[container_ifname] as container_veth:
-            utils._configure_container_iface(
-                container_veth, subnets,
-                fixed_ips=port.get(utils.FIXED_IP_KEY),
-                mtu=mtu, hwaddr=port[utils.MAC_ADDRESS_KEY].lower())
-    except pyroute2.CreateException:
-        LOG.exception("Error happened during virtual device creation")
-        raise exceptions.VethCreationFailure(
-            'Virtual device creation failed.')
-    except pyroute2.CommitException:
-        LOG.exception("Error happened during configuring the container "
-                      "virtual device networking")
-        raise exceptions.VethCreationFailure(
-            'Could not configure the container virtual device networking.')
 
-    try:
-        stdout, stderr = _configure_host_iface(
-            host_ifname, endpoint_id, port_id,
-            port['network_id'], port.get('project_id') or port['tenant_id'],
-            port[utils.MAC_ADDRESS_KEY],
-            kind=port.get(constants.VIF_TYPE_KEY),
-            details=port.get(constants.VIF_DETAILS_KEY))
-    except Exception:
-        with excutils.save_and_reraise_exception():
-            utils.remove_device(host_ifname)
+def port_bind_many(requests):
+    """Binds several Neutron ports to network interfaces on the host.
 
-    return host_ifname, container_ifname, (stdout, stderr)
+    All the veth pairs are created and configured in a first netlink pass,
+    then the host side binding is run for the ports whose pair could be set
+    up. An error on a port is reported in its result and does not prevent
+    the binding of the others.
+
+    :param requests: a list of ``kuryr.lib.binding.BindRequest``
+    :returns: a list of ``kuryr.lib.binding.BindResult`` in the same order
+              as ``requests``, see ``port_bind`` for the returned values
+    """
+    results = [None] * len(requests)
+    created = []
+    fingerprints = {}
+    for index, request in enumerate(requests):
+        fingerprint = _get_fingerprint(
+            request.endpoint_id, request.port, request.subnets,
+            request.network, (request.kwargs or {}).get('netns'))
+        if _is_bound(request.port, fingerprint):
+            results[index] = binding.BindResult(
+                utils.get_veth_pair_names(request.port['id']) + (('', ''),),
+                None)
+            continue
+        fingerprints[index] = fingerprint
+        try:
+            ifnames = _create_veth_pair(
+                request.port, request.subnets, request.network,
+                netns=(request.kwargs or {}).get('netns'))
+        except Exception as e:
+            results[index] = binding.BindResult(None, e)
+        else:
+            created.append((index, request, ifnames))
+
+    created = _bind_plugins_many(created, results)
+    for index, request, (host_ifname, container_ifname) in created:
+        try:
+            stdout, stderr = _bind_host_iface(request.endpoint_id,
+                                              request.port, host_ifname)
+        except Exception as e:
+            results[index] = binding.BindResult(None, e)
+        else:
+            results[index] = binding.BindResult(
+                (host_ifname, container_ifname, (stdout, stderr)), None)
+    for index, fingerprint in fingerprints.items():
+        if results[index].error is None:
+            _record_binding(results[index].result[0], fingerprint)
+    return results
+
+
+def _bind_plugins_many(created, results):
+    """Binds the ports of a batch with the plugins that can bind many at once
+
+    :returns: the created pairs that are left to bind one by one, which
+              includes the ones of a plugin whose batch binding failed so
+              that the errors are reported per port
+    """
+    batches = {}
+    for item in created:
+        plugin = _get_port_plugin(item[1].port)
+        if getattr(plugin, 'bind_many', None) is not None:
+            batches.setdefault(plugin, []).append(item)
+    bound = set()
+    for plugin, items in batches.items():
+        try:
+            plugin.bind_many([(host_ifname, request.endpoint_id,
+                               request.port['id'],
+                               request.port[utils.MAC_ADDRESS_KEY])
+                              for _, request, (host_ifname, _) in items])
+        except Exception:
+            LOG.warning("Binding %d %s ports at once failed, binding them "
+                        "one by one", len(items),
+                        items[0][1].port.get(constants.VIF_TYPE_KEY))
+            continue
+        for index, request, (host_ifname, container_ifname) in items:
+            results[index] = binding.BindResult(
+                (host_ifname, container_ifname, ('', '')), None)
+            bound.add(index)
+    return [item for item in created if item[0] not in bound]
 
 
 def port_unbind(endpoint_id, neutron_port, **kwargs):
@@ -101,6 +168,44 @@ def port_unbind(endpoint_id, neutron_port, **kwargs):
     :raises: processutils.ProcessExecutionError, pyroute2.NetlinkError
     """
 
+    stdout, stderr = _unbind_host_iface(endpoint_id, neutron_port)
+    _remove_veth_pair(neutron_port['id'])
+    return (stdout, stderr)
+
+
+def port_unbind_many(requests):
+    """Unbinds several Neutron ports from network interfaces on the host.
+
+    The host side unbinding is run for all the ports first and the veth
+    pairs of the ports that were successfully unbound are removed afterwards.
+
+    :param requests: a list of ``kuryr.lib.binding.UnbindRequest``
+    :returns: a list of ``kuryr.lib.binding.BindResult`` in the same order
+              as ``requests``, see ``port_unbind`` for the returned values
+    """
+    results = [None] * len(requests)
+    unbound = []
+    for index, request in enumerate(requests):
+        try:
+            output = _unbind_host_iface(request.endpoint_id,
+                                        request.neutron_port)
+        except Exception as e:
+            results[index] = binding.BindResult(None, e)
+        else:
+            unbound.append((index, request, output))
+
+    for index, request, output in unbound:
+        try:
+            _remove_veth_pair(request.neutron_port['id'])
+        except Exception as e:
+            results[index] = binding.BindResult(None, e)
+        else:
+            results[index] = binding.BindResult(output, None)
+    return results
+
+
+def _get_unbinding_cmd(endpoint_id, neutron_port):
+    """Returns the command line of the executable script for unbinding"""
     vif_type = neutron_port.get(constants.VIF_TYPE_KEY,
                                 constants.FALLBACK_VIF_TYPE)
     vif_details = lib_utils.string_mappings(neutron_port.get(
@@ -112,18 +217,240 @@ def port_unbind(endpoint_id, neutron_port, **kwargs):
 
     mac_address = neutron_port['mac_address']
     network_id = neutron_port['network_id']
-    stdout, stderr = processutils.execute(
-        unbinding_exec_path, constants.UNBINDING_SUBCOMMAND, port_id, ifname,
-        endpoint_id, mac_address, vif_details, network_id)
+    return [unbinding_exec_path, constants.UNBINDING_SUBCOMMAND, port_id,
+            ifname, endpoint_id, mac_address, vif_details, network_id]
+
+
+def _get_port_plugin(port):
+    return host.get_plugin(port.get(constants.VIF_TYPE_KEY),
+                           port.get(constants.VIF_DETAILS_KEY))
+
+
+def _unbind_host_iface(endpoint_id, neutron_port):
+    """Unbinds the host side device, with the executable script if needed"""
+    plugin = _get_port_plugin(neutron_port)
+    if plugin is not None:
+        ifname, _ = utils.get_veth_pair_names(neutron_port['id'])
+        return plugin.unbind(ifname, endpoint_id, neutron_port['id'],
+                             neutron_port['mac_address'],
+                             details=neutron_port.get(
+                                 constants.VIF_DETAILS_KEY),
+                             net_id=neutron_port['network_id'])
+    return utils.execute(*_get_unbinding_cmd(endpoint_id, neutron_port))
+
+
+def _remove_veth_pair(port_id):
+    ifname, _ = utils.get_veth_pair_names(port_id)
     try:
         utils.remove_device(ifname)
     except pyroute2.NetlinkError:
         LOG.exception("Error happened during deleting the veth pair")
         raise exceptions.VethDeletionFailure(
             'Deleting the veth pair failed.')
+
+
+async def async_port_bind(endpoint_id, port, subnets, network=None,
+                          vm_port=None, segmentation_id=None, **kwargs):
+    """Coroutine version of ``port_bind``.
+
+    The veth pair is set up in the default executor and the executable
+    script for binding is run as an asyncio subprocess, so the event loop is
+    never blocked. See ``port_bind`` for the parameters and returned values.
+    """
+    loop = asyncio.get_running_loop()
+    fingerprint = _get_fingerprint(endpoint_id, port, subnets, network,
+                                   kwargs.get('netns'))
+    if await loop.run_in_executor(None, _is_bound, port, fingerprint):
+        return utils.get_veth_pair_names(port['id']) + (('', ''),)
+    host_ifname, container_ifname = await loop.run_in_executor(
+        None, functools.partial(_create_veth_pair, port, subnets, network,
+                                netns=kwargs.get('netns')))
+    stdout, stderr = await _async_bind_host_iface(endpoint_id, port,
+                                                  host_ifname)
+    await loop.run_in_executor(None, _record_binding, host_ifname,
+                               fingerprint)
+    return host_ifname, container_ifname, (stdout, stderr)
+
+
+async def async_port_unbind(endpoint_id, neutron_port, **kwargs):
+    """Coroutine version of ``port_unbind``.
+
+    See ``port_unbind`` for the parameters and returned values.
+    """
+    loop = asyncio.get_running_loop()
+    if _get_port_plugin(neutron_port) is not None:
+        stdout, stderr = await loop.run_in_executor(
+            None, _unbind_host_iface, endpoint_id, neutron_port)
+    else:
+        stdout, stderr = await utils.async_execute(
+            *_get_unbinding_cmd(endpoint_id, neutron_port))
+    await loop.run_in_executor(None, _remove_veth_pair, neutron_port['id'])
     return (stdout, stderr)
 
 
+def _get_fingerprint(endpoint_id, port, subnets, network=None, netns=None):
+    """Returns the fingerprint of the binding of a port
+
+    It covers everything the binding of the port depends on, so that a
+    device with the fingerprint of a binding request is known to be bound
+    as requested.
+    """
+    state = [
+        endpoint_id,
+        port['id'],
+        port.get('network_id'),
+        port.get('project_id') or port.get('tenant_id'),
+        port[utils.MAC_ADDRESS_KEY].lower(),
+        sorted((ip.get(utils.SUBNET_ID_KEY), ip.get(utils.IP_ADDRESS_KEY))
+               for ip in port.get(utils.FIXED_IP_KEY) or []),
+        sorted((subnet['id'], str(subnet['cidr'])) for subnet in subnets),
+        utils.get_mtu_from_network(network),
+        port.get(constants.VIF_TYPE_KEY),
+        port.get(constants.VIF_DETAILS_KEY),
+        # File descriptors do not identify a namespace across calls
+        netns if isinstance(netns, str) else None,
+    ]
+    digest = hashlib.sha256(
+        json.dumps(state, sort_keys=True, default=str).encode('utf-8'))
+    return FINGERPRINT_PREFIX + digest.hexdigest()[:32]
+
+
+def _is_bound(port, fingerprint):
+    """Tells whether the host device of a port is bound as requested
+
+    The device must have the fingerprint of the request and still be
+    enslaved, the host binding may have been undone outside kuryr.
+    """
+    if not cfg.CONF.binding.rebind_fast_path:
+        return False
+    host_ifname, _ = utils.get_veth_pair_names(port['id'])
+    backend = netlink.get_backend()
+    try:
+        if backend.get_alias(host_ifname) != fingerprint:
+            return False
+        return backend.get_master(host_ifname) is not None
+    except pyroute2.NetlinkError:
+        return False
+
+
+def _record_binding(host_ifname, fingerprint):
+    """Records the fingerprint of a binding in its host device alias"""
+    if not cfg.CONF.binding.rebind_fast_path:
+        return
+    try:
+        netlink.get_backend().set_alias(host_ifname, fingerprint)
+    except (pyroute2.NetlinkError, pyroute2.CommitException) as e:
+        # The port is bound, it is only not rebound for free
+        LOG.warning("Could not record the binding of %(ifname)s: "
+                    "%(error)s", {'ifname': host_ifname, 'error': e})
+
+
+def _create_veth_pair(port, subnets, network=None, netns=None):
+    """Creates the veth pair of the port and configures its container end
+
+    :param port:     the container Neutron port dictionary
+    :param subnets:  an iterable of all the Neutron subnets which the
+                     endpoint is trying to join
+    :param network:  the Neutron network which the endpoint is trying to join
+    :param netns:    the network namespace to create the container end in
+    :returns: the tuple of the names of the host and container devices
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    host_ifname, container_ifname = utils.get_veth_pair_names(port['id'])
+    mtu = utils.get_mtu_from_network(network)
+
+    try:
+        if netns is None:
+            # A parked pair renamed by the pool is reused as an existing
+            # pair by the backend. Pairs created in another namespace do
+            # not come from the pool.
+            pool = veth_pool.get_pool()
+            if pool is not None:
+                pool.take(host_ifname, container_ifname)
+        netlink.get_backend().create_veth_pair(
+            host_ifname, container_ifname, subnets,
+            fixed_ips=port.get(utils.FIXED_IP_KEY),
+            mtu=mtu, hwaddr=port[utils.MAC_ADDRESS_KEY].lower(), netns=netns)
+    except (pyroute2.CreateException, pyroute2.NetlinkError):
+        LOG.exception("Error happened during virtual device creation")
+        raise exceptions.VethCreationFailure(
+            'Virtual device creation failed.')
+    except pyroute2.CommitException:
+        LOG.exception("Error happened during configuring the container "
+                      "virtual device networking")
+        raise exceptions.VethCreationFailure(
+            'Could not configure the container virtual device networking.')
+    return host_ifname, container_ifname
+
+
+def _host_iface_args(endpoint_id, port, host_ifname):
+    return dict(ifname=host_ifname, endpoint_id=endpoint_id,
+                port_id=port['id'], net_id=port['network_id'],
+                project_id=port.get('project_id') or port['tenant_id'],
+                hwaddr=port[utils.MAC_ADDRESS_KEY],
+                kind=port.get(constants.VIF_TYPE_KEY),
+                details=port.get(constants.VIF_DETAILS_KEY))
+
+
+def _bind_host_iface(endpoint_id, port, host_ifname):
+    """Runs the host side binding, removing the veth pair if it fails"""
+    try:
+        return _configure_host_iface(
+            **_host_iface_args(endpoint_id, port, host_ifname))
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            utils.remove_device(host_ifname)
+
+
+async def _async_bind_host_iface(endpoint_id, port, host_ifname):
+    """Coroutine version of ``_bind_host_iface``"""
+    try:
+        if _get_port_plugin(port) is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(
+                _configure_host_iface,
+                **_host_iface_args(endpoint_id, port, host_ifname)))
+        return await utils.async_execute(
+            *_get_binding_cmd(**_host_iface_args(endpoint_id, port,
+                                                 host_ifname)))
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, utils.remove_device,
+                                       host_ifname)
+
+
+def _get_binding_exec_path(kind):
+    """Returns the path of the binding script of vif_type kind
+
+    The scripts found are remembered so that they are only looked up once.
+    """
+    key = (cfg.CONF.bindir, kind)
+    binding_exec_path = _SCRIPTS.get(key)
+    if binding_exec_path is None:
+        binding_exec_path = os.path.join(*key)
+        if not os.path.exists(binding_exec_path):
+            raise exceptions.BindingNotSupportedFailure(
+                "vif_type({0}) is not supported. A binding script for this "
+                "type can't be found".format(kind))
+        _SCRIPTS[key] = binding_exec_path
+    return binding_exec_path
+
+
+def _get_binding_cmd(ifname, endpoint_id, port_id, net_id, project_id,
+                     hwaddr, kind=None, details=None):
+    """Returns the command line of the executable script for binding
+
+    See ``_configure_host_iface`` for the parameters.
+    """
+    if kind is None:
+        kind = constants.FALLBACK_VIF_TYPE
+    binding_exec_path = _get_binding_exec_path(kind)
+    return [binding_exec_path, constants.BINDING_SUBCOMMAND, port_id, ifname,
+            endpoint_id, hwaddr, net_id, project_id,
+            lib_utils.string_mappings(details)]
+
+
 def _configure_host_iface(ifname, endpoint_id, port_id, net_id, project_id,
                           hwaddr, kind=None, details=None):
     """Configures the interface that is placed on the default net ns
@@ -138,15 +465,11 @@ def _configure_host_iface(ifname, endpoint_id, port_id, net_id, project_id,
     :param kind:        the Neutron port vif_type
     :param details:     Neutron vif details
     """
-    if kind is None:
-        kind = constants.FALLBACK_VIF_TYPE
-    binding_exec_path = os.path.join(cfg.CONF.bindir, kind)
-    if not os.path.exists(binding_exec_path):
-        raise exceptions.BindingNotSupportedFailure(
-            "vif_type({0}) is not supported. A binding script for this type "
-            "can't be found".format(kind))
-    stdout, stderr = processutils.execute(
-        binding_exec_path, constants.BINDING_SUBCOMMAND, port_id, ifname,
-        endpoint_id, hwaddr, net_id, project_id,
-        lib_utils.string_mappings(details))
+    plugin = host.get_plugin(kind, details)
+    if plugin is not None:
+        return plugin.bind(ifname, endpoint_id, port_id, net_id, project_id,
+                           hwaddr, details=details)
+    stdout, stderr = utils.execute(
+        *_get_binding_cmd(ifname, endpoint_id, port_id, net_id, project_id,
+                          hwaddr, kind=kind, details=details))
     return stdout, stderr
@@ -0,0 +1,325 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Binding helper running the binding executables on behalf of kuryr
+
+The helper is a long lived process, see ``kuryr-binding-helper``, listening
+on a unix socket. Each frame on the socket is a 4 bytes big endian length
+followed by a JSON object. A request is::
+
+    {"id": <int>, "cmd": [<executable>, <arg>, ...], "timeout": <seconds>}
+
+and its response::
+
+    {"id": <int>, "exit_code": <int>, "stdout": <str>, "stderr": <str>}
+
+Requests are pipelined: a client can send several requests without waiting
+and the responses come back as the commands complete, in any order. Only the
+executables of ``bindir`` are run.
+"""
+import asyncio
+from concurrent import futures
+import itertools
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_log import log
+
+from kuryr.lib._i18n import _
+from kuryr.lib import exceptions
+
+LOG = log.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Exit code reported for the commands killed when their timeout expires
+TIMEOUT_EXIT_CODE = -signal.SIGKILL
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+class HelperError(exceptions.BindingFailure):
+    """The binding helper could not be reached or broke the protocol"""
+
+
+def encode_frame(msg):
+    data = json.dumps(msg).encode('utf-8')
+    return _HEADER.pack(len(data)) + data
+
+
+def decode_frames(buf):
+    """Splits the complete frames off a buffer
+
+    :returns: the tuple of the decoded messages and the remaining bytes
+    """
+    msgs = []
+    while len(buf) >= _HEADER.size:
+        size, = _HEADER.unpack_from(buf)
+        if size > MAX_FRAME_SIZE:
+            raise HelperError(_('Binding helper frame too large: %d') % size)
+        if len(buf) < _HEADER.size + size:
+            break
+        msgs.append(json.loads(buf[_HEADER.size:_HEADER.size + size]))
+        buf = buf[_HEADER.size + size:]
+    return msgs, buf
+
+
+class Server(object):
+    """Serves the binding requests of the clients of a unix socket
+
+    :param path:        the path of the unix socket to listen on
+    :param bindir:      the directory of the executables that can be run
+    :param concurrency: the maximum number of commands running at once
+    :param timeout:     the default timeout of the commands in seconds
+    """
+
+    def __init__(self, path, bindir, concurrency, timeout):
+        self.path = path
+        self.bindir = os.path.realpath(bindir)
+        self.timeout = timeout
+        self._concurrency = concurrency
+        self._semaphore = None
+        self._server = None
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve,
+                                                       path=self.path)
+        os.chmod(self.path, 0o600)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def _serve(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                size, = _HEADER.unpack(header)
+                if size > MAX_FRAME_SIZE:
+                    LOG.error("Dropping a binding helper client sending a "
+                              "%d bytes frame", size)
+                    break
+                request = json.loads(await reader.readexactly(size))
+                task = asyncio.ensure_future(
+                    self._handle(request, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    def _check_cmd(self, cmd):
+        if not cmd:
+            return False
+        executable = os.path.realpath(cmd[0])
+        return os.path.dirname(executable) == self.bindir
+
+    async def _handle(self, request, writer, write_lock):
+        cmd = [str(arg) for arg in request.get('cmd') or []]
+        response = {'id': request.get('id')}
+        if not self._check_cmd(cmd):
+            response.update(exit_code=126, stdout='',
+                            stderr='%s is not a binding executable' %
+                            (cmd[0] if cmd else None))
+        else:
+            async with self._semaphore:
+                response.update(await self._run(
+                    cmd, request.get('timeout') or self.timeout))
+        async with write_lock:
+            writer.write(encode_frame(response))
+            await writer.drain()
+
+    async def _run(self, cmd, timeout):
+        # The command gets its own process group so that the processes it
+        # forks are killed with it on timeout
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, start_new_session=True)
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(),
+                                                    timeout)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            LOG.warning("%s timed out after %s seconds", cmd, timeout)
+            return {'exit_code': TIMEOUT_EXIT_CODE, 'stdout': '',
+                    'stderr': 'Timed out after %s seconds' % timeout}
+        return {'exit_code': proc.returncode,
+                'stdout': stdout.decode('utf-8', 'replace'),
+                'stderr': stderr.decode('utf-8', 'replace')}
+
+
+class Client(object):
+    """A pipelining client of the binding helper
+
+    A single connection is shared by all the threads and coroutines of the
+    process, each request is matched to its response by its ID.
+
+    :param path:    the path of the unix socket of the helper
+    :param timeout: the timeout of the commands in seconds
+    """
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(self.path)
+                except OSError as e:
+                    sock.close()
+                    raise HelperError(
+                        _('Could not connect to the binding helper at '
+                          '%(path)s: %(err)s') % {'path': self.path,
+                                                  'err': e})
+                self._sock = sock
+                threading.Thread(target=self._read_loop, args=(sock,),
+                                 daemon=True).start()
+            return self._sock
+
+    def close(self):
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            # Wakes the reader thread up and lets the helper know
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _read_loop(self, sock):
+        buf = b''
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                msgs, buf = decode_frames(buf + data)
+                for msg in msgs:
+                    future = self._pending.pop(msg.get('id'), None)
+                    if future is not None and not future.done():
+                        future.set_result(msg)
+        except (OSError, ValueError, HelperError):
+            pass
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+            for request_id in list(self._pending):
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_exception(HelperError(
+                        _('Lost the connection to the binding helper')))
+
+    def _submit(self, cmd):
+        cmd = [str(arg) for arg in cmd]
+        request_id = next(self._ids)
+        future = futures.Future()
+        # A running future cannot be cancelled, so that the cancellation of
+        # a waiting coroutine does not make the reader fail to set it
+        future.set_running_or_notify_cancel()
+        self._pending[request_id] = future
+        frame = encode_frame({'id': request_id, 'cmd': cmd,
+                              'timeout': self.timeout})
+        try:
+            self._connect().sendall(frame)
+        except (OSError, AttributeError) as e:
+            self._pending.pop(request_id, None)
+            self.close()
+            raise HelperError(_('Could not send a request to the binding '
+                                'helper: %s') % e)
+        return request_id, future
+
+    def submit(self, *cmd):
+        """Sends a command to run without waiting for its completion
+
+        :returns: a concurrent.futures.Future of the response
+        """
+        return self._submit(cmd)[1]
+
+    def _check_response(self, cmd, response, check_exit_code):
+        if response['exit_code'] not in check_exit_code:
+            raise processutils.ProcessExecutionError(
+                exit_code=response['exit_code'], stdout=response['stdout'],
+                stderr=response['stderr'],
+                cmd=' '.join(str(arg) for arg in cmd))
+        return response['stdout'], response['stderr']
+
+    def _result_timeout(self):
+        # Leave the helper the time to kill the command and answer
+        return self.timeout + 5
+
+    def execute(self, *cmd, check_exit_code=(0,)):
+        """Runs a command in the helper, see ``processutils.execute``"""
+        request_id, future = self._submit(cmd)
+        try:
+            response = future.result(self._result_timeout())
+        except futures.TimeoutError:
+            raise HelperError(_('Timed out waiting for the binding helper'))
+        finally:
+            self._pending.pop(request_id, None)
+        return self._check_response(cmd, response, check_exit_code)
+
+    async def async_execute(self, *cmd, check_exit_code=(0,)):
+        """Coroutine version of ``execute``"""
+        request_id, future = self._submit(cmd)
+        try:
+            response = await asyncio.wait_for(asyncio.wrap_future(future),
+                                              self._result_timeout())
+        except asyncio.TimeoutError:
+            raise HelperError(_('Timed out waiting for the binding helper'))
+        finally:
+            # The caller may also have been cancelled
+            self._pending.pop(request_id, None)
+        return self._check_response(cmd, response, check_exit_code)
+
+
+def get_client():
+    """Returns the helper client, or None if no helper is configured"""
+    global _CLIENT
+    if not cfg.CONF.binding.helper_socket:
+        return None
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = Client(cfg.CONF.binding.helper_socket,
+                             cfg.CONF.binding.helper_timeout)
+    return _CLIENT
@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""In-process host side bindings of the Neutron port vif_types
+
+A vif_type is bound in-process by a plugin registered under the
+``kuryr.vif_types`` entry point group with the vif_type as name and enabled
+in ``[binding] enabled_vif_plugins``. The other vif_types are bound by the
+executable scripts of ``bindir``.
+
+A plugin is any object, usually a module, providing::
+
+    bind(ifname, endpoint_id, port_id, net_id, project_id, hwaddr,
+         details=None)
+    unbind(ifname, endpoint_id, port_id, hwaddr, details=None, net_id=None)
+
+which return the tuple of stdout and stderr like the scripts. A plugin can
+also provide ``is_supported(details)`` to leave some ports to the script and
+``bind_many(bindings)`` to bind the tuples of the device name, endpoint ID,
+Neutron port ID and hardware address of several ports at once.
+"""
+from importlib import metadata
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'kuryr.vif_types'
+
+_PLUGINS = None
+_PLUGINS_LOCK = threading.Lock()
+
+
+def load_plugins():
+    """Loads the enabled vif_type plugins from their entry points
+
+    :returns: a dictionary of the plugins by vif_type
+    """
+    enabled = set(cfg.CONF.binding.enabled_vif_plugins)
+    plugins = {}
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name not in enabled:
+            continue
+        if entry_point.name in plugins:
+            LOG.warning("Ignoring the duplicate plugin %s of vif_type %s",
+                        entry_point.value, entry_point.name)
+            continue
+        try:
+            plugins[entry_point.name] = entry_point.load()
+        except Exception:
+            LOG.exception("Failed to load the plugin of vif_type %s, its "
+                          "binding script will be used",
+                          entry_point.name)
+    for vif_type in enabled - set(plugins):
+        LOG.warning("No plugin is registered for vif_type %s, its binding "
+                    "script will be used", vif_type)
+    return plugins
+
+
+def get_plugins():
+    """Returns the enabled plugins, loaded on the first call"""
+    global _PLUGINS
+    if _PLUGINS is None:
+        with _PLUGINS_LOCK:
+            if _PLUGINS is None:
+                _PLUGINS = load_plugins()
+    return _PLUGINS
+
+
+def get_plugin(vif_type, details=None):
+    """Returns the plugin binding ports of vif_type and details or None"""
+    plugin = get_plugins().get(vif_type)
+    if plugin is None:
+        return None
+    is_supported = getattr(plugin, 'is_supported', None)
+    if is_supported is not None and not is_supported(details):
+        return None
+    return plugin
@@ -0,0 +1,83 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""In-process binding of the ``bridge`` vif_type
+
+This does what the ``bridge`` binding script does with netlink requests. The
+bridges known to exist are cached, so that binding a port to an existing
+bridge only takes the request enslaving the device.
+"""
+import errno
+import threading
+
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib.binding import netlink
+
+LOG = log.getLogger(__name__)
+
+VIF_TYPE = 'bridge'
+BRIDGE_PREFIX = 'brq'
+
+_BRIDGES = set()
+_BRIDGES_LOCK = threading.Lock()
+
+
+def get_bridge_name(net_id):
+    """Returns the name of the bridge of the Neutron network net_id"""
+    return BRIDGE_PREFIX + net_id[:11]
+
+
+def _ensure_bridge(br_name):
+    if br_name in _BRIDGES:
+        return
+    with _BRIDGES_LOCK:
+        if br_name not in _BRIDGES:
+            netlink.get_backend().ensure_bridge(br_name)
+            _BRIDGES.add(br_name)
+
+
+def bind(ifname, endpoint_id, port_id, net_id, project_id, hwaddr,
+         details=None):
+    """Connects the host side device to the bridge of its network
+
+    The bridge is created first if it does not exist. See
+    ``kuryr.lib.binding.host.ovs.bind`` for the parameters.
+
+    :returns: the tuple of stdout and stderr like the binding script
+    :raises: pyroute2.NetlinkError
+    """
+    br_name = get_bridge_name(net_id)
+    _ensure_bridge(br_name)
+    backend = netlink.get_backend()
+    try:
+        backend.set_master(ifname, br_name)
+    except pyroute2.NetlinkError as e:
+        if e.code != errno.ENODEV:
+            raise
+        # The bridge was removed behind our back, create it again
+        LOG.debug("Bridge %s disappeared, creating it again", br_name)
+        _BRIDGES.discard(br_name)
+        _ensure_bridge(br_name)
+        backend.set_master(ifname, br_name)
+    return '', ''
+
+
+def unbind(ifname, endpoint_id, port_id, hwaddr, details=None, net_id=None):
+    """Releases the host side device from its bridge
+
+    See ``kuryr.lib.binding.host.ovs.unbind`` for the parameters.
+
+    :returns: the tuple of stdout and stderr like the unbinding script
+    """
+    netlink.get_backend().set_master(ifname, None)
+    return '', ''
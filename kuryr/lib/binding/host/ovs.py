@@ -0,0 +1,191 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""In-process binding of the ``ovs`` vif_type
+
+This does what the ``ovs`` binding script does with ``ovs-vsctl`` over a
+persistent OVSDB connection. The hybrid plug, which needs an intermediate
+Linux bridge, is still left to the script.
+"""
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+
+from kuryr.lib._i18n import _
+from kuryr.lib.binding.host import ovsdb
+
+LOG = log.getLogger(__name__)
+
+VIF_TYPE = 'ovs'
+OWNER = 'kuryr'
+
+_CONNECTION = None
+_CONNECTION_LOCK = threading.Lock()
+
+
+def get_connection():
+    """Returns the OVSDB connection shared by the bindings"""
+    global _CONNECTION
+    with _CONNECTION_LOCK:
+        if _CONNECTION is None:
+            _CONNECTION = ovsdb.Connection(
+                cfg.CONF.binding.ovsdb_connection,
+                timeout=cfg.CONF.binding.ovsdb_timeout)
+    _CONNECTION.start()
+    return _CONNECTION
+
+
+def is_supported(details):
+    """Tells whether a port with these vif details can be bound here"""
+    return not (details or {}).get('ovs_hybrid_plug')
+
+
+def _external_ids(endpoint_id, port_id, hwaddr):
+    return {'attached-mac': hwaddr,
+            'iface-id': port_id,
+            'vm-uuid': endpoint_id,
+            'iface-status': 'active',
+            'owner': OWNER}
+
+
+def bind(ifname, endpoint_id, port_id, net_id, project_id, hwaddr,
+         details=None):
+    """Adds the host side device of the port to the integration bridge
+
+    :param ifname:      the name of the host side device
+    :param endpoint_id: the identifier of the endpoint
+    :param port_id:     the Neutron uuid of the port
+    :param net_id:      the Neutron uuid of the network the port is part of
+    :param project_id:  the Keystone project the binding is made for
+    :param hwaddr:      the interface hardware address
+    :param details:     Neutron vif details
+    :returns: the tuple of stdout and stderr like the binding script
+    :raises: kuryr.lib.binding.host.ovsdb.OVSDBError
+    """
+    bind_many([(ifname, endpoint_id, port_id, hwaddr)])
+    return '', ''
+
+
+def bind_many(bindings):
+    """Adds several devices to the integration bridge in one transaction
+
+    Devices that already are ports of the bridge only get their external IDs
+    updated, like ``ovs-vsctl --may-exist add-port`` does.
+
+    :param bindings: an iterable of the tuples of the device name, the
+                     endpoint ID, the Neutron port ID and hardware address
+    :raises: kuryr.lib.binding.host.ovsdb.OVSDBError
+    """
+    conn = get_connection()
+    stale = _bind_many(conn, bindings, use_index=True)
+    if stale:
+        # The local index had rows already removed from the database
+        _bind_many(conn, stale, use_index=False)
+
+
+def _bind_many(conn, bindings, use_index):
+    """Returns the bindings whose indexed Interface no longer existed"""
+    bridge = cfg.CONF.binding.ovs_integration_bridge
+    operations = []
+    new_ports = []
+    updates = []
+    for index, binding in enumerate(bindings):
+        ifname, endpoint_id, port_id, hwaddr = binding
+        external_ids = ovsdb.to_map(
+            _external_ids(endpoint_id, port_id, hwaddr))
+        iface_uuid = conn.find_port(ifname)[1] if use_index else None
+        if iface_uuid is not None:
+            updates.append((len(operations), binding))
+            operations.append({
+                'op': 'update',
+                'table': 'Interface',
+                'where': [['_uuid', '==', ['uuid', iface_uuid]]],
+                'row': {'external_ids': external_ids}})
+            continue
+        iface_name = 'iface%d' % index
+        port_name = 'port%d' % index
+        operations.append({
+            'op': 'insert',
+            'table': 'Interface',
+            'row': {'name': ifname, 'external_ids': external_ids},
+            'uuid-name': iface_name})
+        operations.append({
+            'op': 'insert',
+            'table': 'Port',
+            'row': {'name': ifname,
+                    'interfaces': ['named-uuid', iface_name]},
+            'uuid-name': port_name})
+        new_ports.append(['named-uuid', port_name])
+    if new_ports:
+        operations.append({
+            'op': 'mutate',
+            'table': 'Bridge',
+            'where': [['name', '==', bridge]],
+            'mutations': [['ports', 'insert', ['set', new_ports]]]})
+    if not operations:
+        return []
+    results = conn.transact(operations)
+    if new_ports and not results[len(operations) - 1].get('count'):
+        raise ovsdb.OVSDBError(_('Bridge %s does not exist.') % bridge)
+    return [binding for index, binding in updates
+            if not results[index].get('count')]
+
+
+def _find_port(conn, port_id):
+    """Looks the port bound for port_id up in the OVSDB server
+
+    This is only needed when the monitor updates of a binding were not
+    received yet.
+    """
+    ifaces = conn.transact([{
+        'op': 'select',
+        'table': 'Interface',
+        'where': [['external_ids', 'includes',
+                   ovsdb.to_map({'iface-id': port_id, 'owner': OWNER})]],
+        'columns': ['_uuid']}])[0]['rows']
+    if not ifaces:
+        return None
+    ports = conn.transact([{
+        'op': 'select',
+        'table': 'Port',
+        'where': [['interfaces', 'includes', ifaces[0]['_uuid']]],
+        'columns': ['_uuid']}])[0]['rows']
+    return ports[0]['_uuid'][1] if ports else None
+
+
+def unbind(ifname, endpoint_id, port_id, hwaddr, details=None, net_id=None):
+    """Removes the port bound for port_id from its bridge
+
+    :param ifname:      the name of the host side device
+    :param endpoint_id: the identifier of the endpoint
+    :param port_id:     the Neutron uuid of the port
+    :param hwaddr:      the interface hardware address
+    :param details:     Neutron vif details
+    :param net_id:      the Neutron uuid of the network the port is part of
+    :returns: the tuple of stdout and stderr like the unbinding script
+    :raises: kuryr.lib.binding.host.ovsdb.OVSDBError
+    """
+    conn = get_connection()
+    port_uuid, bridge_uuid = conn.find_port_by_iface_id(port_id)
+    if bridge_uuid is not None:
+        where = [['_uuid', '==', ['uuid', bridge_uuid]]]
+    else:
+        port_uuid = port_uuid or _find_port(conn, port_id)
+        if port_uuid is None:
+            raise ovsdb.OVSDBError(_('Failed to find port %s.') % port_id)
+        where = [['ports', 'includes', ['uuid', port_uuid]]]
+    conn.transact([{
+        'op': 'mutate',
+        'table': 'Bridge',
+        'where': where,
+        'mutations': [['ports', 'delete', ovsdb.uuid_set([port_uuid])]]}])
+    return '', ''
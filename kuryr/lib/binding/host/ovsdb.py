@@ -0,0 +1,377 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Minimal OVSDB (RFC 7047) JSON-RPC client
+
+It keeps one connection to ovsdb-server and monitors the Bridge, Port and
+Interface tables, so that the ports can be found by the Neutron port ID in
+their Interface external_ids without querying the server.
+"""
+import itertools
+import json
+import re
+import socket
+import threading
+
+from oslo_log import log
+from oslo_utils import excutils
+
+from kuryr.lib._i18n import _
+from kuryr.lib import exceptions
+
+LOG = log.getLogger(__name__)
+
+DATABASE = 'Open_vSwitch'
+IFACE_ID_KEY = 'iface-id'
+
+_MONITORED_COLUMNS = {
+    'Bridge': ['name', 'ports'],
+    'Port': ['name', 'interfaces'],
+    'Interface': ['name', 'external_ids'],
+}
+
+
+def to_map(mapping):
+    """Encodes a dictionary as an OVSDB map"""
+    return ['map', [[k, v] for k, v in sorted(mapping.items())]]
+
+
+def from_map(value):
+    """Decodes an OVSDB map into a dictionary"""
+    return dict(value[1])
+
+
+def uuid_set(uuids):
+    """Encodes an iterable of row UUIDs as an OVSDB set"""
+    return ['set', [['uuid', uuid] for uuid in uuids]]
+
+
+def from_uuid_set(value):
+    """Decodes an OVSDB set, or single atom, of UUIDs into a set"""
+    if value[0] == 'uuid':
+        return {value[1]}
+    return {atom[1] for atom in value[1]}
+
+
+class OVSDBError(exceptions.BindingFailure):
+    """An OVSDB request or transaction failed"""
+
+
+class _Framer(object):
+    """Splits a byte stream of JSON objects, e.g. JSON-RPC messages
+
+    Only the bytes received since the previous call are scanned, so that a
+    large message received in many chunks, like the initial monitor reply,
+    is not decoded again with each of them, and the messages are only
+    decoded once complete, so that a character split across chunks is not.
+    """
+
+    _SPECIAL = re.compile(rb'[{}"\\]')
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, data):
+        """Returns the complete JSON objects received so far, as bytes"""
+        self._buf += data
+        frames = []
+        pos = self._pos
+        while True:
+            match = self._SPECIAL.search(self._buf, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if self._in_string:
+                if char == b'\\':
+                    # Skips the escaped character
+                    pos += 1
+                elif char == b'"':
+                    self._in_string = False
+            elif char == b'"':
+                self._in_string = True
+            elif char == b'{':
+                if self._depth == 0:
+                    self._start = match.start()
+                self._depth += 1
+            elif char == b'}':
+                self._depth -= 1
+                if self._depth == 0:
+                    frames.append(bytes(self._buf[self._start:pos]))
+        # Drops what was consumed, i.e. everything but the current message
+        consumed = self._start if self._depth else len(self._buf)
+        self._pos = max(pos, len(self._buf)) - consumed
+        del self._buf[:consumed]
+        self._start = 0
+        return frames
+
+
+class Connection(object):
+    """A JSON-RPC connection to ovsdb-server with a local table index
+
+    :param connection: ``unix:<path>`` or ``tcp:<host>:<port>``
+    """
+
+    def __init__(self, connection, timeout=None):
+        self.connection = connection
+        self.timeout = timeout
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {}
+        self._state_lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self.bridges = {}
+        self.ports = {}
+        self.interfaces = {}
+        self._port_bridge = {}
+        self._port_names = {}
+        self._iface_port = {}
+        self._iface_ids = {}
+
+    def _connect(self):
+        kind, _, address = self.connection.partition(':')
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(address)
+        elif kind == 'tcp':
+            host, _, port = address.rpartition(':')
+            sock = socket.create_connection((host, int(port)))
+        else:
+            raise OVSDBError(_('Unsupported OVSDB connection %s') %
+                             self.connection)
+        return sock
+
+    def start(self):
+        """Connects if needed and loads the monitored tables"""
+        # NOTE: The monitor request is sent without holding _connect_lock,
+        # which the reader takes when the connection is lost
+        with self._start_lock:
+            with self._connect_lock:
+                if self._sock is not None:
+                    return
+                self._sock = self._connect()
+                reader = threading.Thread(target=self._read_loop,
+                                          args=(self._sock,), daemon=True)
+                reader.start()
+            tables = {table: {'columns': columns}
+                      for table, columns in _MONITORED_COLUMNS.items()}
+            try:
+                # The reader applies the initial state before dispatching
+                # the update notifications that follow it
+                self._request('monitor', [DATABASE, 'kuryr', tables],
+                              on_result=self._load_state)
+            except Exception:
+                # Without its index the connection cannot be used, the next
+                # start connects again
+                with excutils.save_and_reraise_exception():
+                    self.close()
+
+    def _load_state(self, initial):
+        with self._state_lock:
+            self._reset_state()
+            self._apply_updates(initial)
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _read_loop(self, sock):
+        framer = _Framer()
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                for frame in framer.feed(data):
+                    try:
+                        msg = json.loads(frame)
+                    except ValueError as e:
+                        LOG.warning("Ignoring an invalid message from "
+                                    "ovsdb-server: %s", e)
+                        continue
+                    self._dispatch(msg)
+        except OSError:
+            pass
+        except Exception:
+            LOG.exception("Error happened while reading from ovsdb-server")
+            self.close()
+        finally:
+            self._disconnected(sock)
+
+    def _disconnected(self, sock):
+        with self._connect_lock:
+            if self._sock is sock:
+                self._sock = None
+                LOG.warning("Lost the connection to ovsdb-server")
+            elif self._sock is not None:
+                # The pending requests are the ones of a new connection
+                return
+        for request_id in list(self._pending):
+            waiter = self._pending.pop(request_id, None)
+            if waiter is not None:
+                waiter[1] = {'error': 'connection lost'}
+                waiter[0].set()
+
+    def _dispatch(self, msg):
+        method = msg.get('method')
+        if method == 'update':
+            with self._state_lock:
+                self._apply_updates(msg['params'][1])
+        elif method == 'echo':
+            self._send({'id': msg['id'], 'result': msg['params'],
+                        'error': None})
+        elif method is None:
+            waiter = self._pending.pop(msg.get('id'), None)
+            if waiter is not None:
+                if waiter[2] is not None and not msg.get('error'):
+                    waiter[2](msg['result'])
+                waiter[1] = msg
+                waiter[0].set()
+
+    def _send(self, msg):
+        data = json.dumps(msg).encode('utf-8')
+        with self._send_lock:
+            self._sock.sendall(data)
+
+    def _request(self, method, params, on_result=None):
+        request_id = next(self._ids)
+        waiter = [threading.Event(), None, on_result]
+        self._pending[request_id] = waiter
+        try:
+            self._send({'method': method, 'params': params,
+                        'id': request_id})
+        except (OSError, AttributeError):
+            self._pending.pop(request_id, None)
+            raise OVSDBError(_('Could not send the %s request to '
+                               'ovsdb-server') % method)
+        if not waiter[0].wait(self.timeout):
+            self._pending.pop(request_id, None)
+            raise OVSDBError(_('Timed out waiting for ovsdb-server'))
+        response = waiter[1]
+        if response.get('error'):
+            raise OVSDBError(_('OVSDB %s request failed: %s') %
+                             (method, response['error']))
+        return response['result']
+
+    def transact(self, operations):
+        """Runs operations in a single OVSDB transaction
+
+        :param operations: a list of RFC 7047 operation objects
+        :returns: the list of operation results
+        :raises: OVSDBError if the transaction or one of its operations
+                 failed
+        """
+        self.start()
+        results = self._request('transact', [DATABASE] + list(operations))
+        for result in results:
+            if result and result.get('error'):
+                raise OVSDBError(_('OVSDB transaction failed: %s (%s)') %
+                                 (result['error'], result.get('details')))
+        return results
+
+    def _apply_updates(self, table_updates):
+        for table, rows in table_updates.items():
+            for uuid, change in rows.items():
+                new = change.get('new')
+                if table == 'Bridge':
+                    self._update_bridge(uuid, new)
+                elif table == 'Port':
+                    self._update_port(uuid, new)
+                elif table == 'Interface':
+                    self._update_interface(uuid, new)
+
+    def _update_bridge(self, uuid, new):
+        old = self.bridges.pop(uuid, None)
+        if old is not None:
+            for port_uuid in old['ports']:
+                if self._port_bridge.get(port_uuid) == uuid:
+                    del self._port_bridge[port_uuid]
+        if new is not None:
+            bridge = {'name': new['name'],
+                      'ports': from_uuid_set(new['ports'])}
+            self.bridges[uuid] = bridge
+            for port_uuid in bridge['ports']:
+                self._port_bridge[port_uuid] = uuid
+
+    def _update_port(self, uuid, new):
+        old = self.ports.pop(uuid, None)
+        if old is not None:
+            if self._port_names.get(old['name']) == uuid:
+                del self._port_names[old['name']]
+            for iface_uuid in old['interfaces']:
+                if self._iface_port.get(iface_uuid) == uuid:
+                    del self._iface_port[iface_uuid]
+        if new is not None:
+            port = {'name': new['name'],
+                    'interfaces': from_uuid_set(new['interfaces'])}
+            self.ports[uuid] = port
+            self._port_names[port['name']] = uuid
+            for iface_uuid in port['interfaces']:
+                self._iface_port[iface_uuid] = uuid
+
+    def _update_interface(self, uuid, new):
+        old = self.interfaces.pop(uuid, None)
+        if old is not None:
+            iface_id = old['external_ids'].get(IFACE_ID_KEY)
+            if self._iface_ids.get(iface_id) == uuid:
+                del self._iface_ids[iface_id]
+        if new is not None:
+            iface = {'name': new['name'],
+                     'external_ids': from_map(new['external_ids'])}
+            self.interfaces[uuid] = iface
+            iface_id = iface['external_ids'].get(IFACE_ID_KEY)
+            if iface_id:
+                self._iface_ids[iface_id] = uuid
+
+    def find_bridge(self, name):
+        """Returns the UUID of the bridge named name or None"""
+        with self._state_lock:
+            for uuid, bridge in self.bridges.items():
+                if bridge['name'] == name:
+                    return uuid
+        return None
+
+    def find_port(self, name):
+        """Returns the UUIDs of the port named name and its interface"""
+        with self._state_lock:
+            port_uuid = self._port_names.get(name)
+            if port_uuid is None:
+                return None, None
+            for iface_uuid in self.ports[port_uuid]['interfaces']:
+                if self.interfaces.get(iface_uuid, {}).get('name') == name:
+                    return port_uuid, iface_uuid
+            return port_uuid, None
+
+    def find_port_by_iface_id(self, iface_id):
+        """Returns the UUIDs of the port and its bridge for an iface-id
+
+        :param iface_id: the Neutron port ID set as the iface-id external ID
+                         of the Interface
+        :returns: the tuple of the port and bridge UUIDs, or (None, None)
+        """
+        with self._state_lock:
+            iface_uuid = self._iface_ids.get(iface_id)
+            port_uuid = self._iface_port.get(iface_uuid)
+            return port_uuid, self._port_bridge.get(port_uuid)
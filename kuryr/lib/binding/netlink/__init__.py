@@ -0,0 +1,38 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Netlink backends used by the binding drivers to manage host devices"""
+from oslo_config import cfg
+from oslo_utils import importutils
+
+BASE_PATH = 'kuryr.lib.binding.netlink'
+
+BACKENDS = {
+    'ipdb': 'ipdb.IPDBBackend',
+    'iproute': 'iproute.IPRouteBackend',
+}
+
+_BACKEND = None
+
+
+def get_backend():
+    """Returns the already cached or a newly created netlink backend.
+
+    The backend is selected with the ``[binding] netlink_backend`` option.
+
+    :returns: a ``kuryr.lib.binding.netlink.base.NetlinkBackend`` instance
+    """
+    global _BACKEND
+    if _BACKEND is None:
+        backend_path = '.'.join(
+            [BASE_PATH, BACKENDS[cfg.CONF.binding.netlink_backend]])
+        _BACKEND = importutils.import_object(backend_path)
+    return _BACKEND
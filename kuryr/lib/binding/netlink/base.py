@@ -0,0 +1,161 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import abc
+
+
+class NetlinkBackend(object, metaclass=abc.ABCMeta):
+    """Device operations the binding drivers need from the host netlink"""
+
+    @abc.abstractmethod
+    def create_veth_pair(self, ifname, peer, subnets, fixed_ips, mtu=None,
+                         hwaddr=None, netns=None):
+        """Creates a veth pair and configures its peer end
+
+        An already existing pair is reused. The ``ifname`` end is set up and
+        the ``peer`` end gets the addresses, MTU and hardware address. When
+        ``netns`` is given the peer is created directly in that namespace and
+        configured there.
+
+        :param ifname:    the name of the host end of the pair
+        :param peer:      the name of the container end of the pair
+        :param subnets:   an iterable of all the Neutron subnets which the
+                          endpoint is trying to join
+        :param fixed_ips: an iterable of fixed IPs to be set for the peer
+        :param mtu:       Maximum Transfer Unit to set for the peer
+        :param hwaddr:    Hardware address to set for the peer
+        :param netns:     the network namespace of the peer as a path, a
+                          name under /var/run/netns or an open file
+                          descriptor
+        """
+
+    @abc.abstractmethod
+    def create_link(self, ifname, kind, link, subnets, fixed_ips, mtu=None,
+                    hwaddr=None, netns=None, **attrs):
+        """Creates a device on top of another one and configures it
+
+        When ``netns`` is given the device is created directly in that
+        namespace and configured there, ``link`` is still looked up in the
+        default one.
+
+        :param ifname:    the name of the device to create
+        :param kind:      the kind of the device, e.g. vlan or ipvlan
+        :param link:      the name of the device to create it on top of
+        :param subnets:   an iterable of all the Neutron subnets which the
+                          endpoint is trying to join
+        :param fixed_ips: an iterable of fixed IPs to be set for the device
+        :param mtu:       Maximum Transfer Unit to set for the device
+        :param hwaddr:    Hardware address to set for the device
+        :param netns:     see ``create_veth_pair``
+        :param attrs:     kind specific attributes, e.g. vlan_id
+        """
+
+    @abc.abstractmethod
+    def remove_device(self, ifname, netns=None):
+        """Removes the device with name ifname.
+
+        :param ifname: the name of the device to remove
+        :param netns:  the network namespace of the device, see
+                       ``create_veth_pair``
+        :returns: the index the device identified by ifname had if it
+                  exists, otherwise None
+        """
+
+    @abc.abstractmethod
+    def get_ifname_by_address(self, hwaddr):
+        """Returns the name of the device with the given hardware address
+
+        :param hwaddr: the hardware address to look for
+        :returns: the device name or None if there is no such device
+        """
+
+    @abc.abstractmethod
+    def add_veth_pair(self, ifname, peer):
+        """Creates a veth pair and leaves both ends down and unconfigured
+
+        :param ifname: the name of one end of the pair
+        :param peer:   the name of the other end of the pair
+        """
+
+    @abc.abstractmethod
+    def rename_device(self, ifname, new_ifname):
+        """Renames a device, which has to be down
+
+        :param ifname:     the current name of the device
+        :param new_ifname: the new name of the device
+        """
+
+    @abc.abstractmethod
+    def list_ifnames(self):
+        """Returns the names of all the devices of the default namespace"""
+
+    @abc.abstractmethod
+    def ensure_bridge(self, ifname):
+        """Creates a Linux bridge and sets it up if it does not exist
+
+        The bridge is created with a forward delay of 0 and STP disabled. An
+        existing device with that name is left as is.
+
+        :param ifname: the name of the bridge
+        """
+
+    @abc.abstractmethod
+    def set_master(self, ifname, master):
+        """Enslaves a device to a bridge and sets it up
+
+        :param ifname: the name of the device
+        :param master: the name of the bridge, or None to release the device
+                       from its current master
+        :raises: pyroute2.NetlinkError with ENODEV if the bridge does not
+                 exist. A missing device is ignored when releasing it.
+        """
+
+    @abc.abstractmethod
+    def list_vlan_ids(self, netns=None):
+        """Returns the set of the VLAN IDs of the VLAN devices of a namespace
+
+        :param netns: the network namespace to look into, see
+                      ``create_veth_pair``. The default namespace if None.
+        """
+
+    @abc.abstractmethod
+    def dump_links(self):
+        """Returns one dump of the links and addresses of the default namespace
+
+        :returns: the tuple of the lists of the RTM_NEWLINK and of the
+                  RTM_NEWADDR messages
+        """
+
+    @abc.abstractmethod
+    def get_alias(self, ifname):
+        """Returns the alias of a device of the default namespace
+
+        :param ifname: the name of the device
+        :returns: the alias, or None if the device has none or does not
+                  exist
+        """
+
+    @abc.abstractmethod
+    def get_master(self, ifname):
+        """Returns the master of a device of the default namespace
+
+        :param ifname: the name of the device
+        :returns: the index of the bridge or the OVS datapath the device is
+                  enslaved to, or None if it is not or does not exist
+        """
+
+    @abc.abstractmethod
+    def set_alias(self, ifname, alias):
+        """Sets the alias of a device of the default namespace
+
+        :param ifname: the name of the device
+        :param alias:  the alias, of at most 255 bytes
+        """
@@ -0,0 +1,153 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Compact index of the host links kept current from netlink events"""
+import errno
+import threading
+
+from oslo_log import log
+from oslo_utils import excutils
+import pyroute2
+from pyroute2.netlink import rtnl
+
+from kuryr.lib.binding.drivers import utils
+
+LOG = log.getLogger(__name__)
+
+
+class LinkIndex(object):
+    """Name, index and hardware address lookups of the host links
+
+    The index is built from a single RTM_GETLINK dump and then updated from
+    the RTNLGRP_LINK multicast events, so lookups never have to dump or scan
+    the host links. Only the name, index and hardware address of each link
+    are kept.
+
+    When the events cannot be received anymore the index is marked as
+    failed and cleared, its users then have to look the links up from the
+    kernel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._links = {}
+        self._by_name = {}
+        self._by_address = {}
+        self._events = None
+        self._thread = None
+        self.failed = False
+
+    def start(self):
+        """Subscribes to the link events and loads the initial dump"""
+        # NOTE: Bind before dumping so that no event is lost in between,
+        # the queued events are replayed on top of the dump and all of them
+        # are idempotent.
+        self._events = pyroute2.IPRoute()
+        try:
+            self._events.bind(groups=rtnl.RTMGRP_LINK)
+            self.resync()
+            self._thread = threading.Thread(target=self._listen, daemon=True)
+            self._thread.start()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._fail()
+
+    def resync(self):
+        """Rebuilds the whole index from a fresh dump of the host links"""
+        with pyroute2.IPRoute() as ipr:
+            links = ipr.get_links()
+        with self._lock:
+            self._links.clear()
+            self._by_name.clear()
+            self._by_address.clear()
+            for msg in links:
+                self._add(msg)
+
+    def _listen(self):
+        try:
+            while True:
+                try:
+                    messages = self._events.get()
+                except pyroute2.NetlinkError as e:
+                    if e.code != errno.ENOBUFS:
+                        raise
+                    LOG.warning("Link events were lost, resynchronizing "
+                                "the link index")
+                    self.resync()
+                    continue
+                for msg in messages:
+                    self.process_message(msg)
+        except Exception:
+            LOG.exception("Could not receive the link events anymore, the "
+                          "link index is disabled")
+            self._fail()
+
+    def _fail(self):
+        self.failed = True
+        with self._lock:
+            self._links.clear()
+            self._by_name.clear()
+            self._by_address.clear()
+        try:
+            self._events.close()
+        except Exception:
+            pass
+
+    def process_message(self, msg):
+        """Updates the index from a RTM_NEWLINK or RTM_DELLINK message"""
+        event = msg.get('event')
+        with self._lock:
+            if event == 'RTM_NEWLINK':
+                self._add(msg)
+            elif event == 'RTM_DELLINK':
+                self._remove(msg['index'])
+
+    def _add(self, msg):
+        index = msg['index']
+        # Renames and address changes come as RTM_NEWLINK on the same index
+        self._remove(index)
+        ifname = msg.get_attr('IFLA_IFNAME')
+        address = msg.get_attr('IFLA_ADDRESS')
+        self._links[index] = (ifname, address)
+        self._by_name[ifname] = index
+        if address:
+            self._by_address.setdefault(address, set()).add(index)
+
+    def _remove(self, index):
+        ifname, address = self._links.pop(index, (None, None))
+        if self._by_name.get(ifname) == index:
+            del self._by_name[ifname]
+        indexes = self._by_address.get(address)
+        if indexes:
+            indexes.discard(index)
+            if not indexes:
+                del self._by_address[address]
+
+    def get_index(self, ifname):
+        """Returns the index of the link named ifname or None"""
+        return self._by_name.get(ifname)
+
+    def get_ifname_by_address(self, hwaddr):
+        """Returns the name of the link with the given hardware address
+
+        Devices like ipvlan share the address of their parent, the lowest
+        index, i.e. the parent, wins.
+        """
+        with self._lock:
+            indexes = self._by_address.get(hwaddr)
+            if not indexes:
+                return None
+            return self._links[min(indexes)][0]
+
+    def get_port_devices(self, port_id):
+        """Returns the names of the existing devices of a Neutron port"""
+        return [ifname for ifname in utils.get_veth_pair_names(port_id)
+                if ifname in self._by_name]
@@ -0,0 +1,137 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Netlink backend that keeps a mirror of the host devices in pyroute2.IPDB"""
+import errno
+
+import pyroute2
+
+from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding.netlink import base
+from kuryr.lib.binding.netlink import iproute
+
+
+class IPDBBackend(base.NetlinkBackend):
+    """IPDB backed operations
+
+    IPDB only mirrors the default network namespace, the operations on
+    devices in other namespaces go through the IPDB netlink socket.
+    """
+
+    def create_veth_pair(self, ifname, peer, subnets, fixed_ips, mtu=None,
+                         hwaddr=None, netns=None):
+        ip = utils.get_ipdb()
+        if netns is not None:
+            iproute.create_veth_pair(ip.nl, ifname, peer, subnets, fixed_ips,
+                                     mtu=mtu, hwaddr=hwaddr, netns=netns)
+            return
+        with ip.create(ifname=ifname, kind='veth',
+                       reuse=True, peer=peer) as host_veth:
+            if not utils.is_up(host_veth):
+                host_veth.up()
+        with ip.interfaces[peer] as peer_veth:
+            utils._configure_container_iface(
+                peer_veth, subnets, fixed_ips=fixed_ips, mtu=mtu,
+                hwaddr=hwaddr)
+
+    def create_link(self, ifname, kind, link, subnets, fixed_ips, mtu=None,
+                    hwaddr=None, netns=None, **attrs):
+        ip = utils.get_ipdb()
+        if netns is not None:
+            iproute.create_link(ip.nl, ifname, kind, link, subnets,
+                                fixed_ips, mtu=mtu, hwaddr=hwaddr,
+                                netns=netns, **attrs)
+            return
+        with ip.create(ifname=ifname, kind=kind, link=ip.interfaces[link],
+                       **attrs) as iface:
+            utils._configure_container_iface(
+                iface, subnets, fixed_ips=fixed_ips, mtu=mtu, hwaddr=hwaddr)
+
+    def remove_device(self, ifname, netns=None):
+        if netns is not None:
+            with iproute.netns_socket(netns) as ns_ipr:
+                return iproute.remove_device(ns_ipr, ifname)
+
+        ip = utils.get_ipdb()
+
+        dev_index = ip.interfaces.get(ifname, {}).get('index', None)
+
+        if dev_index:
+            with ip.interfaces[ifname] as iface:
+                iface.remove()
+
+        return dev_index
+
+    def get_ifname_by_address(self, hwaddr):
+        ip = utils.get_ipdb()
+        for name, data in ip.interfaces.items():
+            if data['address'] == hwaddr:
+                return data['ifname']
+        return None
+
+    def add_veth_pair(self, ifname, peer):
+        ip = utils.get_ipdb()
+        with ip.create(ifname=ifname, kind='veth', peer=peer):
+            pass
+
+    def rename_device(self, ifname, new_ifname):
+        ip = utils.get_ipdb()
+        with ip.interfaces[ifname] as iface:
+            iface['ifname'] = new_ifname
+
+    def list_ifnames(self):
+        ip = utils.get_ipdb()
+        return [name for name in ip.interfaces if isinstance(name, str)]
+
+    def ensure_bridge(self, ifname):
+        ip = utils.get_ipdb()
+        if ifname in ip.interfaces:
+            return
+        iproute.ensure_bridge(ip.nl, ifname)
+
+    def set_master(self, ifname, master):
+        ip = utils.get_ipdb()
+        dev_index = ip.interfaces.get(ifname, {}).get('index')
+        if master is None:
+            if dev_index is not None:
+                iproute.set_master(ip.nl, dev_index, 0)
+            return
+        master_index = ip.interfaces.get(master, {}).get('index')
+        if dev_index is None or master_index is None:
+            raise pyroute2.NetlinkError(errno.ENODEV)
+        iproute.set_master(ip.nl, dev_index, master_index)
+
+    def list_vlan_ids(self, netns=None):
+        if netns is not None:
+            with iproute.netns_socket(netns) as ns_ipr:
+                return iproute.list_vlan_ids(ns_ipr)
+        ip = utils.get_ipdb()
+        return {iface['vlan_id'] for name, iface in ip.interfaces.items()
+                if isinstance(name, str) and iface.get('kind') == 'vlan'}
+
+    def dump_links(self):
+        ip = utils.get_ipdb()
+        return ip.nl.get_links(), ip.nl.get_addr()
+
+    def get_alias(self, ifname):
+        ip = utils.get_ipdb()
+        return ip.interfaces.get(ifname, {}).get('ifalias')
+
+    def get_master(self, ifname):
+        ip = utils.get_ipdb()
+        return ip.interfaces.get(ifname, {}).get('master') or None
+
+    def set_alias(self, ifname, alias):
+        ip = utils.get_ipdb()
+        if ifname not in ip.interfaces:
+            raise pyroute2.NetlinkError(errno.ENODEV)
+        with ip.interfaces[ifname] as iface:
+            iface['ifalias'] = alias
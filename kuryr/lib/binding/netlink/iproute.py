@@ -0,0 +1,408 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Netlink backend that only sends the RTM_* requests the drivers need
+
+Unlike IPDB it does not keep any mirror of the host devices, every operation
+is a request on a ``pyroute2.IPRoute`` socket.
+"""
+import contextlib
+import errno
+import os
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+import pyroute2
+from pyroute2 import netns as pyroute2_netns
+
+from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding.netlink import base
+from kuryr.lib.binding.netlink import index
+
+LOG = log.getLogger(__name__)
+
+NETNS_RUN_DIR = '/var/run/netns'
+IFF_UP = 0x1
+
+
+@contextlib.contextmanager
+def netns_fd(netns):
+    """Yields a file descriptor of a network namespace
+
+    :param netns: an open file descriptor, which is yielded as is, the path
+                  of the namespace or its name under /var/run/netns
+    """
+    if isinstance(netns, int):
+        yield netns
+        return
+    if os.sep not in netns:
+        netns = os.path.join(NETNS_RUN_DIR, netns)
+    fd = os.open(netns, os.O_RDONLY)
+    try:
+        yield fd
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def netns_socket(netns):
+    """Yields a ``pyroute2.IPRoute`` socket bound to a network namespace
+
+    The socket is opened while the calling thread is switched to the
+    namespace, which avoids the helper process ``pyroute2.NetNS`` spawns.
+
+    :param netns: see ``netns_fd``
+    """
+    with netns_fd(netns) as fd:
+        current = os.open('/proc/thread-self/ns/net', os.O_RDONLY)
+        try:
+            pyroute2_netns.setns(fd)
+            try:
+                ipr = pyroute2.IPRoute()
+            finally:
+                pyroute2_netns.setns(current)
+        finally:
+            os.close(current)
+    try:
+        yield ipr
+    finally:
+        ipr.close()
+
+
+def get_index(ipr, ifname):
+    """Returns the index of the device named ifname or None"""
+    indexes = ipr.link_lookup(ifname=ifname)
+    return indexes[0] if indexes else None
+
+
+def configure_iface(ipr, dev_index, subnets, fixed_ips, mtu=None,
+                    hwaddr=None, existing=False):
+    """Configures a device through an IPRoute compatible object
+
+    The addresses are added one by one and the MTU, hardware address and
+    state are set in a single RTM_NEWLINK request. The state of an existing
+    device is read first so that only the changes it needs are written.
+
+    :param ipr:       a ``pyroute2.IPRoute`` compatible instance
+    :param dev_index: the index of the device to configure
+    :param subnets:   an iterable of all the Neutron subnets which the
+                      endpoint is trying to join
+    :param fixed_ips: an iterable of fixed IPs to be set for the device
+    :param mtu:       Maximum Transfer Unit to set for the device
+    :param hwaddr:    Hardware address to set for the device
+    :param existing:  whether the device may already be configured
+    """
+    link = None
+    addresses = set()
+    if existing:
+        link = ipr.get_links(dev_index)[0]
+        addresses = {(msg.get_attr('IFA_ADDRESS'), msg['prefixlen'])
+                     for msg in ipr.get_addr(index=dev_index)}
+    for address, prefixlen in utils.get_ip_prefixes(subnets, fixed_ips):
+        if (address, prefixlen) in addresses:
+            continue
+        try:
+            ipr.addr('add', index=dev_index, address=address,
+                     mask=prefixlen)
+        except pyroute2.NetlinkError as e:
+            if e.code != errno.EEXIST:
+                raise
+    if link is None:
+        ipr.link('set', index=dev_index, mtu=mtu, address=hwaddr, state='up')
+        return
+    changes = {}
+    if mtu is not None and link.get_attr('IFLA_MTU') != mtu:
+        changes['mtu'] = mtu
+    current_hwaddr = link.get_attr('IFLA_ADDRESS') or ''
+    if hwaddr is not None and current_hwaddr.lower() != hwaddr.lower():
+        changes['address'] = hwaddr
+    if not link['flags'] & IFF_UP:
+        changes['state'] = 'up'
+    if changes:
+        ipr.link('set', index=dev_index, **changes)
+
+
+def configure_iface_by_name(ipr, ifname, subnets, fixed_ips, mtu=None,
+                            hwaddr=None, netns=None, existing=False):
+    """Configures a device, in its network namespace if one is given"""
+    if netns is None:
+        configure_iface(ipr, get_index(ipr, ifname), subnets, fixed_ips,
+                        mtu=mtu, hwaddr=hwaddr, existing=existing)
+        return
+    with netns_socket(netns) as ns_ipr:
+        configure_iface(ns_ipr, get_index(ns_ipr, ifname), subnets,
+                        fixed_ips, mtu=mtu, hwaddr=hwaddr, existing=existing)
+
+
+def create_veth_pair(ipr, ifname, peer, subnets, fixed_ips, mtu=None,
+                     hwaddr=None, netns=None):
+    """Creates and configures a veth pair, see NetlinkBackend"""
+    existing = False
+    try:
+        if netns is None:
+            ipr.link('add', ifname=ifname, kind='veth', peer=peer)
+        else:
+            with netns_fd(netns) as fd:
+                ipr.link('add', ifname=ifname, kind='veth',
+                         peer={'ifname': peer, 'net_ns_fd': fd})
+    except pyroute2.NetlinkError as e:
+        if e.code != errno.EEXIST:
+            raise
+        # A rebind, or a pair taken from the pool
+        existing = True
+    ipr.link('set', index=get_index(ipr, ifname), state='up')
+    configure_iface_by_name(ipr, peer, subnets, fixed_ips, mtu=mtu,
+                            hwaddr=hwaddr, netns=netns, existing=existing)
+
+
+def create_link(ipr, ifname, kind, link, subnets, fixed_ips, mtu=None,
+                hwaddr=None, netns=None, **attrs):
+    """Creates and configures a device on top of another, see NetlinkBackend
+
+    The parent device is looked up in the namespace of ``ipr``.
+    """
+    if netns is None:
+        ipr.link('add', ifname=ifname, kind=kind, link=get_index(ipr, link),
+                 **attrs)
+    else:
+        with netns_fd(netns) as fd:
+            ipr.link('add', ifname=ifname, kind=kind,
+                     link=get_index(ipr, link), net_ns_fd=fd, **attrs)
+    configure_iface_by_name(ipr, ifname, subnets, fixed_ips, mtu=mtu,
+                            hwaddr=hwaddr, netns=netns)
+
+
+def remove_device(ipr, ifname, dev_index=None):
+    """Removes a device, returning its index or None if it did not exist"""
+    if dev_index is None:
+        dev_index = get_index(ipr, ifname)
+    if dev_index:
+        try:
+            ipr.link('del', index=dev_index)
+        except pyroute2.NetlinkError as e:
+            # The device may have been removed in the meantime
+            if e.code != errno.ENODEV:
+                raise
+            return None
+    return dev_index
+
+
+def ensure_bridge(ipr, ifname):
+    """Creates the bridge ifname unless it exists, see the backend API"""
+    try:
+        ipr.link('add', ifname=ifname, kind='bridge', br_forward_delay=0,
+                 br_stp_state=0)
+    except pyroute2.NetlinkError as e:
+        if e.code != errno.EEXIST:
+            raise
+        return
+    ipr.link('set', index=get_index(ipr, ifname), state='up')
+
+
+def set_master(ipr, dev_index, master_index):
+    """Enslaves a device to the bridge master_index, 0 to release it"""
+    if master_index:
+        ipr.link('set', index=dev_index, master=master_index, state='up')
+        return
+    try:
+        ipr.link('set', index=dev_index, master=0)
+    except pyroute2.NetlinkError as e:
+        if e.code != errno.ENODEV:
+            raise
+
+
+def list_vlan_ids(ipr):
+    """Returns the set of the VLAN IDs of the VLAN devices"""
+    vlan_ids = set()
+    for link in ipr.get_links():
+        link_info = link.get_attr('IFLA_LINKINFO')
+        if link_info is None:
+            continue
+        if link_info.get_attr('IFLA_INFO_KIND') != 'vlan':
+            continue
+        vlan_ids.add(link_info.get_attr('IFLA_INFO_DATA').get_attr(
+            'IFLA_VLAN_ID'))
+    return vlan_ids
+
+
+class IPRouteBackend(base.NetlinkBackend):
+
+    def __init__(self):
+        self._ipr = None
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    @property
+    def ipr(self):
+        # NOTE: Created lazily for the same reason as drivers.utils.get_ipdb
+        if self._ipr is None:
+            self._ipr = pyroute2.IPRoute()
+        return self._ipr
+
+    @property
+    def index(self):
+        """The link index if enabled, started on first use, or None"""
+        if self._index is None and cfg.CONF.binding.netlink_link_index:
+            with self._index_lock:
+                if self._index is None:
+                    link_index = index.LinkIndex()
+                    try:
+                        link_index.start()
+                    except Exception:
+                        # Kept failed so that the start is not retried on
+                        # every lookup
+                        LOG.exception("Could not start the link index, the "
+                                      "links are looked up from the kernel")
+                    self._index = link_index
+        if self._index is not None and self._index.failed:
+            return None
+        return self._index
+
+    def get_index(self, ifname):
+        """Returns the index of the device named ifname or None"""
+        return get_index(self.ipr, ifname)
+
+    def _call_by_index(self, func, *ifnames):
+        """Calls func with the indexes of the devices named ifnames
+
+        The events of a just created device may not have reached the link
+        index yet, so a miss is confirmed with the kernel. A device may also
+        have been removed, and recreated with the same name, before the link
+        index processes the events, so the call is retried with the indexes
+        of the kernel when the devices of the link index are gone.
+        """
+        link_index = self.index
+        cached = [link_index.get_index(ifname) if link_index else None
+                  for ifname in ifnames]
+        indexes = [self.get_index(ifname) if dev_index is None else dev_index
+                   for ifname, dev_index in zip(ifnames, cached)]
+        try:
+            return func(*indexes)
+        except pyroute2.NetlinkError as e:
+            if e.code != errno.ENODEV:
+                raise
+            if all(dev_index is None for dev_index in cached):
+                raise
+        return func(*[self.get_index(ifname) for ifname in ifnames])
+
+    def create_veth_pair(self, ifname, peer, subnets, fixed_ips, mtu=None,
+                         hwaddr=None, netns=None):
+        create_veth_pair(self.ipr, ifname, peer, subnets, fixed_ips, mtu=mtu,
+                         hwaddr=hwaddr, netns=netns)
+
+    def create_link(self, ifname, kind, link, subnets, fixed_ips, mtu=None,
+                    hwaddr=None, netns=None, **attrs):
+        create_link(self.ipr, ifname, kind, link, subnets, fixed_ips,
+                    mtu=mtu, hwaddr=hwaddr, netns=netns, **attrs)
+
+    def remove_device(self, ifname, netns=None):
+        if netns is not None:
+            with netns_socket(netns) as ns_ipr:
+                return remove_device(ns_ipr, ifname)
+
+        def remove(dev_index):
+            if dev_index is None:
+                return None
+            self.ipr.link('del', index=dev_index)
+            return dev_index
+
+        try:
+            return self._call_by_index(remove, ifname)
+        except pyroute2.NetlinkError as e:
+            # The device may have been removed in the meantime
+            if e.code != errno.ENODEV:
+                raise
+            return None
+
+    def get_ifname_by_address(self, hwaddr):
+        if self.index is not None:
+            ifname = self.index.get_ifname_by_address(hwaddr)
+            if ifname is not None:
+                return ifname
+        for link in self.ipr.get_links():
+            if link.get_attr('IFLA_ADDRESS') == hwaddr:
+                return link.get_attr('IFLA_IFNAME')
+        return None
+
+    def add_veth_pair(self, ifname, peer):
+        self.ipr.link('add', ifname=ifname, kind='veth', peer=peer)
+
+    def rename_device(self, ifname, new_ifname):
+        def rename(dev_index):
+            if dev_index is None:
+                raise pyroute2.NetlinkError(errno.ENODEV)
+            self.ipr.link('set', index=dev_index, ifname=new_ifname)
+
+        self._call_by_index(rename, ifname)
+
+    def list_ifnames(self):
+        return [link.get_attr('IFLA_IFNAME')
+                for link in self.ipr.get_links()]
+
+    def ensure_bridge(self, ifname):
+        ensure_bridge(self.ipr, ifname)
+
+    def set_master(self, ifname, master):
+        if master is None:
+            def release(dev_index):
+                if dev_index is not None:
+                    self.ipr.link('set', index=dev_index, master=0)
+
+            try:
+                self._call_by_index(release, ifname)
+            except pyroute2.NetlinkError as e:
+                if e.code != errno.ENODEV:
+                    raise
+            return
+
+        def enslave(dev_index, master_index):
+            if dev_index is None or master_index is None:
+                raise pyroute2.NetlinkError(errno.ENODEV)
+            set_master(self.ipr, dev_index, master_index)
+
+        self._call_by_index(enslave, ifname, master)
+
+    def list_vlan_ids(self, netns=None):
+        if netns is not None:
+            with netns_socket(netns) as ns_ipr:
+                return list_vlan_ids(ns_ipr)
+        return list_vlan_ids(self.ipr)
+
+    def dump_links(self):
+        return self.ipr.get_links(), self.ipr.get_addr()
+
+    def _get_link_attr(self, ifname, attr):
+        def get(dev_index):
+            if dev_index is None:
+                return None
+            return self.ipr.get_links(dev_index)[0].get_attr(attr)
+
+        try:
+            return self._call_by_index(get, ifname)
+        except pyroute2.NetlinkError as e:
+            if e.code != errno.ENODEV:
+                raise
+            return None
+
+    def get_alias(self, ifname):
+        return self._get_link_attr(ifname, 'IFLA_IFALIAS')
+
+    def get_master(self, ifname):
+        return self._get_link_attr(ifname, 'IFLA_MASTER') or None
+
+    def set_alias(self, ifname, alias):
+        def set_alias(dev_index):
+            if dev_index is None:
+                raise pyroute2.NetlinkError(errno.ENODEV)
+            self.ipr.link('set', index=dev_index, ifalias=alias)
+
+        self._call_by_index(set_alias, ifname)
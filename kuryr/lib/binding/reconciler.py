@@ -0,0 +1,245 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Reconciliation of the veth bindings of the host with a desired state
+
+After a restart, a consumer gives the bindings it should have and the
+reconciler compares them with a single dump of the links and addresses of
+the host. Only the differences are then applied, in batches:
+
+* the ports without veth pair, or whose host end is not enslaved to a
+  bridge or to OVS anymore, are bound with ``port_bind_many``,
+* the container ends left in the default namespace with a wrong MTU,
+  hardware address, missing addresses or down are configured again,
+* with ``delete``, the veth pairs of no desired port that kuryr is known
+  to own are removed: the host ends with the binding fingerprint the veth
+  driver records in their alias, see ``[binding] rebind_fast_path``, and
+  the container ends left in the default namespace without host end. The
+  other ``tap`` veth devices, e.g. the Neutron DHCP and router ones or the
+  ones of other consumers, are kept. With the fast path disabled, the
+  default, no fingerprint is recorded and only the container ends can be
+  removed.
+
+When the host is already in the desired state nothing but the dump is done.
+Only the bindings of the veth driver are reconciled, the devices of the
+nested drivers are moved to the container namespaces and cannot be told
+apart from missing ones.
+"""
+import collections
+
+from oslo_config import cfg
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding.drivers import veth
+from kuryr.lib.binding import netlink
+from kuryr.lib.binding.netlink import iproute
+from kuryr.lib import constants
+
+LOG = log.getLogger(__name__)
+
+VETH_DRIVER = 'kuryr.lib.binding.drivers.veth'
+# Number of the operations of a kind applied at once
+BATCH_SIZE = 64
+
+Link = collections.namedtuple(
+    'Link', ['index', 'kind', 'mtu', 'address', 'up', 'peer_netns',
+             'addresses', 'alias', 'master'])
+
+Plan = collections.namedtuple('Plan', ['create', 'fix', 'delete'])
+Plan.__doc__ = """Operations bringing the host to the desired state
+
+:param create: the BindRequests of the ports to bind
+:param fix:    the BindRequests of the ports whose container end has to be
+               configured again
+:param delete: the names of the host ends of the veth pairs to remove
+"""
+
+
+def dump_links():
+    """Returns the links of the default namespace by name
+
+    They come from a single dump of the links and of the addresses through
+    the netlink backend.
+
+    :returns: a dict of the link names to Link tuples
+    """
+    link_msgs, addr_msgs = netlink.get_backend().dump_links()
+    addresses = collections.defaultdict(set)
+    for msg in addr_msgs:
+        addresses[msg['index']].add((msg.get_attr('IFA_ADDRESS'),
+                                     msg['prefixlen']))
+    links = {}
+    for msg in link_msgs:
+        linkinfo = msg.get_attr('IFLA_LINKINFO')
+        address = msg.get_attr('IFLA_ADDRESS')
+        links[msg.get_attr('IFLA_IFNAME')] = Link(
+            index=msg['index'],
+            kind=linkinfo.get_attr('IFLA_INFO_KIND') if linkinfo else None,
+            mtu=msg.get_attr('IFLA_MTU'),
+            address=address.lower() if address else None,
+            up=bool(msg['flags'] & iproute.IFF_UP),
+            peer_netns=msg.get_attr('IFLA_LINK_NETNSID'),
+            addresses=addresses[msg['index']],
+            alias=msg.get_attr('IFLA_IFALIAS'),
+            master=msg.get_attr('IFLA_MASTER') or None)
+    return links
+
+
+def _is_veth_request(request):
+    driver = request.driver or cfg.CONF.binding.default_driver
+    return driver == VETH_DRIVER
+
+
+def _needs_fix(request, link):
+    port = request.port
+    if not link.up:
+        return True
+    if link.mtu != utils.get_mtu_from_network(request.network):
+        return True
+    if link.address != port[utils.MAC_ADDRESS_KEY].lower():
+        return True
+    expected = set(utils.get_ip_prefixes(request.subnets,
+                                         port.get(utils.FIXED_IP_KEY, [])))
+    return not expected <= link.addresses
+
+
+def get_plan(requests, links):
+    """Compares the desired bindings with the links of the host
+
+    :param requests: an iterable of the BindRequests of the ports that
+                     should be bound, or of tuples with the same fields
+    :param links:    the links of the default namespace, as returned by
+                     dump_links
+    :returns: the Plan of the operations to apply
+    """
+    plan = Plan([], [], [])
+    desired = set()
+    for request in requests:
+        request = binding.BindRequest(*request)
+        if not _is_veth_request(request):
+            continue
+        host_ifname, container_ifname = utils.get_veth_pair_names(
+            request.port['id'])
+        desired.update((host_ifname, container_ifname))
+        host_link = links.get(host_ifname)
+        # The host binding may have been undone outside kuryr
+        if host_link is None or host_link.master is None:
+            plan.create.append(request)
+            continue
+        # A container end moved to its namespace cannot be checked here
+        container_link = links.get(container_ifname)
+        if container_link is None:
+            continue
+        if _needs_fix(request, container_link):
+            plan.fix.append(request)
+    for ifname, link in links.items():
+        # Only veth pairs, the tap devices of the instances are tun ones
+        if ifname in desired or link.kind != 'veth':
+            continue
+        if _is_stale(ifname, link, links):
+            plan.delete.append(ifname)
+    return plan
+
+
+def _is_stale(ifname, link, links):
+    """Tells whether a veth device not desired is a kuryr one to remove"""
+    if ifname.startswith(constants.VETH_PREFIX):
+        # Other consumers and Neutron agents name their veth devices alike
+        return (link.alias or '').startswith(veth.FINGERPRINT_PREFIX)
+    if not ifname.startswith(constants.CONTAINER_VETH_PREFIX):
+        return False
+    # Removing the host end of the pair removes the container end too, so a
+    # container end is only removed itself when its host end is elsewhere
+    suffix = ifname[len(constants.CONTAINER_VETH_PREFIX):]
+    return utils.get_veth_pair_names(suffix)[0] not in links
+
+
+def _batches(items):
+    for i in range(0, len(items), BATCH_SIZE):
+        yield items[i:i + BATCH_SIZE]
+
+
+def apply_plan(plan):
+    """Applies the operations of a plan in batches
+
+    An operation failing is logged and does not prevent the others.
+
+    :param plan: the Plan returned by get_plan
+    :returns: the dict of the ``created``, ``fixed``, ``deleted`` and
+              ``failed`` operation counts
+    """
+    backend = netlink.get_backend()
+    counts = {'created': 0, 'fixed': 0, 'deleted': 0, 'failed': 0}
+    for batch in _batches(plan.create):
+        for request, result in zip(batch, binding.port_bind_many(batch)):
+            if result.error is None:
+                counts['created'] += 1
+                continue
+            counts['failed'] += 1
+            LOG.warning("Binding port %(port)s failed: %(error)s",
+                        {'port': request.port['id'], 'error': result.error})
+    for batch in _batches(plan.fix):
+        for request in batch:
+            host_ifname, container_ifname = utils.get_veth_pair_names(
+                request.port['id'])
+            try:
+                # The existing pair is reused and only what differs is set
+                backend.create_veth_pair(
+                    host_ifname, container_ifname, request.subnets,
+                    request.port.get(utils.FIXED_IP_KEY, []),
+                    mtu=utils.get_mtu_from_network(request.network),
+                    hwaddr=request.port[utils.MAC_ADDRESS_KEY].lower())
+            except (pyroute2.NetlinkError, pyroute2.CommitException) as e:
+                counts['failed'] += 1
+                LOG.warning("Configuring %(ifname)s failed: %(error)s",
+                            {'ifname': container_ifname, 'error': e})
+            else:
+                counts['fixed'] += 1
+    for batch in _batches(plan.delete):
+        for ifname in batch:
+            try:
+                backend.remove_device(ifname)
+            except (pyroute2.NetlinkError, pyroute2.CommitException) as e:
+                counts['failed'] += 1
+                LOG.warning("Removing %(ifname)s failed: %(error)s",
+                            {'ifname': ifname, 'error': e})
+            else:
+                counts['deleted'] += 1
+    return counts
+
+
+def reconcile(requests, delete=False):
+    """Brings the veth bindings of the host to the desired state
+
+    :param requests: an iterable of the BindRequests of all the ports that
+                     should be bound on the host, or of tuples with the same
+                     fields
+    :param delete:   whether to remove the veth pairs kuryr owns of no
+                     desired port
+    :returns: the tuple of the Plan applied and of the operation counts
+              returned by apply_plan
+    """
+    if delete and not cfg.CONF.binding.rebind_fast_path:
+        LOG.warning("The binding fingerprints are not recorded with "
+                    "[binding] rebind_fast_path disabled, only the veth "
+                    "pairs bound with it enabled can be removed")
+    plan = get_plan(requests, dump_links())
+    if not delete:
+        plan = plan._replace(delete=[])
+    counts = apply_plan(plan)
+    if any(counts.values()):
+        LOG.info("Reconciled the veth bindings: %(created)d created, "
+                 "%(fixed)d fixed, %(deleted)d deleted, %(failed)d failed",
+                 counts)
+    return plan, counts
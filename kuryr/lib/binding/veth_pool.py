@@ -0,0 +1,182 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Warm pool of veth pairs created in advance for the veth driver
+
+The pairs are parked down and unconfigured under ``kph``/``kpc`` names. When
+a port is bound, a parked pair is renamed to the names returned by
+``drivers.utils.get_veth_pair_names`` and the driver only has to configure
+it. A background thread creates new pairs when the pool runs low.
+"""
+import collections
+import errno
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib.binding import netlink
+from kuryr.lib import constants
+from kuryr.lib import utils
+
+LOG = log.getLogger(__name__)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# Length of the random part of the parked pair names
+_SUFFIX_LEN = constants.NIC_NAME_LEN - len(constants.POOL_VETH_PREFIX)
+
+
+def get_pool():
+    """Returns the started veth pool, or None if it is disabled"""
+    global _POOL
+    if _POOL is None and cfg.CONF.binding.veth_pool_size:
+        with _POOL_LOCK:
+            if _POOL is None:
+                pool = VethPool(cfg.CONF.binding.veth_pool_size,
+                                cfg.CONF.binding.veth_pool_low_watermark)
+                pool.start()
+                _POOL = pool
+    return _POOL
+
+
+def _get_parked_names(suffix):
+    return (constants.POOL_VETH_PREFIX + suffix,
+            constants.POOL_CONTAINER_VETH_PREFIX + suffix)
+
+
+class VethPool(object):
+    """Pool of parked veth pairs
+
+    :param size:          the number of pairs the pool is filled up to
+    :param low_watermark: the pool is refilled when it holds fewer pairs
+    """
+
+    def __init__(self, size, low_watermark=0):
+        self.size = size
+        self.low_watermark = min(low_watermark, size)
+        self._pairs = collections.deque()
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.refills = 0
+        self.last_refill_latency = 0.0
+        self.total_refill_latency = 0.0
+
+    def start(self):
+        """Adopts the pairs parked by a previous run and starts refilling"""
+        self._adopt_parked_pairs()
+        self._thread = threading.Thread(target=self._refill_loop,
+                                        daemon=True)
+        self._thread.start()
+        self._refill_needed.set()
+
+    def _adopt_parked_pairs(self):
+        ifnames = set(netlink.get_backend().list_ifnames())
+        prefix = constants.POOL_VETH_PREFIX
+        for ifname in ifnames:
+            if ifname and ifname.startswith(prefix):
+                pair = _get_parked_names(ifname[len(prefix):])
+                if pair[1] in ifnames:
+                    self._pairs.append(pair)
+        if self._pairs:
+            LOG.info("Adopted %d parked veth pairs", len(self._pairs))
+
+    def take(self, ifname, peer):
+        """Renames a parked pair to ifname and peer
+
+        :returns: True if a parked pair now has the requested names, False
+                  if the pool is empty or the names are already in use, in
+                  which case the caller has to create the pair itself
+        """
+        with self._lock:
+            pair = self._pairs.popleft() if self._pairs else None
+            if pair is None:
+                self.misses += 1
+            if len(self._pairs) < self.low_watermark or not self._pairs:
+                self._refill_needed.set()
+        if pair is None:
+            return False
+
+        backend = netlink.get_backend()
+        try:
+            backend.rename_device(pair[0], ifname)
+        except (pyroute2.NetlinkError, pyroute2.CommitException) as e:
+            # NOTE: IPDB does not tell why a commit failed, assume as for
+            # EEXIST that the port is being rebound and its pair exists.
+            if getattr(e, 'code', errno.EEXIST) == errno.EEXIST:
+                with self._lock:
+                    self._pairs.appendleft(pair)
+                    self.misses += 1
+                return False
+            LOG.warning("Dropping parked veth pair %s: %s", pair[0], e)
+            backend.remove_device(pair[0])
+            with self._lock:
+                self.misses += 1
+            return False
+        try:
+            backend.rename_device(pair[1], peer)
+        except (pyroute2.NetlinkError, pyroute2.CommitException) as e:
+            LOG.warning("Dropping parked veth pair %s: %s", pair[1], e)
+            backend.remove_device(ifname)
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            try:
+                self._refill()
+            except Exception:
+                LOG.exception("Error happened while refilling the veth pool")
+
+    def _refill(self):
+        backend = netlink.get_backend()
+        start = time.monotonic()
+        created = 0
+        while len(self._pairs) < self.size:
+            pair = _get_parked_names(utils.get_random_string(_SUFFIX_LEN))
+            backend.add_veth_pair(*pair)
+            with self._lock:
+                self._pairs.append(pair)
+                self.created += 1
+            created += 1
+        if created:
+            latency = time.monotonic() - start
+            with self._lock:
+                self.refills += 1
+                self.last_refill_latency = latency
+                self.total_refill_latency += latency
+
+    def get_metrics(self):
+        """Returns the pool metrics as a dictionary"""
+        with self._lock:
+            return {
+                'available': len(self._pairs),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'created': self.created,
+                'refills': self.refills,
+                'last_refill_latency': self.last_refill_latency,
+                'total_refill_latency': self.total_refill_latency,
+            }
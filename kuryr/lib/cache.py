@@ -0,0 +1,202 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Read-through cache of the Neutron ports, subnets and networks
+
+The binding drivers take the full Neutron port, subnets and network dicts.
+Subnets and networks barely change, so the consumers binding many ports can
+get them from the cache rather than from Neutron for each port::
+
+    neutron_cache = cache.get_neutron_cache()
+    port = neutron_cache.get_port(port_id)
+    subnets = neutron_cache.get_subnets(
+        [ip['subnet_id'] for ip in port['fixed_ips']])
+
+The cached objects expire after ``[neutron] cache_ttl`` seconds and the
+least recently used ones are evicted beyond ``[neutron] cache_size``
+objects. A caller knowing the revision number of an object, e.g. from a
+notification, gets it from Neutron again when the cached one is older.
+The callers get copies of the cached objects and may modify them.
+"""
+import collections
+import copy
+import threading
+import time
+
+from oslo_config import cfg
+
+from kuryr.lib import utils
+
+PORT = 'port'
+SUBNET = 'subnet'
+NETWORK = 'network'
+_COLLECTIONS = {PORT: 'ports', SUBNET: 'subnets', NETWORK: 'networks'}
+# Maximum number of the IDs of a list request, to bound the URI length
+BATCH_SIZE = 100
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _revision(obj):
+    return obj.get('revision_number', -1)
+
+
+class NeutronCache(object):
+    """LRU cache of Neutron objects with a time to live
+
+    :param client:   the Neutron client to fetch the objects with, by default
+                     the one of get_neutron_client
+    :param ttl:      the seconds the objects are cached for, by default
+                     ``[neutron] cache_ttl``
+    :param max_size: the maximum number of objects cached, by default
+                     ``[neutron] cache_size``
+    """
+
+    def __init__(self, client=None, ttl=None, max_size=None):
+        self._client = client
+        self.ttl = cfg.CONF.neutron.cache_ttl if ttl is None else ttl
+        self.max_size = (cfg.CONF.neutron.cache_size if max_size is None
+                         else max_size)
+        # (resource, id) to (expiry, object), the least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = utils.get_neutron_client()
+        return self._client
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, resource, id, revision_number=None):
+        key = (resource, id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expiry, obj = entry
+                if revision_number is None:
+                    revision_number = -1
+                if expiry <= time.monotonic():
+                    del self._entries[key]
+                elif _revision(obj) < revision_number:
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return obj
+            self.misses += 1
+            return None
+
+    def update(self, resource, obj):
+        """Caches an object unless an object of a later revision is cached
+
+        :param resource: PORT, SUBNET or NETWORK
+        :param obj:      the Neutron object dict
+        """
+        key = (resource, obj['id'])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and _revision(entry[1]) > _revision(obj):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, obj)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, resource, id):
+        """Drops an object from the cache, e.g. after it is deleted"""
+        with self._lock:
+            self._entries.pop((resource, id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, resource, id, revision_number=None):
+        """Returns an object from the cache, fetching it on a miss
+
+        :param resource:        PORT, SUBNET or NETWORK
+        :param id:              the ID of the object
+        :param revision_number: the minimum revision number the object
+                                must have, a cached object with a lower one
+                                is fetched again
+        """
+        obj = self._lookup(resource, id, revision_number)
+        if obj is None:
+            obj = getattr(self.client, 'show_' + resource)(id)[resource]
+            self.update(resource, obj)
+        return copy.deepcopy(obj)
+
+    def get_many(self, resource, ids):
+        """Returns objects from the cache, fetching the missing ones at once
+
+        :returns: the list of the objects in the order of ids, without the
+                  ones that do not exist in Neutron
+        """
+        found = {}
+        for id in ids:
+            obj = self._lookup(resource, id)
+            if obj is not None:
+                found[id] = obj
+        missing = [id for id in ids if id not in found]
+        collection = _COLLECTIONS[resource]
+        for i in range(0, len(missing), BATCH_SIZE):
+            listed = getattr(self.client, 'list_' + collection)(
+                id=missing[i:i + BATCH_SIZE])
+            for obj in listed[collection]:
+                self.update(resource, obj)
+                found[obj['id']] = obj
+        return [copy.deepcopy(found[id]) for id in ids if id in found]
+
+    def get_port(self, port_id, revision_number=None):
+        return self.get(PORT, port_id, revision_number)
+
+    def get_subnet(self, subnet_id, revision_number=None):
+        return self.get(SUBNET, subnet_id, revision_number)
+
+    def get_network(self, network_id, revision_number=None):
+        return self.get(NETWORK, network_id, revision_number)
+
+    def get_subnets(self, subnet_ids):
+        return self.get_many(SUBNET, subnet_ids)
+
+    def prefetch_network(self, network_id, ports=True):
+        """Caches a network with all its subnets and, optionally, ports
+
+        It takes three Neutron requests whatever the number of the subnets
+        and ports of the network.
+
+        :param network_id: the ID of the network
+        :param ports:      whether to cache the ports of the network too
+        """
+        self.update(NETWORK, self.client.show_network(network_id)[NETWORK])
+        subnets = self.client.list_subnets(network_id=network_id)
+        for subnet in subnets['subnets']:
+            self.update(SUBNET, subnet)
+        if ports:
+            for port in self.client.list_ports(
+                    network_id=network_id)['ports']:
+                self.update(PORT, port)
+
+
+def get_neutron_cache():
+    """Returns the Neutron cache of the process"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NeutronCache()
+    return _cache
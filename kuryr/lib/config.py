@@ -64,6 +64,48 @@ neutron_opts = [
                help=_('Type of the neutron endpoint to use. This endpoint '
                       'will be looked up in the keystone catalog and should '
                       'be one of public, internal or admin.')),
+    cfg.IntOpt('connection_pool_size',
+               default=10,
+               min=1,
+               help=_('Maximum number of HTTP connections the Neutron client '
+                      'of a process keeps open to each Neutron and Keystone '
+                      'endpoint.')),
+    cfg.IntOpt('token_refresh_margin',
+               default=120,
+               min=0,
+               help=_('Seconds before its expiry the Keystone token of the '
+                      'Neutron client is renewed, so that requests are not '
+                      'sent with a token about to expire.')),
+    cfg.IntOpt('cache_ttl',
+               default=300,
+               min=0,
+               help=_('Seconds the Neutron ports, subnets and networks are '
+                      'kept in the cache of kuryr.lib.cache.')),
+    cfg.IntOpt('cache_size',
+               default=4096,
+               min=1,
+               help=_('Maximum number of Neutron objects kept in the cache '
+                      'of kuryr.lib.cache, the least recently used ones are '
+                      'evicted first.')),
+    cfg.BoolOpt('coalesce_requests',
+                default=False,
+                help=_('Whether the concurrent identical read requests made '
+                       'with the Neutron client of get_neutron_client are '
+                       'sent once, their result being shared by all their '
+                       'callers.')),
+    cfg.IntOpt('port_pool_size',
+               default=0,
+               min=0,
+               help=_('Number of Neutron ports kept created in advance per '
+                      'network, project and security groups by the port '
+                      'pool, so that getting a port does not wait for its '
+                      'creation. 0 disables the pool.')),
+    cfg.IntOpt('port_pool_low_watermark',
+               default=0,
+               min=0,
+               help=_('The ports of a network, project and security groups '
+                      'are refilled up to port_pool_size as soon as the pool '
+                      'holds fewer of them than this.')),
 ]
 
 binding_opts = [
@@ -83,6 +125,91 @@ binding_opts = [
                help=_('Specifies the name of the Nova instance interface to '
                       'link the virtual devices to (only applicable to some '
                       'binding drivers.')),
+    cfg.StrOpt('netlink_backend',
+               default='ipdb',
+               choices=['ipdb', 'iproute'],
+               help=_('Netlink backend the binding drivers use to manage the '
+                      'host devices. "ipdb" keeps a full mirror of the host '
+                      'links, addresses and routes in memory while '
+                      '"iproute" only sends the netlink requests the '
+                      'drivers need.')),
+    cfg.BoolOpt('netlink_link_index',
+                default=True,
+                help=_('Keep an index of the host links names, indexes and '
+                       'hardware addresses up to date from netlink events '
+                       'instead of looking them up in a dump of all the '
+                       'host links. Only used by the "iproute" netlink '
+                       'backend.')),
+    cfg.IntOpt('veth_pool_size',
+               default=0,
+               min=0,
+               help=_('Number of veth pairs the veth driver keeps created '
+                      'in advance so that binding a port only has to rename '
+                      'and configure one. 0 disables the pool.')),
+    cfg.IntOpt('veth_pool_low_watermark',
+               default=0,
+               min=0,
+               help=_('The veth pool is refilled up to veth_pool_size as '
+                      'soon as it holds fewer pairs than this.')),
+    cfg.ListOpt('enabled_vif_plugins',
+                default=[],
+                help=_('vif_types whose ports are bound by the in-process '
+                       'plugin registered for them under the '
+                       '"kuryr.vif_types" entry points instead of by their '
+                       'binding script. kuryr-lib provides the "ovs" and '
+                       '"bridge" plugins.')),
+    cfg.BoolOpt('rebind_fast_path',
+                default=False,
+                help=_('Whether the veth driver records a fingerprint of '
+                       'each binding in the alias of its host device and '
+                       'skips binding again a port whose device has the '
+                       'fingerprint of the requested binding and is still '
+                       'enslaved to a bridge or to OVS. It costs a netlink '
+                       'read and write on the first binding of each port.')),
+    cfg.StrOpt('segmentation_driver',
+               default='',
+               help=_('Segmentation driver allocating the segmentation IDs, '
+                      '"vlan" for VLAN IDs or "vni" for VXLAN and Geneve '
+                      'VNIs. Empty to use the one matching the default '
+                      'binding driver.')),
+    cfg.StrOpt('segmentation_state_path',
+               default='',
+               help=_('Path of a file the VLAN segmentation driver keeps the '
+                      'allocated VLAN IDs in, so that the kuryr processes of '
+                      'a node using the same file allocate from the same '
+                      'VLAN IDs and find the IDs they allocated after a '
+                      'restart, e.g. /var/lib/kuryr/vlans. The pools of the '
+                      'other trunk parents are kept in files named after '
+                      'this one and the pool key. Empty to keep them in the '
+                      'memory of each process.')),
+    cfg.StrOpt('helper_socket',
+               default='',
+               help=_('Unix socket of the kuryr-binding-helper to run the '
+                      'binding executables in instead of forking them. '
+                      'Empty to fork them.')),
+    cfg.IntOpt('helper_concurrency',
+               default=16,
+               min=1,
+               help=_('Maximum number of binding executables the binding '
+                      'helper runs at once.')),
+    cfg.IntOpt('helper_timeout',
+               default=60,
+               min=1,
+               help=_('Timeout in seconds after which the binding helper '
+                      'kills a binding executable.')),
+    cfg.StrOpt('ovsdb_connection',
+               default='unix:/var/run/openvswitch/db.sock',
+               help=_('The OVSDB server the "ovs" vif plugin connects to, as '
+                      'unix:<path> or tcp:<host>:<port>.')),
+    cfg.IntOpt('ovsdb_timeout',
+               default=10,
+               min=1,
+               help=_('Timeout in seconds of the OVSDB requests of the '
+                      '"ovs" vif plugin.')),
+    cfg.StrOpt('ovs_integration_bridge',
+               default='br-int',
+               help=_('The OVS bridge the "ovs" vif plugin adds the ports '
+                      'to.')),
 ]
 
 binding_group = cfg.OptGroup(
@@ -18,11 +18,21 @@ DEVICE_OWNER = 'compute:kuryr'
 NIC_NAME_LEN = 14
 VETH_PREFIX = 'tap'
 CONTAINER_VETH_PREFIX = 't_c'
+# Names of the parked veth pairs of the warm pool
+POOL_VETH_PREFIX = 'kph'
+POOL_CONTAINER_VETH_PREFIX = 'kpc'
+# Name prefix of the pre-created Neutron ports of the port pool, followed by
+# the host name
+POOL_PORT_PREFIX = 'kuryr-pool-'
 
 # For VLAN type segmentation
 MIN_VLAN_TAG = 1
 MAX_VLAN_TAG = 4094
 
+# For VXLAN and Geneve type segmentation
+MIN_VNI = 1
+MAX_VNI = 2 ** 24 - 1
+
 BINDING_SUBCOMMAND = 'bind'
 DEFAULT_NETWORK_MTU = 1500
 FALLBACK_VIF_TYPE = 'unbound'
@@ -104,6 +104,14 @@ class SegmentationIdAllocationFailure(KuryrException):
     """
 
 
+class SegmentationStateFailure(KuryrException):
+    """Exception represents the segmentation state file is not usable.
+
+    This exception is thrown when the file sharing the allocated segmentation
+    ids between processes has not the expected format or id range.
+    """
+
+
 class SegmentationDriverBindingDriverCompatibilityFailure(KuryrException):
     """Exception represents when no segmentation type driver is loaded.
 
@@ -0,0 +1,298 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Pool of Neutron ports created in advance
+
+Creating a Neutron port is the slowest step of starting a container. The
+pool keeps ports of ``compute:kuryr`` created per network, project and
+security groups, named ``kuryr-pool-<host>`` and without device, and hands
+them out on demand. A background thread creates the missing ones with bulk
+requests when a pool runs low. The ports of the host left in the pools by a
+previous run are adopted when the pool starts.
+
+The ports handed out must be given a ``device_id``, e.g. through the
+``updates`` of get_port, or they are adopted again after a restart.
+
+Neutron fills the security groups of the ports created without any, so the
+security groups the ports are pooled for are recorded in their description
+and the ports are always put back in the pool they were taken from.
+"""
+import collections
+import json
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import excutils
+
+from kuryr.lib import constants
+from kuryr.lib import utils
+
+LOG = log.getLogger(__name__)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+# Prefix of the description recording the security groups of the pool
+_DESCRIPTION_PREFIX = 'kuryr-pool security_groups='
+
+
+def get_pool():
+    """Returns the started port pool, or None if it is disabled"""
+    global _POOL
+    if _POOL is None and cfg.CONF.neutron.port_pool_size:
+        with _POOL_LOCK:
+            if _POOL is None:
+                pool = PortPool(cfg.CONF.neutron.port_pool_size,
+                                cfg.CONF.neutron.port_pool_low_watermark)
+                pool.start()
+                _POOL = pool
+    return _POOL
+
+
+def get_pool_port_name():
+    """Returns the name of the ports in the pools of the host"""
+    return constants.POOL_PORT_PREFIX + utils.get_hostname()
+
+
+def _get_key(network_id, project_id, security_groups):
+    if security_groups is not None:
+        security_groups = tuple(sorted(security_groups))
+    return network_id, project_id, security_groups
+
+
+def _get_description(key):
+    security_groups = key[2]
+    if security_groups is not None:
+        security_groups = list(security_groups)
+    return _DESCRIPTION_PREFIX + json.dumps(security_groups)
+
+
+def _get_port_key(port):
+    """Returns the key of the pool a port was created for"""
+    security_groups = port.get('security_groups')
+    description = port.get('description') or ''
+    if description.startswith(_DESCRIPTION_PREFIX):
+        try:
+            security_groups = json.loads(
+                description[len(_DESCRIPTION_PREFIX):])
+        except ValueError:
+            pass
+    return _get_key(port['network_id'], port['project_id'],
+                    security_groups)
+
+
+class PortPool(object):
+    """Pools of Neutron ports, one per network, project and security groups
+
+    :param size:          the number of ports each pool is filled up to
+    :param low_watermark: a pool is refilled when it holds fewer ports
+    :param client:        the Neutron client, by default
+                          get_neutron_client()
+    """
+
+    def __init__(self, size, low_watermark=0, client=None):
+        self.size = size
+        self.low_watermark = min(low_watermark, size)
+        self._client = client
+        self._ports = collections.defaultdict(collections.deque)
+        # The IDs of the default security groups by project ID
+        self._default_security_groups = {}
+        self._lock = threading.Lock()
+        self._refill_keys = set()
+        self._refill_needed = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.recycled = 0
+        self.reclaimed = 0
+        self.refills = 0
+        self.last_refill_latency = 0.0
+        self.total_refill_latency = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = utils.get_neutron_client()
+        return self._client
+
+    def start(self):
+        """Adopts the ports pooled by a previous run and starts refilling"""
+        self.reclaim()
+        self._thread = threading.Thread(target=self._refill_loop,
+                                        daemon=True)
+        self._thread.start()
+
+    def reclaim(self):
+        """Adopts the unused pool ports of the host found in Neutron"""
+        reclaimed = 0
+        for port in utils.iter_ports(self.client,
+                                     device_owner=constants.DEVICE_OWNER,
+                                     name=get_pool_port_name()):
+            if port.get('device_id'):
+                continue
+            with self._lock:
+                self._ports[_get_port_key(port)].append(port)
+            reclaimed += 1
+        if reclaimed:
+            with self._lock:
+                self.reclaimed += reclaimed
+            LOG.info("Adopted %d pooled Neutron ports", reclaimed)
+
+    def get_port(self, network_id, project_id, security_groups=None,
+                 updates=None):
+        """Returns a port of the network, from the pool when possible
+
+        :param network_id:      the ID of the network of the port
+        :param project_id:      the ID of the project of the port
+        :param security_groups: the IDs of the security groups of the port,
+                                the default one of the project if None
+        :param updates:         the attributes to update the port with, e.g.
+                                its ``device_id`` and ``name``
+        :returns: the Neutron port dict
+        """
+        key = _get_key(network_id, project_id, security_groups)
+        with self._lock:
+            ports = self._ports[key]
+            port = ports.popleft() if ports else None
+            if port is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if len(ports) < self.low_watermark or not ports:
+                self._refill_keys.add(key)
+                self._refill_needed.set()
+        if port is None:
+            body = self._get_port_body(key)
+            if updates:
+                body.update(updates)
+            port = self.client.create_port({'port': body})['port']
+        elif updates:
+            try:
+                port = self.client.update_port(port['id'],
+                                               {'port': updates})['port']
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._delete_port(port['id'])
+        return port
+
+    def _delete_port(self, port_id):
+        try:
+            self.client.delete_port(port_id)
+        except Exception as e:
+            LOG.warning("Could not delete the pool port %(port)s: "
+                        "%(error)s", {'port': port_id, 'error': e})
+
+    def release_port(self, port):
+        """Puts a port back in its pool, or deletes it if the pool is full
+
+        :param port: the Neutron port dict got from get_port
+        """
+        key = _get_port_key(port)
+        with self._lock:
+            full = len(self._ports[key]) >= self.size
+        if full:
+            self.client.delete_port(port['id'])
+            return
+        # Resets what get_port callers may have updated, the port must
+        # match the pool it is put back in
+        port = self.client.update_port(port['id'], {'port': {
+            'name': get_pool_port_name(),
+            'description': _get_description(key),
+            'device_id': '',
+            'device_owner': constants.DEVICE_OWNER,
+            'binding:host_id': '',
+            'binding:profile': {},
+            'admin_state_up': True,
+            'allowed_address_pairs': [],
+            'security_groups': self._get_security_groups(key),
+        }})['port']
+        with self._lock:
+            self._ports[key].append(port)
+            self.recycled += 1
+
+    def _get_security_groups(self, key):
+        """Returns the IDs of the security groups of the pool of a key"""
+        network_id, project_id, security_groups = key
+        if security_groups is not None:
+            return list(security_groups)
+        with self._lock:
+            default = self._default_security_groups.get(project_id)
+        if default is None:
+            default = [sg['id'] for sg in self.client.list_security_groups(
+                name='default', project_id=project_id,
+                fields=['id'])['security_groups']]
+            with self._lock:
+                self._default_security_groups[project_id] = default
+        return default
+
+    def _get_port_body(self, key):
+        network_id, project_id, security_groups = key
+        body = {
+            'name': get_pool_port_name(),
+            'description': _get_description(key),
+            'network_id': network_id,
+            'project_id': project_id,
+            'device_owner': constants.DEVICE_OWNER,
+            'admin_state_up': True,
+        }
+        if security_groups is not None:
+            body['security_groups'] = list(security_groups)
+        return body
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            with self._lock:
+                keys = self._refill_keys
+                self._refill_keys = set()
+            for key in keys:
+                try:
+                    self._refill(key)
+                except Exception:
+                    LOG.exception("Error happened while refilling the port "
+                                  "pool of network %s", key[0])
+
+    def _refill(self, key):
+        with self._lock:
+            count = self.size - len(self._ports[key])
+        if count <= 0:
+            return
+        start = time.monotonic()
+        body = self._get_port_body(key)
+        ports = self.client.create_port(
+            {'ports': [dict(body) for _ in range(count)]})['ports']
+        latency = time.monotonic() - start
+        with self._lock:
+            self._ports[key].extend(ports)
+            self.created += len(ports)
+            self.refills += 1
+            self.last_refill_latency = latency
+            self.total_refill_latency += latency
+
+    def get_metrics(self):
+        """Returns the pool metrics as a dictionary"""
+        with self._lock:
+            return {
+                'available': sum(len(p) for p in self._ports.values()),
+                'pools': len(self._ports),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'created': self.created,
+                'recycled': self.recycled,
+                'reclaimed': self.reclaimed,
+                'refills': self.refills,
+                'last_refill_latency': self.last_refill_latency,
+                'total_refill_latency': self.total_refill_latency,
+            }
@@ -0,0 +1,241 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Waiting for Neutron ports to become ACTIVE
+
+A single thread polls the status of all the ports being waited for with one
+``list_ports`` request per interval, whatever the number of the waiters.
+The interval grows while no port becomes active and is reset when one does
+or when a new port is waited for. The ``[neutron] vif_plugging_timeout``
+and ``vif_plugging_is_fatal`` options tell how long to wait and whether a
+port not becoming active is an error.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+
+from kuryr.lib import constants
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+
+LOG = log.getLogger(__name__)
+
+POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 5.0
+# Maximum number of port IDs per list_ports request, to bound its URL
+BATCH_SIZE = 100
+
+_WAITER = None
+_WAITER_LOCK = threading.Lock()
+
+
+def get_waiter():
+    """Returns the port waiter of the process"""
+    global _WAITER
+    if _WAITER is None:
+        with _WAITER_LOCK:
+            if _WAITER is None:
+                _WAITER = PortWaiter()
+    return _WAITER
+
+
+class PortWaiter(object):
+    """Waits for many Neutron ports to become ACTIVE with batched polls
+
+    :param client:            the Neutron client, by default
+                              get_neutron_client()
+    :param interval:          the seconds between the first polls
+    :param max_interval:      the seconds the interval grows up to while
+                              no port becomes active
+    """
+
+    def __init__(self, client=None, interval=POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL):
+        self._client = client
+        self.interval = interval
+        self.max_interval = max_interval
+        # Port IDs to the futures of their waiters
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.polls = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = utils.get_neutron_client()
+        return self._client
+
+    def watch(self, port_id):
+        """Starts waiting for a port
+
+        :returns: a concurrent.futures.Future whose result is the port ID
+                  once the port is ACTIVE. It fails with NoResourceException
+                  if the port is deleted.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._pending.setdefault(port_id, []).append(future)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll_loop,
+                                                daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return future
+
+    def unwatch(self, port_id, future):
+        """Stops waiting for a port with the future watch returned"""
+        with self._lock:
+            futures = self._pending.get(port_id, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self._pending.pop(port_id, None)
+
+    def wait(self, port_ids, timeout=None):
+        """Waits for ports to become ACTIVE
+
+        :param port_ids: the IDs of the ports to wait for
+        :param timeout:  the seconds to wait for, by default
+                         ``[neutron] vif_plugging_timeout``. The ports are
+                         not waited for if it is 0.
+        :returns: the set of the IDs of the ports that are not ACTIVE
+        :raises: InactiveResourceException if a port is not ACTIVE in time
+                 and ``[neutron] vif_plugging_is_fatal`` is set
+        :raises: NoResourceException if a port is deleted
+        """
+        if timeout is None:
+            timeout = cfg.CONF.neutron.vif_plugging_timeout
+        port_ids = set(port_ids)
+        if not timeout or not port_ids:
+            return set()
+        futures = {port_id: self.watch(port_id) for port_id in port_ids}
+        done, not_done = concurrent.futures.wait(futures.values(), timeout)
+        inactive = set()
+        for port_id, future in futures.items():
+            if future in not_done:
+                self.unwatch(port_id, future)
+                inactive.add(port_id)
+        for future in done:
+            # Raises NoResourceException for the deleted ports
+            future.result()
+        return self._check_inactive(inactive, timeout)
+
+    async def async_wait(self, port_ids, timeout=None):
+        """Waits for ports to become ACTIVE without blocking the event loop
+
+        See wait for the parameters.
+        """
+        if timeout is None:
+            timeout = cfg.CONF.neutron.vif_plugging_timeout
+        port_ids = set(port_ids)
+        if not timeout or not port_ids:
+            return set()
+        futures = {port_id: self.watch(port_id) for port_id in port_ids}
+        wrapped = {asyncio.wrap_future(f): port_id
+                   for port_id, f in futures.items()}
+        done, not_done = await asyncio.wait(wrapped, timeout=timeout)
+        inactive = set()
+        for future in not_done:
+            port_id = wrapped[future]
+            self.unwatch(port_id, futures[port_id])
+            future.cancel()
+            inactive.add(port_id)
+        for future in done:
+            future.result()
+        return self._check_inactive(inactive, timeout)
+
+    @staticmethod
+    def _check_inactive(inactive, timeout):
+        if inactive and cfg.CONF.neutron.vif_plugging_is_fatal:
+            raise exceptions.InactiveResourceException(
+                'Ports {0} did not become ACTIVE in {1} seconds.'.format(
+                    ', '.join(sorted(inactive)), timeout))
+        if inactive:
+            LOG.warning("Ports %(ports)s did not become ACTIVE in "
+                        "%(timeout)s seconds",
+                        {'ports': ', '.join(sorted(inactive)),
+                         'timeout': timeout})
+        return inactive
+
+    def _poll_loop(self):
+        interval = self.interval
+        last_poll = time.monotonic()
+        while True:
+            timeout = last_poll + interval - time.monotonic()
+            if timeout > 0 and self._wakeup.wait(timeout):
+                # A new port is waited for, it may become active soon, so
+                # the backoff is reset but the current tick still ends
+                # before the next poll
+                self._wakeup.clear()
+                interval = self.interval
+                continue
+            with self._lock:
+                port_ids = list(self._pending)
+                if not port_ids:
+                    self._thread = None
+                    return
+            last_poll = time.monotonic()
+            try:
+                progress = self._poll(port_ids)
+            except Exception:
+                LOG.exception("Error happened while polling the status of "
+                              "%d ports", len(port_ids))
+                progress = False
+            if progress:
+                interval = self.interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+    def _poll(self, port_ids):
+        """Resolves the waiters of the ports now ACTIVE or deleted
+
+        :returns: whether a waiter was resolved
+        """
+        statuses = {}
+        for i in range(0, len(port_ids), BATCH_SIZE):
+            batch = port_ids[i:i + BATCH_SIZE]
+            ports = self.client.list_ports(id=batch,
+                                           fields=['id', 'status'])['ports']
+            statuses.update((p['id'], p['status']) for p in ports)
+        self.polls += 1
+        resolved = []
+        with self._lock:
+            for port_id in port_ids:
+                status = statuses.get(port_id)
+                if status == constants.PORT_STATUS_ACTIVE or status is None:
+                    futures = self._pending.pop(port_id, [])
+                    resolved.append((port_id, status, futures))
+        for port_id, status, futures in resolved:
+            for future in futures:
+                try:
+                    if status is None:
+                        future.set_exception(exceptions.NoResourceException(
+                            'Port {0} was deleted.'.format(port_id)))
+                    else:
+                        future.set_result(port_id)
+                except concurrent.futures.InvalidStateError:
+                    # The waiter gave up and cancelled it
+                    pass
+        return bool(resolved)
+
+
+def wait_for_active(port_ids, timeout=None):
+    """Waits for ports to become ACTIVE with the port waiter of the process
+
+    See PortWaiter.wait.
+    """
+    return get_waiter().wait(port_ids, timeout)
@@ -9,6 +9,8 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import threading
+
 from oslo_config import cfg
 from oslo_utils import importutils
 
@@ -16,36 +18,72 @@ from kuryr.lib import exceptions as ex
 
 BASE_PATH = 'kuryr.lib.segmentation_type_drivers'
 
-_driver = ""
+# Segmentation driver names to the modules of their SegmentationDriver
+DRIVERS = {
+    'vlan': 'vlan',
+    'vni': 'vni',
+}
+
+# Binding driver names to the segmentation driver they use by default
+BINDING_DRIVERS = {
+    'vlan': 'vlan',
+}
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def _get_driver_name():
+    driver_name = cfg.CONF.binding.segmentation_driver
+    if driver_name:
+        return driver_name
+    binding_driver = cfg.CONF.binding.default_driver.rsplit('.', 1)[1]
+    return BINDING_DRIVERS.get(binding_driver)
 
 
 def _get_driver():
     global _driver
-    if not _driver:
-        driver_name = cfg.CONF.binding.default_driver.rsplit('.', 1)[1]
-
-        # REVISIT(vikasc): Need to remove this if check
-        if driver_name == 'vlan':
-            seg_driver_path = '.'.join([BASE_PATH, driver_name])
-            segmentation_driver = importutils.import_module(seg_driver_path)
-            _driver = segmentation_driver.SegmentationDriver()
-    return _driver
-
-
-def allocate_segmentation_id(allocated_ids=set()):
-    """Allocates a segmentation ID."""
-    driver = _get_driver()
-    try:
-        id = driver.allocate_segmentation_id(allocated_ids)
-    except NameError:
-        raise ex.SegmentationDriverBindingDriverCompatibilityFailure
-    return id
-
-
-def release_segmentation_id(id):
-    """Releases the segmentation ID."""
-    driver = _get_driver()
-    try:
-        driver.release_segmentation_id(id)
-    except NameError:
-        raise ex.SegmentationDriverBindingDriverCompatibilityFailure
+    if _driver:
+        return _driver
+    with _driver_lock:
+        if _driver:
+            return _driver
+        driver_name = _get_driver_name()
+        if driver_name not in DRIVERS:
+            raise ex.SegmentationDriverBindingDriverCompatibilityFailure(
+                'No segmentation driver named {0!r}.'.format(driver_name))
+        seg_driver_path = '.'.join([BASE_PATH, DRIVERS[driver_name]])
+        segmentation_driver = importutils.import_module(seg_driver_path)
+        _driver = segmentation_driver.SegmentationDriver()
+        return _driver
+
+
+def allocate_segmentation_id(allocated_ids=set(), pool_key=None):
+    """Allocates a segmentation ID from the pool of pool_key."""
+    return _get_driver().allocate_segmentation_id(allocated_ids, pool_key)
+
+
+def allocate_segmentation_ids(count, allocated_ids=set(), pool_key=None):
+    """Allocates count segmentation IDs at once from the pool of pool_key."""
+    return _get_driver().allocate_segmentation_ids(count, allocated_ids,
+                                                   pool_key)
+
+
+def release_segmentation_id(id, pool_key=None):
+    """Releases the segmentation ID to the pool of pool_key."""
+    _get_driver().release_segmentation_id(id, pool_key)
+
+
+def release_segmentation_ids(ids, pool_key=None):
+    """Releases segmentation IDs at once to the pool of pool_key."""
+    _get_driver().release_segmentation_ids(ids, pool_key)
+
+
+def get_segmentation_pool_usage():
+    """Returns the allocated and available IDs counts of each pool."""
+    return _get_driver().get_pool_usage()
+
+
+def reconcile_segmentation_ids(netns=None, pool_key=None):
+    """Resynchronizes the allocated segmentation IDs with the host."""
+    return _get_driver().reconcile(netns, pool_key)
@@ -0,0 +1,542 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import bisect
+import collections
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from oslo_log import log
+
+from kuryr.lib import exceptions
+
+LOG = log.getLogger(__name__)
+
+
+class BitmapAllocator(object):
+    """Allocates IDs of a range from a bitmap of the allocated ones
+
+    The IDs never allocated are handed out in order from a cursor and the
+    released ones are queued in a free list, so that allocating and
+    releasing an ID take constant time. All the operations are thread safe.
+
+    :param min_id: the lowest ID of the range
+    :param max_id: the highest ID of the range
+    """
+
+    def __init__(self, min_id, max_id):
+        self.min_id = min_id
+        self.max_id = max_id
+        self._bitmap = bytearray(self._bitmap_size(min_id, max_id))
+        self._cursor = min_id
+        self._free = collections.deque()
+        self._available = max_id - min_id + 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bitmap_size(min_id, max_id):
+        return (max_id - min_id) // 8 + 1
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            yield
+
+    def __len__(self):
+        """Returns the number of IDs available"""
+        with self._transaction():
+            return self._available
+
+    def __contains__(self, id):
+        """Tells whether id is allocated"""
+        with self._transaction():
+            return self._is_set(id)
+
+    def _is_set(self, id):
+        if not self.min_id <= id <= self.max_id:
+            return False
+        offset = id - self.min_id
+        return bool(self._bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def _set(self, id):
+        offset = id - self.min_id
+        self._bitmap[offset >> 3] |= 1 << (offset & 7)
+        self._available -= 1
+
+    def _clear(self, id):
+        offset = id - self.min_id
+        self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xff
+        self._available += 1
+
+    def reserve(self, ids):
+        """Marks IDs allocated elsewhere as allocated
+
+        The IDs out of the range are ignored.
+        """
+        with self._transaction():
+            for id in ids:
+                if self.min_id <= id <= self.max_id and not self._is_set(id):
+                    self._set(id)
+
+    def allocate(self):
+        """Allocates an ID
+
+        :raises: SegmentationIdAllocationFailure if no ID is available
+        """
+        with self._transaction():
+            return self._allocate()
+
+    def _allocate(self):
+        if not self._available:
+            raise exceptions.SegmentationIdAllocationFailure(
+                'There are no ids available.')
+        id = self._next_free()
+        self._set(id)
+        return id
+
+    def _next_free(self):
+        # The free list may hold IDs reserved since they were released
+        while self._free:
+            id = self._free.popleft()
+            if not self._is_set(id):
+                return id
+        while True:
+            id = self._cursor
+            self._cursor += 1
+            if not self._is_set(id):
+                return id
+
+    def allocate_many(self, count):
+        """Allocates count IDs, or none if fewer are available
+
+        :raises: SegmentationIdAllocationFailure if fewer than count IDs are
+                 available
+        """
+        with self._transaction():
+            if count > self._available:
+                raise exceptions.SegmentationIdAllocationFailure(
+                    'Only {0} ids are available.'.format(self._available))
+            return [self._allocate() for _ in range(count)]
+
+    def release(self, id):
+        """Releases an allocated ID, other IDs are ignored"""
+        with self._transaction():
+            if self._is_set(id):
+                self._clear(id)
+                self._released(id)
+
+    def _released(self, id):
+        if id < self._cursor:
+            self._free.append(id)
+
+    def reconcile(self, ids):
+        """Makes the IDs in ids, and only them, allocated
+
+        This is meant to resynchronize the allocator with the IDs actually in
+        use when nothing else is allocating or releasing IDs.
+
+        :param ids: the IDs in use, the ones out of the range are ignored
+        :returns: the tuple of the sets of the IDs that were marked allocated
+                  and of the ones that were released
+        """
+        with self._transaction():
+            in_use = {id for id in ids if self.min_id <= id <= self.max_id}
+            allocated = {id for id in range(self.min_id, self.max_id + 1)
+                         if self._is_set(id)}
+            for id in allocated - in_use:
+                self._clear(id)
+            for id in in_use - allocated:
+                self._set(id)
+            self._reset_cursor()
+            return in_use - allocated, allocated - in_use
+
+    def _reset_cursor(self):
+        self._cursor = self.min_id
+        self._free.clear()
+
+    def iter_available(self):
+        """Returns an iterator over the IDs available, in order"""
+        with self._transaction():
+            available = [id for id in range(self.min_id, self.max_id + 1)
+                         if not self._is_set(id)]
+        return iter(available)
+
+
+class SharedBitmapAllocator(BitmapAllocator):
+    """BitmapAllocator whose bitmap is shared by processes through a file
+
+    The file is memory mapped and every operation holds an exclusive
+    ``flock`` on it, so that the processes of a node allocating from the
+    same file never hand out the same ID. There is no shared free list, the
+    IDs are allocated next-fit from a cursor also kept in the file.
+
+    The file outlives the processes, so a restarted process finds the IDs
+    it allocated before. Before changing a bit, the operation is recorded in
+    the header of the file, and the record is cleared once the header
+    counters are updated. A process killed in between leaves the record,
+    and the next operation of any process first rolls a recorded allocation
+    back, since its ID was never handed out, or completes a recorded
+    release, and recounts the available IDs. The IDs of a batch are recorded
+    in a second bitmap of the file, so that an interrupted batch is rolled
+    back as a whole.
+
+    :param path:   the path of the file, created if it does not exist
+    :param min_id: the lowest ID of the range
+    :param max_id: the highest ID of the range
+    :raises: SegmentationStateFailure if the file exists and holds another
+             range or is not an allocator file
+    """
+
+    MAGIC = b'KSEG'
+    VERSION = 3
+    # magic, version, journal operation, min_id, max_id, cursor, available,
+    # journal ID
+    HEADER = struct.Struct('!4sHHIIIII')
+    JOURNAL_NONE = 0
+    JOURNAL_UPDATE = 1
+    JOURNAL_ALLOCATE = 2
+    JOURNAL_RELEASE = 3
+    JOURNAL_ALLOCATE_MANY = 4
+
+    def __init__(self, path, min_id, max_id):
+        super(SharedBitmapAllocator, self).__init__(min_id, max_id)
+        self.path = path
+        self._pid = None
+        self._fd = None
+        self._mmap = None
+        self._journal = None
+        self._open()
+
+    def _open(self):
+        bitmap_size = self._bitmap_size(self.min_id, self.max_id)
+        # The header, the bitmap and the journal bitmap of the batches
+        size = self.HEADER.size + 2 * bitmap_size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                new = os.fstat(fd).st_size == 0
+                if new:
+                    os.ftruncate(fd, size)
+                elif os.fstat(fd).st_size != size:
+                    raise exceptions.SegmentationStateFailure(
+                        'The size of {0} does not match the id range '
+                        '{1}-{2}.'.format(self.path, self.min_id,
+                                          self.max_id))
+                buf = mmap.mmap(fd, size)
+                if new:
+                    self.HEADER.pack_into(
+                        buf, 0, self.MAGIC, self.VERSION, self.JOURNAL_NONE,
+                        self.min_id, self.max_id, self.min_id,
+                        self.max_id - self.min_id + 1, 0)
+                else:
+                    self._check_header(buf)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._mmap = buf
+        self._bitmap = memoryview(buf)[
+            self.HEADER.size:self.HEADER.size + bitmap_size]
+        self._journal = memoryview(buf)[self.HEADER.size + bitmap_size:]
+        self._pid = os.getpid()
+
+    def _check_header(self, buf):
+        magic, version, _op, min_id, max_id, _cursor, _available, _id = (
+            self.HEADER.unpack_from(buf))
+        if (magic, version, min_id, max_id) != (
+                self.MAGIC, self.VERSION, self.min_id, self.max_id):
+            buf.close()
+            raise exceptions.SegmentationStateFailure(
+                '{0} is not an allocator file of the id range '
+                '{1}-{2}.'.format(self.path, self.min_id, self.max_id))
+
+    def close(self):
+        """Unmaps and closes the file"""
+        with self._lock:
+            if self._fd is None:
+                return
+            self._bitmap.release()
+            self._journal.release()
+            self._mmap.close()
+            os.close(self._fd)
+            self._fd = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            # A forked child shares the open file description, and so the
+            # flock, of its parent: it needs its own
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                (_magic, _version, op, _min_id, _max_id, self._cursor,
+                 self._available, id) = self.HEADER.unpack_from(self._mmap)
+                if op != self.JOURNAL_NONE:
+                    self._recover(op, id)
+                # Until the transaction ends, the counters may not match
+                # the bitmap
+                self._write_header(self.JOURNAL_UPDATE)
+                try:
+                    yield
+                finally:
+                    self._write_header(self.JOURNAL_NONE)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _write_header(self, op, id=0):
+        self.HEADER.pack_into(
+            self._mmap, 0, self.MAGIC, self.VERSION, op, self.min_id,
+            self.max_id, self._cursor, self._available, id)
+
+    def _recover(self, op, id):
+        """Finishes the transaction a killed process left recorded"""
+        LOG.warning("Recovering the interrupted transaction %(op)d on "
+                    "%(id)d of %(path)s", {'op': op, 'id': id,
+                                           'path': self.path})
+        if op in (self.JOURNAL_ALLOCATE, self.JOURNAL_RELEASE):
+            # Neither an interrupted allocation, whose ID was not handed
+            # out, nor an interrupted release leave the ID allocated
+            offset = id - self.min_id
+            self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xff
+        elif op == self.JOURNAL_ALLOCATE_MANY:
+            for index, byte in enumerate(self._journal):
+                if byte:
+                    self._bitmap[index] &= ~byte & 0xff
+        self._journal[:] = bytes(len(self._journal))
+        allocated = sum(bin(byte).count('1') for byte in self._bitmap)
+        self._available = self.max_id - self.min_id + 1 - allocated
+        self._write_header(self.JOURNAL_NONE)
+
+    def _allocate(self):
+        if not self._available:
+            raise exceptions.SegmentationIdAllocationFailure(
+                'There are no ids available.')
+        id = self._next_free()
+        self._write_header(self.JOURNAL_ALLOCATE, id)
+        self._set(id)
+        return id
+
+    def allocate_many(self, count):
+        with self._transaction():
+            if count > self._available:
+                raise exceptions.SegmentationIdAllocationFailure(
+                    'Only {0} ids are available.'.format(self._available))
+            self._write_header(self.JOURNAL_ALLOCATE_MANY)
+            ids = []
+            for _ in range(count):
+                id = self._next_free()
+                # Recorded before being set, to be rolled back on recovery
+                offset = id - self.min_id
+                self._journal[offset >> 3] |= 1 << (offset & 7)
+                self._set(id)
+                ids.append(id)
+            # The journal is only cleared once the batch is not recorded
+            # anymore
+            self._write_header(self.JOURNAL_UPDATE)
+            for id in ids:
+                self._journal[(id - self.min_id) >> 3] = 0
+            return ids
+
+    def release(self, id):
+        # Released IDs are found again by the next-fit scan, they are not
+        # queued in a free list
+        with self._transaction():
+            if self._is_set(id):
+                self._write_header(self.JOURNAL_RELEASE, id)
+                self._clear(id)
+
+    def _next_free(self):
+        # Next-fit scan of the bitmap bytes from the cursor, wrapping around
+        size = len(self._bitmap)
+        start = (self._cursor - self.min_id) >> 3
+        for i in range(size + 1):
+            index = (start + i) % size
+            if self._bitmap[index] == 0xff:
+                continue
+            for bit in range(8):
+                id = self.min_id + (index << 3) + bit
+                if id > self.max_id:
+                    break
+                if id >= self._cursor or i:
+                    if not self._is_set(id):
+                        self._cursor = id + 1
+                        if self._cursor > self.max_id:
+                            self._cursor = self.min_id
+                        return id
+        raise exceptions.SegmentationIdAllocationFailure(
+            'There are no ids available.')
+
+
+class RangeAllocator(object):
+    """Allocates IDs of a range from a sorted list of free ranges
+
+    The memory used only depends on how fragmented the free IDs are, not on
+    the size of the range, which suits the 24 bits VNI space. The lowest
+    free IDs are allocated first. All the operations are thread safe.
+
+    :param min_id: the lowest ID of the range
+    :param max_id: the highest ID of the range
+    """
+
+    def __init__(self, min_id, max_id):
+        self.min_id = min_id
+        self.max_id = max_id
+        # The free ranges are [_starts[i], _ends[i]], sorted and disjoint
+        # with gaps between them
+        self._starts = [min_id]
+        self._ends = [max_id]
+        self._available = max_id - min_id + 1
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of IDs available"""
+        return self._available
+
+    def __contains__(self, id):
+        """Tells whether id is allocated"""
+        if not self.min_id <= id <= self.max_id:
+            return False
+        with self._lock:
+            index = bisect.bisect_right(self._starts, id) - 1
+            return index < 0 or id > self._ends[index]
+
+    @property
+    def free_ranges(self):
+        """The list of the (first, last) tuples of the free ranges"""
+        with self._lock:
+            return list(zip(self._starts, self._ends))
+
+    def allocate(self):
+        """Allocates the lowest free ID
+
+        :raises: SegmentationIdAllocationFailure if no ID is available
+        """
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        """Allocates the count lowest free IDs, or none if fewer are free
+
+        :raises: SegmentationIdAllocationFailure if fewer than count IDs are
+                 available
+        """
+        with self._lock:
+            if count > self._available:
+                raise exceptions.SegmentationIdAllocationFailure(
+                    'Only {0} ids are available.'.format(self._available))
+            ids = []
+            exhausted = 0
+            while len(ids) < count:
+                start = self._starts[exhausted]
+                end = self._ends[exhausted]
+                taken = min(count - len(ids), end - start + 1)
+                ids.extend(range(start, start + taken))
+                if start + taken > end:
+                    exhausted += 1
+                else:
+                    self._starts[exhausted] = start + taken
+            del self._starts[:exhausted]
+            del self._ends[:exhausted]
+            self._available -= count
+            return ids
+
+    def reserve(self, ids):
+        """Marks IDs allocated elsewhere as allocated
+
+        The IDs out of the range or already allocated are ignored.
+        """
+        with self._lock:
+            for id in ids:
+                if not self.min_id <= id <= self.max_id:
+                    continue
+                index = bisect.bisect_right(self._starts, id) - 1
+                if index < 0 or id > self._ends[index]:
+                    continue
+                start, end = self._starts[index], self._ends[index]
+                if start == end:
+                    del self._starts[index]
+                    del self._ends[index]
+                elif id == start:
+                    self._starts[index] = id + 1
+                elif id == end:
+                    self._ends[index] = id - 1
+                else:
+                    self._ends[index] = id - 1
+                    self._starts.insert(index + 1, id + 1)
+                    self._ends.insert(index + 1, end)
+                self._available -= 1
+
+    def release(self, id):
+        """Releases an allocated ID, other IDs are ignored"""
+        self.release_many([id])
+
+    def release_many(self, ids):
+        """Releases allocated IDs, other IDs are ignored
+
+        The IDs are coalesced into ranges before being merged into the free
+        ranges, so releasing a block of consecutive IDs is cheap.
+        """
+        with self._lock:
+            for start, end in _to_ranges(sorted(set(ids))):
+                self._release_range(max(start, self.min_id),
+                                    min(end, self.max_id))
+
+    def _release_range(self, start, end):
+        while start <= end:
+            # Index of the first free range after start
+            index = bisect.bisect_right(self._starts, start)
+            if index and self._ends[index - 1] >= start:
+                # start is free, skip to the end of its range
+                start = self._ends[index - 1] + 1
+                continue
+            # [start, stop] is allocated, stop is right before the next free
+            # range or is end
+            stop = end
+            if index < len(self._starts):
+                stop = min(end, self._starts[index] - 1)
+            self._available += stop - start + 1
+            merge_prev = index and self._ends[index - 1] == start - 1
+            merge_next = False
+            if index < len(self._starts):
+                merge_next = self._starts[index] == stop + 1
+            if merge_prev and merge_next:
+                self._ends[index - 1] = self._ends[index]
+                del self._starts[index]
+                del self._ends[index]
+            elif merge_prev:
+                self._ends[index - 1] = stop
+            elif merge_next:
+                self._starts[index] = start
+            else:
+                self._starts.insert(index, start)
+                self._ends.insert(index, stop)
+            start = stop + 1
+
+
+def _to_ranges(sorted_ids):
+    """Yields the (first, last) tuples of the runs of consecutive IDs"""
+    start = end = None
+    for id in sorted_ids:
+        if end is not None and id == end + 1:
+            end = id
+            continue
+        if start is not None:
+            yield start, end
+        start = end = id
+    if start is not None:
+        yield start, end
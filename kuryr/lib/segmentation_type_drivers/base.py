@@ -0,0 +1,84 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import abc
+import threading
+
+
+class SegmentationDriver(object, metaclass=abc.ABCMeta):
+    """Allocates segmentation IDs from independent pools
+
+    Segmentation IDs only need to be unique per pool, e.g. per trunk parent
+    port or per link interface, so each pool key gets its own allocator,
+    created on its first use. The ``None`` pool key is the default pool.
+    """
+
+    def __init__(self):
+        self._allocators = {}
+        self._allocators_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _create_allocator(self, pool_key):
+        """Returns a new allocator for the pool of pool_key"""
+
+    def _get_allocator(self, pool_key=None):
+        allocator = self._allocators.get(pool_key)
+        if allocator is not None:
+            return allocator
+        with self._allocators_lock:
+            allocator = self._allocators.get(pool_key)
+            if allocator is None:
+                allocator = self._create_allocator(pool_key)
+                self._allocators[pool_key] = allocator
+            return allocator
+
+    def allocate_segmentation_id(self, allocated_ids=set(), pool_key=None):
+        allocator = self._get_allocator(pool_key)
+        allocator.reserve(allocated_ids)
+        return allocator.allocate()
+
+    def allocate_segmentation_ids(self, count, allocated_ids=set(),
+                                  pool_key=None):
+        allocator = self._get_allocator(pool_key)
+        allocator.reserve(allocated_ids)
+        return allocator.allocate_many(count)
+
+    def release_segmentation_id(self, id, pool_key=None):
+        self._get_allocator(pool_key).release(id)
+
+    def release_segmentation_ids(self, ids, pool_key=None):
+        allocator = self._get_allocator(pool_key)
+        for id in ids:
+            allocator.release(id)
+
+    def get_pool_usage(self):
+        """Returns the utilization of the pools created so far
+
+        :returns: a dict of the pool keys to dicts with the number of the
+                  ``allocated`` and ``available`` IDs of the pool
+        """
+        with self._allocators_lock:
+            allocators = list(self._allocators.items())
+        usage = {}
+        for pool_key, allocator in allocators:
+            available = len(allocator)
+            size = allocator.max_id - allocator.min_id + 1
+            usage[pool_key] = {'allocated': size - available,
+                               'available': available}
+        return usage
+
+    def reconcile(self, netns=None, pool_key=None):
+        """Resynchronizes the allocated IDs of a pool with the host
+
+        :returns: the tuple of the sets of the IDs that were marked
+                  allocated and of the ones that were released
+        """
+        return set(), set()
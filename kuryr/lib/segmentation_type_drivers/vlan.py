@@ -9,36 +9,93 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-import random
+import os
+from urllib import parse
 
+from oslo_config import cfg
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib.binding import netlink
+from kuryr.lib.binding.netlink import iproute
 from kuryr.lib import constants as const
-from kuryr.lib import exceptions
+from kuryr.lib.segmentation_type_drivers import allocator
+from kuryr.lib.segmentation_type_drivers import base
+from kuryr.lib import utils
+
+LOG = log.getLogger(__name__)
+
+
+def _list_netns():
+    """Yields the paths of the named and Docker network namespaces"""
+    for netns_dir in (iproute.NETNS_RUN_DIR, utils.DOCKER_NETNS_BASE):
+        if not os.path.isdir(netns_dir):
+            continue
+        for name in os.listdir(netns_dir):
+            yield os.path.join(netns_dir, name)
+
+
+def _get_state_path(path, pool_key):
+    """Returns the state file of a pool, next to the default pool one"""
+    if pool_key is None:
+        return path
+    return '{0}.{1}'.format(path, parse.quote(str(pool_key), safe=''))
+
+
+class SegmentationDriver(base.SegmentationDriver):
+    """Allocates VLAN IDs, one VLAN space per pool key
+
+    VLAN IDs only need to be unique per trunk parent, so a pool key such as
+    the parent port ID or the link interface gets a VLAN space of its own.
+    Each pool is a 512 bytes bitmap, in memory or in a file next to
+    ``segmentation_state_path`` when it is set.
+    """
+
+    def _create_allocator(self, pool_key):
+        path = cfg.CONF.binding.segmentation_state_path
+        if path:
+            return allocator.SharedBitmapAllocator(
+                _get_state_path(path, pool_key),
+                const.MIN_VLAN_TAG, const.MAX_VLAN_TAG)
+        return allocator.BitmapAllocator(const.MIN_VLAN_TAG,
+                                         const.MAX_VLAN_TAG)
+
+    @property
+    def available_local_vlans(self):
+        """The set of the VLAN IDs available, built on each access"""
+        return self.get_available_vlans()
 
-DEFAULT_MAX_RETRY_COUNT = 3
+    def get_available_vlans(self, pool_key=None):
+        """Returns the set of the VLAN IDs available in a pool"""
+        return set(self._get_allocator(pool_key).iter_available())
 
+    def reconcile(self, netns=None, pool_key=None):
+        """Resynchronizes the allocated VLAN IDs with the host VLAN devices
 
-class SegmentationDriver(object):
-    def __init__(self):
-        self.available_local_vlans = set(range(const.MIN_VLAN_TAG,
-                                         const.MAX_VLAN_TAG + 1))
+        The VLAN IDs of the VLAN devices found are made allocated in the pool
+        and the other ones released, so it must not run while ports are
+        bound. The devices are not matched to the pool keys, so the IDs used
+        by the other pools are allocated in the pool too.
 
-    def allocate_segmentation_id(self, allocated_ids=set()):
-        self.available_local_vlans.difference_update(allocated_ids)
-        for i in range(DEFAULT_MAX_RETRY_COUNT):
+        :param netns: the network namespaces to look for VLAN devices in,
+                      besides the default one. By default the named and
+                      Docker namespaces.
+        :param pool_key: the key of the pool to reconcile
+        :returns: the tuple of the sets of the VLAN IDs that were marked
+                  allocated and of the ones that were released
+        """
+        backend = netlink.get_backend()
+        vlan_ids = set(backend.list_vlan_ids())
+        for ns in (_list_netns() if netns is None else netns):
             try:
-                allocated = random.choice(list(self.available_local_vlans))
-                self.available_local_vlans.remove(allocated)
-                return allocated
-            except IndexError:
-                raise exceptions.SegmentationIdAllocationFailure(
-                    'There are no vlan ids available.')
-            except KeyError:
-                # Other thread obtained the same vlan_id, so a new try is
-                # needed
-                continue
-        raise exceptions.SegmentationIdAllocationFailure(
-            'Max number of retries reached without '
-            'finding an available vlan id.')
-
-    def release_segmentation_id(self, id):
-        self.available_local_vlans.add(id)
+                vlan_ids.update(backend.list_vlan_ids(netns=ns))
+            except (OSError, pyroute2.NetlinkError):
+                # The namespace may be gone since it was listed
+                LOG.debug("Could not list the VLAN devices of %s", ns)
+        added, removed = self._get_allocator(pool_key).reconcile(vlan_ids)
+        if added or removed:
+            LOG.info("Reconciled the VLAN IDs with the host devices, "
+                     "%(added)d were marked allocated and %(removed)d "
+                     "released", {'added': len(added),
+                                  'removed': len(removed)})
+        return added, removed
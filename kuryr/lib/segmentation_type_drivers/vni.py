@@ -0,0 +1,29 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from kuryr.lib import constants as const
+from kuryr.lib.segmentation_type_drivers import allocator
+from kuryr.lib.segmentation_type_drivers import base
+
+
+class SegmentationDriver(base.SegmentationDriver):
+    """Allocates the VNIs of VXLAN and Geneve segments
+
+    The 24 bits VNI space is kept as free ranges, which stay few as long as
+    the VNIs are allocated and released in bulk. VNIs are not tied to host
+    devices, so there is nothing to reconcile.
+    """
+
+    def _create_allocator(self, pool_key):
+        return allocator.RangeAllocator(const.MIN_VNI, const.MAX_VNI)
+
+    def release_segmentation_ids(self, ids, pool_key=None):
+        self._get_allocator(pool_key).release_many(ids)
@@ -0,0 +1,157 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Coalescing of concurrent identical calls
+
+When many ports of the same network are bound at once, their consumers
+issue the same ``show_network`` and ``list_subnets`` requests at the same
+time. A single flight runs one of the identical concurrent calls and hands
+its result to all their callers. A call made once it completed runs again,
+so no result is older than the call that asked for it.
+"""
+import asyncio
+import concurrent.futures
+import copy
+import functools
+import threading
+
+# The read only methods of the Neutron client, whose calls are coalesced
+READ_PREFIXES = ('show_', 'list_', 'get_')
+
+
+class SingleFlight(object):
+    """Coalesces the concurrent calls of the same key across threads"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Calls func unless a call of the same key is in flight
+
+        :param key:  the hashable key of the call
+        :param func: the function to call
+        :returns: the result of the call in flight, or of func
+        :raises: the exception the call raised
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+        if not leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._done(key)
+            future.set_exception(e)
+            raise
+        self._done(key)
+        # The waiters copy a snapshot, the caller may modify the result
+        # while they do
+        future.set_result(copy.deepcopy(result))
+        return result
+
+    def _done(self, key):
+        with self._lock:
+            del self._calls[key]
+
+
+class AsyncSingleFlight(object):
+    """Coalesces the concurrent calls of the same key in an event loop"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        """Awaits func unless a call of the same key is in flight
+
+        :param key:  the hashable key of the call
+        :param func: the coroutine function to await
+        :returns: the result of the call in flight, or of func
+        :raises: the exception the call raised
+        """
+        task = self._calls.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        # A waiter being cancelled must not cancel the shared call. All the
+        # callers get copies, the first one resumed may modify its result
+        # before the others copy it.
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+def _freeze(value):
+    """Returns a hashable equivalent of a call argument"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class CoalescingClient(object):
+    """Wraps a Neutron client to coalesce its concurrent identical reads
+
+    The calls of the read only methods of the client with the same
+    arguments are coalesced, the other calls go straight to the client. The
+    callers waiting for the call in flight get copies of its result.
+
+    :param client: the Neutron client to wrap
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not name.startswith(READ_PREFIXES) or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def coalesced(*args, **kwargs):
+            if not kwargs.get('retrieve_all', True):
+                # The pages are got lazily from a generator, which cannot
+                # be shared
+                return attr(*args, **kwargs)
+            key = (name, _freeze(args), _freeze(kwargs))
+            return self._flight.do(key, attr, *args, **kwargs)
+        return coalesced
+
+    async def async_call(self, name, *args, **kwargs):
+        """Calls a client method from an event loop without blocking it
+
+        The call runs in the default executor of the loop and concurrent
+        identical calls of the loop are coalesced.
+
+        :param name: the name of the client method, e.g. 'show_network'
+        """
+        method = getattr(self, name)
+        if not name.startswith(READ_PREFIXES):
+            return await _run_in_executor(method, *args, **kwargs)
+        key = (name, _freeze(args), _freeze(kwargs))
+        return await self._async_flight.do(key, _run_in_executor, method,
+                                           *args, **kwargs)
+
+
+async def _run_in_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(func, *args, **kwargs))
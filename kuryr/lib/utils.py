@@ -11,17 +11,27 @@
 # under the License.
 
 import hashlib
+import ipaddress
+import os
 import random
 import socket
+import threading
 
 from keystoneauth1 import loading as ks_loading
+from keystoneauth1 import session as ks_session
 from neutronclient.v2_0 import client
 from oslo_config import cfg
 
 from kuryr.lib import config as kuryr_config
+from kuryr.lib import singleflight
 
 DOCKER_NETNS_BASE = '/var/run/docker/netns'
 PORT_POSTFIX = 'port'
+# Number of the objects the list helpers get per Neutron request
+NEUTRON_PAGE_SIZE = 500
+
+_NEUTRON_CLIENTS = {}
+_NEUTRON_CLIENTS_LOCK = threading.Lock()
 
 
 def get_auth_plugin(conf_group):
@@ -35,17 +45,131 @@ def get_keystone_session(conf_group, auth_plugin):
                                                      auth=auth_plugin)
 
 
-def get_neutron_client(*args, **kwargs):
-    conf_group = kuryr_config.neutron_group.name
+def _create_neutron_client(conf_group):
+    conf = getattr(cfg.CONF, conf_group)
     auth_plugin = get_auth_plugin(conf_group)
+    if hasattr(auth_plugin, 'MIN_TOKEN_LIFE_SECONDS'):
+        # Reauthenticate that long before the token expires rather than
+        # having a request rejected because of an expired token
+        auth_plugin.MIN_TOKEN_LIFE_SECONDS = conf.token_refresh_margin
     session = get_keystone_session(conf_group, auth_plugin)
-    endpoint_type = getattr(getattr(cfg.CONF, conf_group), 'endpoint_type')
-    region_name = getattr(getattr(cfg.CONF, conf_group), 'region_name')
+    adapter = ks_session.TCPKeepAliveAdapter(
+        pool_connections=conf.connection_pool_size,
+        pool_maxsize=conf.connection_pool_size)
+    for scheme in ('https://', 'http://'):
+        session.session.mount(scheme, adapter)
+
+    neutron_client = client.Client(session=session,
+                                   auth=auth_plugin,
+                                   endpoint_type=conf.endpoint_type,
+                                   region_name=conf.region_name)
+    if conf.coalesce_requests:
+        return singleflight.CoalescingClient(neutron_client)
+    return neutron_client
+
+
+def get_neutron_client(*args, **kwargs):
+    """Returns the Neutron client of the process
+
+    The client, with its keystone session, token and connection pool, is
+    created on the first call and shared by the following ones for the same
+    configuration group, region and endpoint type. With ``[neutron]
+    coalesce_requests`` it is wrapped in a singleflight.CoalescingClient.
+    """
+    conf_group = kuryr_config.neutron_group.name
+    conf = getattr(cfg.CONF, conf_group)
+    key = (conf_group, conf.region_name, conf.endpoint_type)
+    neutron_client = _NEUTRON_CLIENTS.get(key)
+    if neutron_client is not None:
+        return neutron_client
+    with _NEUTRON_CLIENTS_LOCK:
+        neutron_client = _NEUTRON_CLIENTS.get(key)
+        if neutron_client is None:
+            neutron_client = _create_neutron_client(conf_group)
+            _NEUTRON_CLIENTS[key] = neutron_client
+        return neutron_client
+
+
+def reset_neutron_clients():
+    """Drops the cached Neutron clients, e.g. after a configuration reload"""
+    with _NEUTRON_CLIENTS_LOCK:
+        _NEUTRON_CLIENTS.clear()
+
+
+def _iter_neutron(collection, client, fields, page_size, filters):
+    if client is None:
+        client = get_neutron_client()
+    list_method = getattr(client, 'list_' + collection)
+    if fields:
+        # The ID of the last object of a page is the marker of the next one
+        fields = list(fields)
+        if 'id' not in fields:
+            fields.append('id')
+        filters['fields'] = fields
+    marker = None
+    while True:
+        if marker is not None:
+            filters['marker'] = marker
+        # Only the first page is taken, the next ones are asked with their
+        # marker rather than with the links of the response
+        pages = list_method(retrieve_all=False, limit=page_size, **filters)
+        page = next(iter(pages))[collection]
+        for obj in page:
+            yield obj
+        if len(page) < page_size:
+            return
+        marker = page[-1]['id']
+
+
+def iter_ports(client=None, fields=None, page_size=NEUTRON_PAGE_SIZE,
+               **filters):
+    """Yields the Neutron ports matching filters, a page at a time
+
+    Only a page of ports is held in memory at once, which allows scanning
+    all the ports of a large cloud, e.g.::
+
+        for port in utils.iter_ports(device_owner=const.DEVICE_OWNER,
+                                     fields=['id', 'binding:host_id']):
+            ...
+
+    :param client:    the Neutron client, by default get_neutron_client()
+    :param fields:    the fields of the ports to get, all by default. The
+                      ``id`` field is always got.
+    :param page_size: the number of ports to get per Neutron request
+    :param filters:   the Neutron filters of the ports
+    :returns: a generator of the port dicts
+    """
+    return _iter_neutron('ports', client, fields, page_size, filters)
+
+
+def iter_subnets(client=None, fields=None, page_size=NEUTRON_PAGE_SIZE,
+                 **filters):
+    """Yields the Neutron subnets matching filters, a page at a time
+
+    See iter_ports for the parameters.
+    """
+    return _iter_neutron('subnets', client, fields, page_size, filters)
+
+
+def iter_networks(client=None, fields=None, page_size=NEUTRON_PAGE_SIZE,
+                  **filters):
+    """Yields the Neutron networks matching filters, a page at a time
+
+    See iter_ports for the parameters.
+    """
+    return _iter_neutron('networks', client, fields, page_size, filters)
+
 
-    return client.Client(session=session,
-                         auth=auth_plugin,
-                         endpoint_type=endpoint_type,
-                         region_name=region_name)
+def get_docker_netns_path(sandbox_id):
+    """Returns the path of the network namespace of a Docker sandbox.
+
+    The path can be passed as the ``netns`` argument of the binding drivers
+    to create the container devices directly in the sandbox namespace.
+
+    :param sandbox_id: the ID of the Docker sandbox
+    :returns: the path of the sandbox network namespace
+    """
+    return os.path.join(DOCKER_NETNS_BASE, sandbox_id)
 
 
 def get_hostname():
@@ -108,3 +232,162 @@ def get_random_string(length):
     """Get a random hex string of the specified length."""
 
     return "{0:0{1}x}".format(random.getrandbits(length * 4), length)
+
+
+class _TrieNode(object):
+    __slots__ = ('prefix', 'length', 'value', 'children')
+
+    def __init__(self, prefix, length, value=None):
+        self.prefix = prefix
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+class SubnetIndex(object):
+    """Longest prefix match index of IPv4 and IPv6 CIDRs
+
+    The CIDRs of e.g. the Neutron subnets or subnetpools are kept in a path
+    compressed binary trie per IP version, so that adding, removing and
+    looking up an address take at most one step per bit of the prefix,
+    whatever the number of the CIDRs::
+
+        index = utils.SubnetIndex()
+        for subnet in subnets:
+            index.add(subnet['cidr'], subnet)
+        subnet = index.lookup('10.0.0.5')
+    """
+
+    def __init__(self):
+        self._roots = {4: _TrieNode(0, 0), 6: _TrieNode(0, 0)}
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, cidr):
+        return self.get(cidr) is not None
+
+    @staticmethod
+    def _parse(cidr):
+        network = ipaddress.ip_network(cidr, strict=False)
+        return (network.version, network.max_prefixlen,
+                int(network.network_address), network.prefixlen)
+
+    def add(self, cidr, value):
+        """Adds a CIDR, replacing the value of the CIDR if already added
+
+        :param cidr:  the CIDR, as a string or an ipaddress network
+        :param value: the value to return for the addresses of the CIDR,
+                      e.g. the Neutron subnet. It must not be None.
+        """
+        version, width, prefix, length = self._parse(cidr)
+        node = self._roots[version]
+        while True:
+            if node.length == length:
+                if node.value is None:
+                    self._len += 1
+                node.value = value
+                return
+            bit = _get_bit(prefix, node.length, width)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _TrieNode(prefix, length, value)
+                self._len += 1
+                return
+            common = _common_length(child.prefix, child.length, prefix,
+                                    length, width)
+            if common == child.length:
+                node = child
+                continue
+            # Insert a node for the common part of the child and the CIDR
+            middle = _TrieNode(_mask(prefix, common, width), common)
+            middle.children[_get_bit(child.prefix, common, width)] = child
+            node.children[bit] = middle
+            if common == length:
+                middle.value = value
+            else:
+                middle.children[_get_bit(prefix, common, width)] = (
+                    _TrieNode(prefix, length, value))
+            self._len += 1
+            return
+
+    def remove(self, cidr):
+        """Removes a CIDR
+
+        :raises: KeyError if the CIDR was not added
+        """
+        version, width, prefix, length = self._parse(cidr)
+        path = [self._roots[version]]
+        node = path[0]
+        while node.length < length:
+            node = node.children[_get_bit(prefix, node.length, width)]
+            if node is None or node.length > length or _common_length(
+                    node.prefix, node.length, prefix, length,
+                    width) < node.length:
+                raise KeyError(str(cidr))
+            path.append(node)
+        if node.value is None:
+            raise KeyError(str(cidr))
+        node.value = None
+        self._len -= 1
+        # Drop the nodes left without value and compress the ones left
+        # with a single child, except for the root
+        for node, parent in zip(reversed(path[1:]), reversed(path[:-1])):
+            if node.value is not None:
+                break
+            children = [c for c in node.children if c is not None]
+            if len(children) > 1:
+                break
+            index = parent.children.index(node)
+            parent.children[index] = children[0] if children else None
+
+    def get(self, cidr):
+        """Returns the value of a CIDR, or None if it was not added"""
+        version, width, prefix, length = self._parse(cidr)
+        node = self._roots[version]
+        while node.length < length:
+            node = node.children[_get_bit(prefix, node.length, width)]
+            if node is None or node.length > length or _common_length(
+                    node.prefix, node.length, prefix, length,
+                    width) < node.length:
+                return None
+        return node.value
+
+    def lookup(self, address):
+        """Returns the value of the longest CIDR containing an address
+
+        :param address: the IP address, as a string or an ipaddress address
+        :returns: the value of the CIDR, or None if no CIDR contains the
+                  address
+        """
+        address = ipaddress.ip_address(address)
+        width = address.max_prefixlen
+        address = int(address)
+        node = self._roots[4 if width == 32 else 6]
+        best = node.value
+        while node.length < width:
+            node = node.children[_get_bit(address, node.length, width)]
+            if node is None or _common_length(
+                    node.prefix, node.length, address, width,
+                    width) < node.length:
+                break
+            if node.value is not None:
+                best = node.value
+        return best
+
+
+def _get_bit(prefix, index, width):
+    """Returns the bit of a prefix at index, counted from the left"""
+    return (prefix >> (width - 1 - index)) & 1
+
+
+def _mask(prefix, length, width):
+    """Returns the prefix with the bits after length cleared"""
+    return prefix & ~((1 << (width - length)) - 1)
+
+
+def _common_length(prefix, length, other, other_length, width):
+    """Returns the length of the common part of two prefixes"""
+    common = width - (prefix ^ other).bit_length()
+    return min(common, length, other_length)
@@ -9,6 +9,8 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import asyncio
+from unittest import mock
 
 from oslo_config import cfg
 from oslo_utils import importutils
@@ -30,3 +32,113 @@ class TestBinding(base.TestCase):
         driver = importutils.import_module('kuryr.lib.binding.drivers.vlan')
         self.assertRaises(exceptions.DriverNotEnabledException,
                           binding._verify_driver, driver)
+
+    @mock.patch('kuryr.lib.binding.drivers.vlan.port_bind')
+    def test_port_bind_many_fallback(self, mock_port_bind):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.vlan'],
+                              group='binding')
+        error = Exception('fake error')
+        mock_port_bind.side_effect = ['first', error]
+        requests = [
+            ('ep1', {'id': 'port1'}, [], None, None, 101,
+             'kuryr.lib.binding.drivers.vlan'),
+            binding.BindRequest('ep2', {'id': 'port2'}, [],
+                                segmentation_id=102,
+                                driver='kuryr.lib.binding.drivers.vlan'),
+        ]
+
+        results = binding.port_bind_many(requests)
+
+        self.assertEqual([binding.BindResult('first', None),
+                          binding.BindResult(None, error)], results)
+        self.assertEqual(2, mock_port_bind.call_count)
+        mock_port_bind.assert_any_call('ep1', {'id': 'port1'}, [],
+                                       network=None, vm_port=None,
+                                       segmentation_id=101)
+
+    @mock.patch('kuryr.lib.binding.drivers.veth.port_bind_many')
+    def test_port_bind_many_groups_by_driver(self, mock_bind_many):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.veth'],
+                              group='binding')
+        mock_bind_many.return_value = [binding.BindResult('veth', None)]
+        requests = [
+            ('ep1', {'id': 'port1'}, [], None, None, None,
+             'kuryr.lib.binding.drivers.vlan'),
+            ('ep2', {'id': 'port2'}, []),
+        ]
+
+        results = binding.port_bind_many(requests)
+
+        mock_bind_many.assert_called_once_with(
+            [binding.BindRequest('ep2', {'id': 'port2'}, [])])
+        self.assertIsInstance(results[0].error,
+                              exceptions.DriverNotEnabledException)
+        self.assertEqual(binding.BindResult('veth', None), results[1])
+
+    @mock.patch('kuryr.lib.binding.drivers.vlan.port_bind',
+                return_value='vlan')
+    @mock.patch('kuryr.lib.binding.drivers.veth.port_bind_many')
+    def test_port_bind_many_driver_failure(self, mock_bind_many,
+                                           mock_port_bind):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.veth',
+                               'kuryr.lib.binding.drivers.vlan'],
+                              group='binding')
+        error = OSError('netlink socket error')
+        mock_bind_many.side_effect = error
+        requests = [
+            ('ep1', {'id': 'port1'}, []),
+            ('ep2', {'id': 'port2'}, [], None, None, None,
+             'kuryr.lib.binding.drivers.vlan'),
+            ('ep3', {'id': 'port3'}, []),
+        ]
+
+        results = binding.port_bind_many(requests)
+
+        self.assertEqual([binding.BindResult(None, error),
+                          binding.BindResult('vlan', None),
+                          binding.BindResult(None, error)], results)
+
+    @mock.patch('kuryr.lib.binding.drivers.veth.port_unbind_many')
+    def test_port_unbind_many(self, mock_unbind_many):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.veth'],
+                              group='binding')
+        mock_unbind_many.return_value = [binding.BindResult(('', ''), None)]
+
+        results = binding.port_unbind_many([('ep1', {'id': 'port1'})])
+
+        mock_unbind_many.assert_called_once_with(
+            [binding.UnbindRequest('ep1', {'id': 'port1'})])
+        self.assertEqual([binding.BindResult(('', ''), None)], results)
+
+    @mock.patch('kuryr.lib.binding.drivers.vlan.port_bind',
+                return_value='bound')
+    def test_async_port_bind_in_executor(self, mock_port_bind):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.vlan'],
+                              group='binding')
+
+        result = asyncio.run(binding.async_port_bind(
+            'ep1', {'id': 'port1'}, [], segmentation_id=101,
+            driver='kuryr.lib.binding.drivers.vlan'))
+
+        self.assertEqual('bound', result)
+        mock_port_bind.assert_called_once_with(
+            'ep1', {'id': 'port1'}, [], network=None, vm_port=None,
+            segmentation_id=101)
+
+    @mock.patch('kuryr.lib.binding.drivers.veth.async_port_unbind',
+                new_callable=mock.AsyncMock, return_value=('out', 'err'))
+    def test_async_port_unbind_native(self, mock_async_unbind):
+        cfg.CONF.set_override('enabled_drivers',
+                              ['kuryr.lib.binding.drivers.veth'],
+                              group='binding')
+
+        result = asyncio.run(binding.async_port_unbind('ep1',
+                                                       {'id': 'port1'}))
+
+        self.assertEqual(('out', 'err'), result)
+        mock_async_unbind.assert_awaited_once_with('ep1', {'id': 'port1'})
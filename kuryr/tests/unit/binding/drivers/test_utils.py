@@ -9,9 +9,12 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import asyncio
+import ipaddress
 from unittest import mock
 
 import ddt
+from oslo_concurrency import processutils
 from oslo_utils import uuidutils
 
 import pyroute2.ipdb.interfaces
@@ -146,6 +149,66 @@ class BindingDriversUtilsTest(base.TestCase):
         else:
             fake_iface.set_address.assert_called_with(mac)
 
+    def test_get_subnet_info(self):
+        subnet = {'id': 'subnet', 'revision_number': 2,
+                  'cidr': '2001:db8::/64', 'gateway_ip': '2001:db8::1'}
+
+        info = utils.get_subnet_info(subnet)
+
+        self.assertEqual(64, info.prefixlen)
+        self.assertEqual(6, info.version)
+        self.assertEqual(ipaddress.ip_network('2001:db8::/64'), info.network)
+        self.assertEqual(ipaddress.ip_address('2001:db8::1'), info.gateway)
+        self.assertIs(info, utils.get_subnet_info(dict(subnet)))
+        self.assertIsNone(utils.get_subnet_info(
+            {'id': 'subnet', 'cidr': '10.0.0.0/24'}).gateway)
+
+    @mock.patch('ipaddress.ip_network', wraps=ipaddress.ip_network)
+    def test_get_subnet_info_revision(self, mock_ip_network):
+        subnet = {'id': uuidutils.generate_uuid(), 'revision_number': 1,
+                  'cidr': '10.0.0.0/24', 'gateway_ip': '10.0.0.1'}
+
+        utils.get_subnet_info(subnet)
+        utils.get_subnet_info(subnet)
+        self.assertEqual(1, mock_ip_network.call_count)
+        subnet.update(revision_number=2, cidr='10.0.0.0/16')
+        self.assertEqual(16, utils.get_subnet_info(subnet).prefixlen)
+        self.assertEqual(2, mock_ip_network.call_count)
+
+    def test_get_ip_prefixes(self):
+        subnets = [{'id': 'v4', 'cidr': '10.0.0.0/24'},
+                   {'id': 'v6', 'cidr': '2001:db8::/64'}]
+        fixed_ips = [{'subnet_id': 'v6', 'ip_address': '2001:db8::5'},
+                     {'subnet_id': 'v4', 'ip_address': '10.0.0.5'},
+                     {'subnet_id': 'v4'}]
+
+        self.assertEqual([('2001:db8::5', 64), ('10.0.0.5', 24)],
+                         list(utils.get_ip_prefixes(subnets, fixed_ips)))
+
     def test_get_ipdb(self):
         ip = utils.get_ipdb()
         self.assertEqual(ip, utils.get_ipdb())
+
+    @mock.patch('asyncio.create_subprocess_exec')
+    def test_async_execute(self, mock_create_subprocess):
+        mock_proc = mock.Mock(returncode=0)
+        mock_proc.communicate = mock.AsyncMock(return_value=(b'out', b'err'))
+        mock_create_subprocess.return_value = mock_proc
+
+        result = asyncio.run(utils.async_execute('/fake/ovs', 'bind', None))
+
+        self.assertEqual(('out', 'err'), result)
+        mock_create_subprocess.assert_called_once_with(
+            '/fake/ovs', 'bind', 'None', stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+
+    @mock.patch('asyncio.create_subprocess_exec')
+    def test_async_execute_failure(self, mock_create_subprocess):
+        mock_proc = mock.Mock(returncode=1)
+        mock_proc.communicate = mock.AsyncMock(return_value=(b'', b'boom'))
+        mock_create_subprocess.return_value = mock_proc
+
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              asyncio.run, utils.async_execute('/fake/ovs'))
+        self.assertEqual(1, e.exit_code)
+        self.assertEqual('boom', e.stderr)
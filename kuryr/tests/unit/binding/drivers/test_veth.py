@@ -10,13 +10,21 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-
+import asyncio
+import errno
 from unittest import mock
 
+from oslo_concurrency import processutils
+from oslo_config import cfg
 from oslo_utils import uuidutils
+import pyroute2
 
+from kuryr.lib import binding
 from kuryr.lib.binding.drivers import veth
+from kuryr.lib.binding import host
+from kuryr.lib.binding import netlink
 from kuryr.lib import constants
+from kuryr.lib import exceptions
 from kuryr.lib import utils
 from kuryr.tests.unit import base
 
@@ -24,6 +32,22 @@ from kuryr.tests.unit import base
 class TestVethDriver(base.TestCase):
     """Unit tests for veth driver"""
 
+    def setUp(self):
+        super(TestVethDriver, self).setUp()
+        veth._SCRIPTS.clear()
+        self.addCleanup(veth._SCRIPTS.clear)
+        patcher = mock.patch.object(host, '_PLUGINS', {})
+        self.plugins = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = netlink.get_backend()
+        for name in ('get_alias', 'get_master', 'set_alias'):
+            patcher = mock.patch.object(self.backend, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.backend.get_alias.return_value = None
+        self.backend.get_master.return_value = 7
+        cfg.CONF.set_override('rebind_fast_path', True, group='binding')
+
     @mock.patch('os.path.exists', return_value=True)
     @mock.patch('oslo_concurrency.processutils.execute',
                 return_value=('fake_stdout', 'fake_stderr'))
@@ -84,3 +108,309 @@ class TestVethDriver(base.TestCase):
         veth.port_unbind(fake_docker_endpoint_id, fake_port['port'])
         mock_execute.assert_called_once()
         mock_remove_device.assert_called_once()
+
+    @mock.patch('kuryr.lib.binding.drivers.utils.remove_device')
+    @mock.patch.object(veth, '_configure_host_iface')
+    @mock.patch.object(veth, '_create_veth_pair')
+    def test_port_bind_many(self, mock_create, mock_configure_host,
+                            mock_remove_device):
+        fake_ports = [self._get_fake_port(
+            utils.get_hash(), utils.get_hash(),
+            uuidutils.generate_uuid())['port'] for _ in range(3)]
+        creation_error = Exception('creation failed')
+        binding_error = Exception('binding failed')
+        mock_create.side_effect = [('tap1', 't_c1'), creation_error,
+                                   ('tap3', 't_c3')]
+        mock_configure_host.side_effect = [('out', 'err'), binding_error]
+        requests = [binding.BindRequest('ep', port, [])
+                    for port in fake_ports]
+
+        results = veth.port_bind_many(requests)
+
+        self.assertEqual(
+            [binding.BindResult(('tap1', 't_c1', ('out', 'err')), None),
+             binding.BindResult(None, creation_error),
+             binding.BindResult(None, binding_error)], results)
+        self.assertEqual(3, mock_create.call_count)
+        self.assertEqual(2, mock_configure_host.call_count)
+        mock_remove_device.assert_called_once_with('tap3')
+
+    @mock.patch('kuryr.lib.binding.drivers.utils.remove_device')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_many(self, mock_execute, mock_remove_device):
+        fake_ports = [self._get_fake_port(
+            utils.get_hash(), utils.get_hash(),
+            uuidutils.generate_uuid(), vif_type='ovs')['port']
+            for _ in range(2)]
+        unbinding_error = Exception('unbinding failed')
+        mock_execute.side_effect = [unbinding_error, ('out', 'err')]
+        requests = [binding.UnbindRequest('ep', port) for port in fake_ports]
+
+        results = veth.port_unbind_many(requests)
+
+        self.assertEqual([binding.BindResult(None, unbinding_error),
+                          binding.BindResult(('out', 'err'), None)], results)
+        host_ifname, _ = veth.utils.get_veth_pair_names(fake_ports[1]['id'])
+        mock_remove_device.assert_called_once_with(host_ifname)
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('kuryr.lib.binding.drivers.utils.async_execute',
+                new_callable=mock.AsyncMock,
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch.object(veth, '_create_veth_pair',
+                       return_value=('tap1', 't_c1'))
+    def test_async_port_bind(self, mock_create, mock_async_execute,
+                             mock_path_exists):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+
+        result = asyncio.run(veth.async_port_bind('ep', fake_port, []))
+
+        self.assertEqual(('tap1', 't_c1', ('fake_stdout', 'fake_stderr')),
+                         result)
+        mock_create.assert_called_once_with(fake_port, [], None, netns=None)
+        mock_async_execute.assert_awaited_once()
+        self.assertEqual(constants.BINDING_SUBCOMMAND,
+                         mock_async_execute.await_args[0][1])
+
+    @mock.patch('kuryr.lib.binding.drivers.utils.remove_device')
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('kuryr.lib.binding.drivers.utils.async_execute',
+                new_callable=mock.AsyncMock)
+    @mock.patch.object(veth, '_create_veth_pair',
+                       return_value=('tap1', 't_c1'))
+    def test_async_port_bind_failure(self, mock_create, mock_async_execute,
+                                     mock_path_exists, mock_remove_device):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+        mock_async_execute.side_effect = processutils.ProcessExecutionError
+
+        self.assertRaises(processutils.ProcessExecutionError, asyncio.run,
+                          veth.async_port_bind('ep', fake_port, []))
+        mock_remove_device.assert_called_once_with('tap1')
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('out', 'err'))
+    @mock.patch.object(veth, '_create_veth_pair')
+    def test_port_bind_fast_path(self, mock_create, mock_execute,
+                                 mock_path_exists):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+        host_ifname, container_ifname = veth.utils.get_veth_pair_names(
+            fake_port['id'])
+        mock_create.return_value = (host_ifname, container_ifname)
+
+        self.assertEqual((host_ifname, container_ifname, ('out', 'err')),
+                         veth.port_bind('ep', fake_port, []))
+        self.backend.set_alias.assert_called_once_with(host_ifname,
+                                                       mock.ANY)
+        fingerprint = self.backend.set_alias.call_args[0][1]
+        self.assertTrue(fingerprint.startswith(veth.FINGERPRINT_PREFIX))
+
+        # Binding again the same port as recorded is a no-op
+        self.backend.get_alias.return_value = fingerprint
+        mock_create.reset_mock()
+        mock_execute.reset_mock()
+        self.assertEqual((host_ifname, container_ifname, ('', '')),
+                         veth.port_bind('ep', fake_port, []))
+        self.backend.get_alias.assert_called_with(host_ifname)
+        self.backend.get_master.assert_called_with(host_ifname)
+        mock_create.assert_not_called()
+        mock_execute.assert_not_called()
+
+        # The host binding was undone outside kuryr
+        self.backend.get_master.return_value = None
+        veth.port_bind('ep', fake_port, [])
+        mock_create.assert_called_once()
+        mock_execute.assert_called_once()
+        self.backend.get_master.return_value = 7
+        mock_create.reset_mock()
+        mock_execute.reset_mock()
+
+        # Any change of the binding makes it bind again
+        fake_port['mac_address'] = 'fa:16:3e:20:57:c4'
+        veth.port_bind('ep', fake_port, [])
+        mock_create.assert_called_once()
+        mock_execute.assert_called_once()
+        self.assertNotEqual(fingerprint,
+                            self.backend.set_alias.call_args[0][1])
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('out', 'err'))
+    @mock.patch.object(veth, '_create_veth_pair')
+    def test_port_bind_fast_path_disabled(self, mock_create, mock_execute,
+                                          mock_path_exists):
+        # The fast path is disabled by default
+        cfg.CONF.clear_override('rebind_fast_path', group='binding')
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+        mock_create.return_value = ('tap1', 't_c1')
+        self.backend.get_alias.return_value = veth._get_fingerprint(
+            'ep', fake_port, [])
+
+        veth.port_bind('ep', fake_port, [])
+
+        mock_create.assert_called_once()
+        mock_execute.assert_called_once()
+        self.backend.get_alias.assert_not_called()
+        self.backend.set_alias.assert_not_called()
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('out', 'err'))
+    @mock.patch.object(veth, '_create_veth_pair',
+                       return_value=('tap1', 't_c1'))
+    def test_port_bind_record_failure(self, mock_create, mock_execute,
+                                      mock_path_exists):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+        self.backend.set_alias.side_effect = pyroute2.NetlinkError(
+            errno.ENODEV)
+
+        self.assertEqual(('tap1', 't_c1', ('out', 'err')),
+                         veth.port_bind('ep', fake_port, []))
+
+    @mock.patch.object(veth, '_configure_host_iface',
+                       return_value=('out', 'err'))
+    @mock.patch.object(veth, '_create_veth_pair',
+                       return_value=('tap2', 't_c2'))
+    def test_port_bind_many_fast_path(self, mock_create,
+                                      mock_configure_host):
+        fake_ports = [self._get_fake_port(
+            utils.get_hash(), utils.get_hash(),
+            uuidutils.generate_uuid())['port'] for _ in range(2)]
+        bound = veth._get_fingerprint('ep', fake_ports[0], [])
+        self.backend.get_alias.side_effect = [bound, None]
+        requests = [binding.BindRequest('ep', port, [])
+                    for port in fake_ports]
+
+        results = veth.port_bind_many(requests)
+
+        self.assertEqual(
+            [binding.BindResult(veth.utils.get_veth_pair_names(
+                fake_ports[0]['id']) + (('', ''),), None),
+             binding.BindResult(('tap2', 't_c2', ('out', 'err')), None)],
+            results)
+        mock_create.assert_called_once_with(fake_ports[1], [], None,
+                                            netns=None)
+        mock_configure_host.assert_called_once()
+        self.backend.set_alias.assert_called_once_with(
+            'tap2', veth._get_fingerprint('ep', fake_ports[1], []))
+
+    @mock.patch('kuryr.lib.binding.drivers.utils.async_execute',
+                new_callable=mock.AsyncMock)
+    @mock.patch.object(veth, '_create_veth_pair')
+    def test_async_port_bind_fast_path(self, mock_create,
+                                       mock_async_execute):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+        self.backend.get_alias.return_value = veth._get_fingerprint(
+            'ep', fake_port, [], netns='/fake/netns')
+
+        result = asyncio.run(veth.async_port_bind('ep', fake_port, [],
+                                                  netns='/fake/netns'))
+
+        host_ifname, container_ifname = veth.utils.get_veth_pair_names(
+            fake_port['id'])
+        self.assertEqual((host_ifname, container_ifname, ('', '')), result)
+        mock_create.assert_not_called()
+        mock_async_execute.assert_not_awaited()
+
+    @mock.patch('kuryr.lib.binding.veth_pool.get_pool')
+    @mock.patch('kuryr.lib.binding.netlink.get_backend')
+    def test_create_veth_pair_from_pool(self, mock_get_backend,
+                                        mock_get_pool):
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(),
+            uuidutils.generate_uuid())['port']
+
+        host_ifname, container_ifname = veth._create_veth_pair(fake_port, [])
+
+        mock_get_pool.return_value.take.assert_called_once_with(
+            host_ifname, container_ifname)
+        mock_get_backend.return_value.create_veth_pair.assert_called_once()
+
+        mock_get_pool.reset_mock()
+        veth._create_veth_pair(fake_port, [], netns='/fake/netns')
+        mock_get_pool.assert_not_called()
+
+    @mock.patch.object(veth, '_configure_host_iface')
+    @mock.patch.object(veth, '_create_veth_pair')
+    def test_port_bind_many_plugin(self, mock_create, mock_configure_host):
+        plugin = mock.Mock(spec=['bind', 'unbind', 'bind_many'])
+        self.plugins['ovs'] = plugin
+        fake_ports = [self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type=vif_type)['port'] for vif_type in ('ovs', 'bridge')]
+        mock_create.side_effect = [('tap1', 't_c1'), ('tap2', 't_c2')]
+        mock_configure_host.return_value = ('out', 'err')
+        requests = [binding.BindRequest('ep', port, [])
+                    for port in fake_ports]
+
+        results = veth.port_bind_many(requests)
+
+        self.assertEqual(
+            [binding.BindResult(('tap1', 't_c1', ('', '')), None),
+             binding.BindResult(('tap2', 't_c2', ('out', 'err')), None)],
+            results)
+        plugin.bind_many.assert_called_once_with(
+            [('tap1', 'ep', fake_ports[0]['id'],
+              fake_ports[0]['mac_address'])])
+        mock_configure_host.assert_called_once()
+
+    @mock.patch('kuryr.lib.binding.drivers.utils.remove_device')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_plugin(self, mock_execute, mock_remove_device):
+        plugin = mock.Mock(spec=['bind', 'unbind'])
+        plugin.unbind.return_value = ('', '')
+        self.plugins['ovs'] = plugin
+        fake_port = self._get_fake_port(
+            utils.get_hash(), utils.get_hash(), uuidutils.generate_uuid(),
+            vif_type='ovs')['port']
+
+        self.assertEqual(('', ''), veth.port_unbind('ep', fake_port))
+
+        plugin.unbind.assert_called_once()
+        mock_execute.assert_not_called()
+        mock_remove_device.assert_called_once()
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('out', 'err'))
+    def test_configure_host_iface_plugin(self, mock_execute):
+        plugin = mock.Mock(spec=['bind', 'unbind', 'is_supported'])
+        plugin.bind.return_value = ('', '')
+        plugin.is_supported.side_effect = lambda details: not details
+        self.plugins['ovs'] = plugin
+
+        self.assertEqual(('', ''), veth._configure_host_iface(
+            'tap1', 'ep', 'port_id', 'net_id', 'project_id',
+            'fa:16:3e:20:57:c3', kind='ovs'))
+        plugin.bind.assert_called_once_with(
+            'tap1', 'ep', 'port_id', 'net_id', 'project_id',
+            'fa:16:3e:20:57:c3', details=None)
+
+        # Ports the plugin does not support fall back to the script
+        with mock.patch('os.path.exists', return_value=True):
+            self.assertEqual(('out', 'err'), veth._configure_host_iface(
+                'tap1', 'ep', 'port_id', 'net_id', 'project_id',
+                'fa:16:3e:20:57:c3', kind='ovs',
+                details={'ovs_hybrid_plug': True}))
+        mock_execute.assert_called_once()
+
+    @mock.patch('os.path.exists', return_value=True)
+    def test_get_binding_exec_path_cached(self, mock_path_exists):
+        path = veth._get_binding_exec_path('ovs')
+        self.assertEqual(path, veth._get_binding_exec_path('ovs'))
+        mock_path_exists.assert_called_once_with(path)
+
+        mock_path_exists.return_value = False
+        self.assertRaises(exceptions.BindingNotSupportedFailure,
+                          veth._get_binding_exec_path, 'unknown')
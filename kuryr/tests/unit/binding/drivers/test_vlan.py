@@ -13,6 +13,7 @@
 
 from unittest import mock
 
+from oslo_config import cfg
 from oslo_utils import uuidutils
 
 from kuryr.lib.binding.drivers import vlan
@@ -27,6 +28,8 @@ class TestVlanDriver(base.TestCase):
     @mock.patch('kuryr.lib.binding.drivers.utils._configure_container_iface')
     @mock.patch('kuryr.lib.binding.drivers.utils.get_ipdb', mock.MagicMock())
     def test_port_bind(self, mock_configure_container_iface):
+        # No VM port is given, so the link cannot be guessed from its MAC
+        cfg.CONF.set_override('link_iface', 'eth0', group='binding')
         fake_segmentation_id = 100
         fake_docker_endpoint_id = utils.get_hash()
         fake_docker_network_id = utils.get_hash()
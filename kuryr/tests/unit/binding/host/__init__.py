@@ -0,0 +1,64 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from importlib import metadata
+from unittest import mock
+
+from oslo_config import cfg
+
+from kuryr.lib.binding import host
+from kuryr.lib.binding.host import bridge
+from kuryr.lib.binding.host import ovs
+from kuryr.tests.unit import base
+
+
+class TestVifPlugins(base.TestCase):
+    """Unit tests for the vif_type plugin registry"""
+
+    def setUp(self):
+        super(TestVifPlugins, self).setUp()
+        patcher = mock.patch.object(host, '_PLUGINS', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.entry_points = [
+            metadata.EntryPoint('ovs', 'kuryr.lib.binding.host.ovs',
+                                host.ENTRY_POINT_GROUP),
+            metadata.EntryPoint('bridge', 'kuryr.lib.binding.host.bridge',
+                                host.ENTRY_POINT_GROUP),
+            metadata.EntryPoint('broken', 'kuryr.missing.module',
+                                host.ENTRY_POINT_GROUP)]
+        patcher = mock.patch('importlib.metadata.entry_points',
+                             return_value=self.entry_points)
+        self.mock_entry_points = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_plugins(self):
+        cfg.CONF.set_override('enabled_vif_plugins',
+                              ['ovs', 'broken', 'unregistered'],
+                              group='binding')
+
+        self.assertEqual({'ovs': ovs}, host.get_plugins())
+        self.assertIs(host.get_plugins(), host.get_plugins())
+        self.mock_entry_points.assert_called_once_with(
+            group=host.ENTRY_POINT_GROUP)
+
+    def test_get_plugins_none_enabled(self):
+        self.assertEqual({}, host.get_plugins())
+
+    def test_get_plugin(self):
+        cfg.CONF.set_override('enabled_vif_plugins', ['ovs', 'bridge'],
+                              group='binding')
+
+        self.assertIs(ovs, host.get_plugin('ovs', {'port_filter': True}))
+        self.assertIsNone(host.get_plugin('ovs', {'ovs_hybrid_plug': True}))
+        self.assertIs(bridge, host.get_plugin('bridge'))
+        self.assertIsNone(host.get_plugin('midonet'))
@@ -0,0 +1,220 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""A fake ovsdb-server implementing the JSON-RPC methods kuryr uses"""
+
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import uuid
+
+
+def _encode(table, row):
+    if table == 'Bridge':
+        return {'name': row['name'],
+                'ports': ['set', [['uuid', u] for u in sorted(row['ports'])]]}
+    if table == 'Port':
+        interfaces = sorted(row['interfaces'])
+        if len(interfaces) == 1:
+            return {'name': row['name'], 'interfaces': ['uuid', interfaces[0]]}
+        return {'name': row['name'],
+                'interfaces': ['set', [['uuid', u] for u in interfaces]]}
+    return {'name': row['name'],
+            'external_ids': ['map', sorted(row['external_ids'].items())]}
+
+
+def _atoms(value, named):
+    if value[0] == 'set':
+        return {_atom(atom, named) for atom in value[1]}
+    return {_atom(value, named)}
+
+
+def _atom(value, named):
+    if value[0] == 'named-uuid':
+        return named[value[1]]
+    return value[1]
+
+
+class FakeOVSDBServer(object):
+
+    def __init__(self, bridges=('br-int',)):
+        self.tables = {'Bridge': {}, 'Port': {}, 'Interface': {}}
+        for name in bridges:
+            self.tables['Bridge'][str(uuid.uuid4())] = {'name': name,
+                                                        'ports': set()}
+        self.transactions = []
+        self._lock = threading.Lock()
+        self._monitors = []
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, 'db.sock')
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle(self.request)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.path,
+                                                              Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def connection(self):
+        return 'unix:' + self.path
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        os.unlink(self.path)
+        os.rmdir(self._tmpdir)
+
+    def port_names(self, bridge='br-int'):
+        for row in self.tables['Bridge'].values():
+            if row['name'] == bridge:
+                return sorted(self.tables['Port'][u]['name']
+                              for u in row['ports'])
+
+    def interface(self, name):
+        for row in self.tables['Interface'].values():
+            if row['name'] == name:
+                return row
+
+    def _handle(self, sock):
+        decoder = json.JSONDecoder()
+        buf = ''
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            buf += data.decode('utf-8')
+            while buf:
+                try:
+                    msg, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break
+                buf = buf[end:].lstrip()
+                self._dispatch(sock, msg)
+        with self._lock:
+            if sock in self._monitors:
+                self._monitors.remove(sock)
+
+    def _send(self, sock, msg):
+        sock.sendall(json.dumps(msg).encode('utf-8'))
+
+    def _dispatch(self, sock, msg):
+        with self._lock:
+            if msg['method'] == 'monitor':
+                self._monitors.append(sock)
+                result = {table: {u: {'new': _encode(table, row)}
+                                  for u, row in rows.items()}
+                          for table, rows in self.tables.items()}
+            else:
+                self.transactions.append(msg['params'][1:])
+                result = self._transact(msg['params'][1:])
+            self._send(sock, {'id': msg['id'], 'result': result,
+                              'error': None})
+
+    def _matches(self, table, row_uuid, row, where):
+        for column, function, value in where:
+            if column == '_uuid':
+                actual = row_uuid
+                if actual != value[1]:
+                    return False
+            elif function == '==':
+                if row[column] != value:
+                    return False
+            elif value[0] == 'map':
+                if any(row[column].get(k) != v for k, v in value[1]):
+                    return False
+            elif not _atoms(value, {}) <= row[column]:
+                return False
+        return True
+
+    def _select(self, table, where):
+        return [(u, row) for u, row in self.tables[table].items()
+                if self._matches(table, u, row, where)]
+
+    def _transact(self, operations):
+        before = {table: {u: _encode(table, row) for u, row in rows.items()}
+                  for table, rows in self.tables.items()}
+        named = {}
+        results = []
+        for op in operations:
+            table = op['table']
+            if op['op'] == 'insert':
+                row_uuid = str(uuid.uuid4())
+                named[op['uuid-name']] = row_uuid
+                row = dict(op['row'])
+                if table == 'Port':
+                    row['interfaces'] = _atoms(row['interfaces'], named)
+                else:
+                    row['external_ids'] = dict(row['external_ids'][1])
+                self.tables[table][row_uuid] = row
+                results.append({'uuid': ['uuid', row_uuid]})
+            elif op['op'] == 'update':
+                rows = self._select(table, op['where'])
+                for _, row in rows:
+                    row['external_ids'] = dict(
+                        op['row']['external_ids'][1])
+                results.append({'count': len(rows)})
+            elif op['op'] == 'mutate':
+                rows = self._select(table, op['where'])
+                for _, row in rows:
+                    for column, mutator, value in op['mutations']:
+                        atoms = _atoms(value, named)
+                        if mutator == 'insert':
+                            row[column] |= atoms
+                        else:
+                            row[column] -= atoms
+                results.append({'count': len(rows)})
+            elif op['op'] == 'select':
+                rows = self._select(table, op['where'])
+                results.append({'rows': [{'_uuid': ['uuid', u]}
+                                         for u, _ in rows]})
+        self._collect_garbage()
+        self._notify(before)
+        return results
+
+    def _collect_garbage(self):
+        used_ports = set().union(
+            *[row['ports'] for row in self.tables['Bridge'].values()])
+        for row_uuid in set(self.tables['Port']) - used_ports:
+            del self.tables['Port'][row_uuid]
+        used_ifaces = set().union(
+            *[row['interfaces'] for row in self.tables['Port'].values()])
+        for row_uuid in set(self.tables['Interface']) - used_ifaces:
+            del self.tables['Interface'][row_uuid]
+
+    def _notify(self, before):
+        updates = {}
+        for table, rows in self.tables.items():
+            for row_uuid in set(rows) | set(before[table]):
+                old = before[table].get(row_uuid)
+                new = (_encode(table, rows[row_uuid])
+                       if row_uuid in rows else None)
+                if old == new:
+                    continue
+                change = {}
+                if old is not None:
+                    change['old'] = old
+                if new is not None:
+                    change['new'] = new
+                updates.setdefault(table, {})[row_uuid] = change
+        if not updates:
+            return
+        for sock in self._monitors:
+            self._send(sock, {'id': None, 'method': 'update',
+                              'params': ['kuryr', updates]})
@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+from unittest import mock
+
+from oslo_utils import uuidutils
+import pyroute2
+
+from kuryr.lib.binding.host import bridge
+from kuryr.tests.unit import base
+
+
+class TestBridgeBinding(base.TestCase):
+    """Unit tests for the native bridge binding"""
+
+    def setUp(self):
+        super(TestBridgeBinding, self).setUp()
+        bridge._BRIDGES.clear()
+        self.addCleanup(bridge._BRIDGES.clear)
+        patcher = mock.patch('kuryr.lib.binding.netlink.get_backend')
+        self.backend = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.net_id = uuidutils.generate_uuid()
+        self.br_name = 'brq' + self.net_id[:11]
+
+    def _bind(self, ifname):
+        return bridge.bind(ifname, 'ep', 'port_id', self.net_id,
+                           'project_id', 'fa:16:3e:20:57:c3')
+
+    def test_bind(self):
+        self.assertEqual(('', ''), self._bind('tap1'))
+        self._bind('tap2')
+
+        # The bridge is only ensured once
+        self.backend.ensure_bridge.assert_called_once_with(self.br_name)
+        self.backend.set_master.assert_has_calls([
+            mock.call('tap1', self.br_name),
+            mock.call('tap2', self.br_name)])
+
+    def test_bind_bridge_removed(self):
+        self._bind('tap1')
+        self.backend.set_master.side_effect = [
+            pyroute2.NetlinkError(errno.ENODEV), None]
+
+        self._bind('tap2')
+
+        self.assertEqual(2, self.backend.ensure_bridge.call_count)
+        self.assertEqual(3, self.backend.set_master.call_count)
+
+    def test_bind_failure(self):
+        self.backend.set_master.side_effect = pyroute2.NetlinkError(
+            errno.EPERM)
+        self.assertRaises(pyroute2.NetlinkError, self._bind, 'tap1')
+        self.backend.ensure_bridge.assert_called_once_with(self.br_name)
+
+    def test_unbind(self):
+        self.assertEqual(('', ''), bridge.unbind('tap1', 'ep', 'port_id',
+                                                 'fa:16:3e:20:57:c3'))
+        self.backend.set_master.assert_called_once_with('tap1', None)
@@ -0,0 +1,135 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+from oslo_utils import uuidutils
+
+from kuryr.lib.binding.host import ovs
+from kuryr.lib.binding.host import ovsdb
+from kuryr.tests.unit import base
+from kuryr.tests.unit.binding.host import fake_ovsdb
+
+
+class TestOVSBinding(base.TestCase):
+    """Unit tests for the native ovs binding against a fake ovsdb-server"""
+
+    def setUp(self):
+        super(TestOVSBinding, self).setUp()
+        self.server = fake_ovsdb.FakeOVSDBServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        cfg.CONF.set_override('ovsdb_connection', self.server.connection,
+                              group='binding')
+        ovs._CONNECTION = None
+        self.addCleanup(self._close_connection)
+        self.endpoint_id = uuidutils.generate_uuid()
+        self.port_id = uuidutils.generate_uuid()
+        self.hwaddr = 'fa:16:3e:20:57:c3'
+
+    def _close_connection(self):
+        if ovs._CONNECTION is not None:
+            ovs._CONNECTION.close()
+            ovs._CONNECTION = None
+
+    def _bind(self, ifname='tap1', port_id=None):
+        return ovs.bind(ifname, self.endpoint_id, port_id or self.port_id,
+                        'net_id', 'project_id', self.hwaddr)
+
+    def test_is_supported(self):
+        self.assertTrue(ovs.is_supported({'port_filter': True}))
+        self.assertTrue(ovs.is_supported(None))
+        self.assertFalse(ovs.is_supported({'ovs_hybrid_plug': True}))
+
+    def test_bind(self):
+        self.assertEqual(('', ''), self._bind())
+
+        self.assertEqual(['tap1'], self.server.port_names())
+        self.assertEqual({'attached-mac': self.hwaddr,
+                          'iface-id': self.port_id,
+                          'vm-uuid': self.endpoint_id,
+                          'iface-status': 'active',
+                          'owner': 'kuryr'},
+                         self.server.interface('tap1')['external_ids'])
+        self.assertEqual(1, len(self.server.transactions))
+
+    def test_bind_existing(self):
+        self._bind()
+        new_port_id = uuidutils.generate_uuid()
+        self._bind(port_id=new_port_id)
+
+        self.assertEqual(['tap1'], self.server.port_names())
+        self.assertEqual(
+            new_port_id,
+            self.server.interface('tap1')['external_ids']['iface-id'])
+        self.assertEqual(['update'],
+                         [op['op'] for op in self.server.transactions[1]])
+
+    def test_bind_stale_index(self):
+        self._bind()
+        # tap1 was removed from the database before its update was received
+        conn = ovs._CONNECTION
+        conn._port_names['tap1'] = 'stale-port'
+        conn.ports['stale-port'] = {'name': 'tap1',
+                                    'interfaces': {'stale-iface'}}
+        conn.interfaces['stale-iface'] = {'name': 'tap1',
+                                          'external_ids': {}}
+        self.server.tables['Bridge'][conn.find_bridge('br-int')][
+            'ports'].clear()
+        self.server._collect_garbage()
+
+        self._bind()
+
+        self.assertEqual(['tap1'], self.server.port_names())
+        self.assertEqual(['update'],
+                         [op['op'] for op in self.server.transactions[1]])
+        self.assertEqual(['insert', 'insert', 'mutate'],
+                         [op['op'] for op in self.server.transactions[2]])
+
+    def test_bind_many(self):
+        ovs.bind_many([('tap%d' % i, self.endpoint_id,
+                        uuidutils.generate_uuid(), self.hwaddr)
+                       for i in range(3)])
+
+        self.assertEqual(['tap0', 'tap1', 'tap2'], self.server.port_names())
+        self.assertEqual(1, len(self.server.transactions))
+
+    def test_bind_missing_bridge(self):
+        cfg.CONF.set_override('ovs_integration_bridge', 'br-missing',
+                              group='binding')
+        self.assertRaises(ovsdb.OVSDBError, self._bind)
+
+    def test_unbind(self):
+        self._bind()
+        self._bind('tap2', port_id=uuidutils.generate_uuid())
+
+        self.assertEqual(('', ''), ovs.unbind('tap1', self.endpoint_id,
+                                              self.port_id, self.hwaddr))
+
+        self.assertEqual(['tap2'], self.server.port_names())
+        self.assertIsNone(self.server.interface('tap1'))
+        # The port was found in the local index, no select was needed
+        self.assertEqual(['mutate'],
+                         [op['op'] for op in self.server.transactions[-1]])
+        self.assertEqual((None, None),
+                         ovs._CONNECTION.find_port_by_iface_id(self.port_id))
+
+    def test_unbind_not_indexed(self):
+        self._bind()
+        ovs._CONNECTION._iface_ids.clear()
+
+        ovs.unbind('tap1', self.endpoint_id, self.port_id, self.hwaddr)
+
+        self.assertEqual([], self.server.port_names())
+
+    def test_unbind_missing(self):
+        self.assertRaises(ovsdb.OVSDBError, ovs.unbind, 'tap1',
+                          self.endpoint_id, self.port_id, self.hwaddr)
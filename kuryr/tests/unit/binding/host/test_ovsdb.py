@@ -0,0 +1,74 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import threading
+from unittest import mock
+
+from kuryr.lib.binding.host import ovsdb
+from kuryr.tests.unit import base
+from kuryr.tests.unit.binding.host import fake_ovsdb
+
+
+def _port(name):
+    return {'name': name, 'interfaces': ['set', []]}
+
+
+class TestOVSDBConnection(base.TestCase):
+    """Unit tests for the OVSDB JSON-RPC client"""
+
+    def test_framer(self):
+        messages = [{'id': 1, 'result': {'name': 'br-é"{\\'}},
+                    {'id': None, 'method': 'update',
+                     'params': ['kuryr', {'Port': {}}]}]
+        data = b'\n'.join(json.dumps(msg, ensure_ascii=False).encode('utf-8')
+                          for msg in messages)
+
+        for size in (1, 2, 3, len(data)):
+            framer = ovsdb._Framer()
+            frames = []
+            # Splits the multibyte character and the escapes too
+            for i in range(0, len(data), size):
+                frames.extend(framer.feed(data[i:i + size]))
+            self.assertEqual(messages, [json.loads(f) for f in frames])
+
+    def test_monitor_reply_before_updates(self):
+        conn = ovsdb.Connection('unix:/fake')
+        waiter = [threading.Event(), None, conn._load_state]
+        conn._pending[0] = waiter
+
+        conn._dispatch({'id': 0, 'error': None, 'result': {
+            'Port': {'p1': {'new': _port('tap1')}}}})
+        conn._dispatch({'id': None, 'method': 'update', 'params': [
+            'kuryr', {'Port': {'p2': {'new': _port('tap2')}}}]})
+
+        self.assertTrue(waiter[0].is_set())
+        self.assertEqual({'p1', 'p2'}, set(conn.ports))
+
+    def test_start_monitor_failure(self):
+        server = fake_ovsdb.FakeOVSDBServer()
+        server.start()
+        self.addCleanup(server.stop)
+        conn = ovsdb.Connection(server.connection, timeout=5)
+        self.addCleanup(conn.close)
+        request = conn._request
+
+        with mock.patch.object(conn, '_request',
+                               side_effect=ovsdb.OVSDBError('failed')):
+            self.assertRaises(ovsdb.OVSDBError, conn.start)
+        self.assertIsNone(conn._sock)
+
+        with mock.patch.object(conn, '_request',
+                               side_effect=request) as mock_request:
+            conn.start()
+            self.assertEqual('monitor', mock_request.call_args[0][0])
+        self.assertIsNotNone(conn.find_bridge('br-int'))
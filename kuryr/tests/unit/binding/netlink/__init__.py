@@ -0,0 +1,36 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+from oslo_config import cfg
+
+from kuryr.lib.binding import netlink
+from kuryr.lib.binding.netlink import ipdb
+from kuryr.lib.binding.netlink import iproute
+from kuryr.tests.unit import base
+
+
+class TestNetlink(base.TestCase):
+    """Unit tests for the netlink backend selection"""
+
+    @mock.patch.object(netlink, '_BACKEND', None)
+    def test_get_backend_default(self):
+        backend = netlink.get_backend()
+        self.assertIsInstance(backend, ipdb.IPDBBackend)
+        self.assertIs(backend, netlink.get_backend())
+
+    @mock.patch.object(netlink, '_BACKEND', None)
+    def test_get_backend_iproute(self):
+        cfg.CONF.set_override('netlink_backend', 'iproute', group='binding')
+        self.assertIsInstance(netlink.get_backend(),
+                              iproute.IPRouteBackend)
@@ -0,0 +1,107 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+from unittest import mock
+
+import pyroute2
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+
+from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding.netlink import index
+from kuryr.tests.unit import base
+
+FAKE_PORT_ID = '2d1b5b8a-8c1f-4c8e-9a0b-6c9c1f3f6e11'
+
+
+def _link_msg(event, idx, ifname, address):
+    msg = ifinfmsg()
+    msg['index'] = idx
+    msg['event'] = event
+    msg['attrs'] = [('IFLA_IFNAME', ifname), ('IFLA_ADDRESS', address)]
+    return msg
+
+
+class TestLinkIndex(base.TestCase):
+    """Unit tests for the event maintained link index"""
+
+    @mock.patch('pyroute2.IPRoute')
+    def setUp(self, mock_iproute):
+        super(TestLinkIndex, self).setUp()
+        mock_iproute.return_value.__enter__.return_value.get_links.\
+            return_value = [
+                _link_msg('RTM_NEWLINK', 2, 'eth0', 'fa:16:3e:00:00:01'),
+                _link_msg('RTM_NEWLINK', 3, 'ipvl0', 'fa:16:3e:00:00:01')]
+        self.index = index.LinkIndex()
+        self.index.resync()
+
+    def test_dump(self):
+        self.assertEqual(2, self.index.get_index('eth0'))
+        self.assertEqual(3, self.index.get_index('ipvl0'))
+        self.assertIsNone(self.index.get_index('eth1'))
+        self.assertEqual('eth0', self.index.get_ifname_by_address(
+            'fa:16:3e:00:00:01'))
+
+    def test_new_and_deleted_links(self):
+        host_ifname, container_ifname = utils.get_veth_pair_names(
+            FAKE_PORT_ID)
+        self.index.process_message(_link_msg(
+            'RTM_NEWLINK', 10, host_ifname, 'fa:16:3e:00:00:0a'))
+        self.index.process_message(_link_msg(
+            'RTM_NEWLINK', 11, container_ifname, 'fa:16:3e:00:00:0b'))
+
+        self.assertEqual([host_ifname, container_ifname],
+                         self.index.get_port_devices(FAKE_PORT_ID))
+        self.assertEqual(container_ifname, self.index.get_ifname_by_address(
+            'fa:16:3e:00:00:0b'))
+
+        self.index.process_message(_link_msg(
+            'RTM_DELLINK', 11, container_ifname, 'fa:16:3e:00:00:0b'))
+
+        self.assertEqual([host_ifname],
+                         self.index.get_port_devices(FAKE_PORT_ID))
+        self.assertIsNone(self.index.get_ifname_by_address(
+            'fa:16:3e:00:00:0b'))
+
+    def test_renamed_link(self):
+        self.index.process_message(_link_msg(
+            'RTM_NEWLINK', 3, 'eth1', 'fa:16:3e:00:00:02'))
+
+        self.assertIsNone(self.index.get_index('ipvl0'))
+        self.assertEqual(3, self.index.get_index('eth1'))
+        self.assertEqual('eth1', self.index.get_ifname_by_address(
+            'fa:16:3e:00:00:02'))
+        self.assertEqual('eth0', self.index.get_ifname_by_address(
+            'fa:16:3e:00:00:01'))
+
+    @mock.patch('pyroute2.IPRoute')
+    def test_start_failure(self, mock_iproute):
+        mock_iproute.return_value.bind.side_effect = OSError()
+
+        self.assertRaises(OSError, self.index.start)
+
+        self.assertTrue(self.index.failed)
+        self.assertIsNone(self.index.get_index('eth0'))
+        mock_iproute.return_value.close.assert_called_once_with()
+
+    def test_listen_failure(self):
+        self.index._events = mock.Mock()
+        self.index._events.get.side_effect = [
+            pyroute2.NetlinkError(errno.ENOBUFS), OSError()]
+
+        with mock.patch.object(self.index, 'resync') as mock_resync:
+            self.index._listen()
+
+        mock_resync.assert_called_once_with()
+        self.assertTrue(self.index.failed)
+        self.assertIsNone(self.index.get_index('eth0'))
+        self.index._events.close.assert_called_once_with()
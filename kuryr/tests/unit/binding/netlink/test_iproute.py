@@ -0,0 +1,353 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+import threading
+from unittest import mock
+
+from oslo_config import cfg
+import pyroute2
+
+from kuryr.lib.binding.netlink import iproute
+from kuryr.tests.unit import base
+
+
+class TestIPRouteBackend(base.TestCase):
+    """Unit tests for the IPRoute netlink backend"""
+
+    def setUp(self):
+        super(TestIPRouteBackend, self).setUp()
+        cfg.CONF.set_override('netlink_link_index', False, group='binding')
+        self.backend = iproute.IPRouteBackend()
+        self.ipr = mock.Mock()
+        self.backend._ipr = self.ipr
+        self.indexes = {'tap1': 10, 't_c1': 11, 'eth0': 2}
+        self.ipr.link_lookup.side_effect = lambda ifname: (
+            [self.indexes[ifname]] if ifname in self.indexes else [])
+        self.subnets = [{'id': 'subnet1', 'cidr': '10.0.0.0/24'}]
+        self.fixed_ips = [{'subnet_id': 'subnet1',
+                           'ip_address': '10.0.0.5'}]
+
+    def test_create_veth_pair(self):
+        self.backend.create_veth_pair('tap1', 't_c1', self.subnets,
+                                      self.fixed_ips, mtu=1450,
+                                      hwaddr='fa:16:3e:20:57:c3')
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='tap1', kind='veth', peer='t_c1'),
+            mock.call('set', index=10, state='up'),
+            mock.call('set', index=11, mtu=1450,
+                      address='fa:16:3e:20:57:c3', state='up')])
+        self.ipr.addr.assert_called_once_with('add', index=11,
+                                              address='10.0.0.5', mask=24)
+
+    def _set_existing_peer(self, mtu=1450, hwaddr='FA:16:3E:20:57:C3',
+                           flags=iproute.IFF_UP, addresses=()):
+        link = mock.MagicMock()
+        link.__getitem__.side_effect = {'flags': flags}.__getitem__
+        link.get_attr.side_effect = {'IFLA_MTU': mtu,
+                                     'IFLA_ADDRESS': hwaddr}.get
+        self.ipr.get_links.return_value = [link]
+        addrs = []
+        for address, prefixlen in addresses:
+            addr = mock.MagicMock()
+            addr.__getitem__.side_effect = {'prefixlen': prefixlen}.get
+            addr.get_attr.return_value = address
+            addrs.append(addr)
+        self.ipr.get_addr.return_value = addrs
+
+    def test_create_veth_pair_reuse(self):
+        self.ipr.link.side_effect = [pyroute2.NetlinkError(errno.EEXIST),
+                                     None, None]
+        self._set_existing_peer(addresses=[('10.0.0.5', 24)])
+
+        self.backend.create_veth_pair('tap1', 't_c1', self.subnets,
+                                      self.fixed_ips, mtu=1450,
+                                      hwaddr='fa:16:3e:20:57:c3')
+
+        # Already configured, nothing is written to the peer
+        self.assertEqual(2, self.ipr.link.call_count)
+        self.ipr.get_links.assert_called_once_with(11)
+        self.ipr.get_addr.assert_called_once_with(index=11)
+        self.assertFalse(self.ipr.addr.called)
+
+    def test_create_veth_pair_reuse_changes(self):
+        self.ipr.link.side_effect = [pyroute2.NetlinkError(errno.EEXIST),
+                                     None, None]
+        self._set_existing_peer(mtu=1500, flags=0)
+
+        self.backend.create_veth_pair('tap1', 't_c1', self.subnets,
+                                      self.fixed_ips, mtu=1450,
+                                      hwaddr='fa:16:3e:20:57:c3')
+
+        self.ipr.addr.assert_called_once_with('add', index=11,
+                                              address='10.0.0.5', mask=24)
+        self.ipr.link.assert_called_with('set', index=11, mtu=1450,
+                                         state='up')
+
+    def test_create_veth_pair_failure(self):
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EPERM)
+        self.assertRaises(pyroute2.NetlinkError,
+                          self.backend.create_veth_pair, 'tap1', 't_c1',
+                          self.subnets, self.fixed_ips)
+
+    def test_create_link(self):
+        self.indexes['t_c2'] = 12
+        self.backend.create_link('t_c2', 'vlan', 'eth0', self.subnets,
+                                 self.fixed_ips, vlan_id=100)
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='t_c2', kind='vlan', link=2,
+                      vlan_id=100),
+            mock.call('set', index=12, mtu=None, address=None,
+                      state='up')])
+
+    def test_remove_device(self):
+        self.assertEqual(10, self.backend.remove_device('tap1'))
+        self.ipr.link.assert_called_once_with('del', index=10)
+
+    def test_remove_device_missing(self):
+        self.assertIsNone(self.backend.remove_device('tap2'))
+        self.ipr.link.assert_not_called()
+
+    def test_get_ifname_by_address(self):
+        link = mock.Mock()
+        link.get_attr.side_effect = {'IFLA_ADDRESS': 'fa:16:3e:20:57:c3',
+                                     'IFLA_IFNAME': 'eth0'}.get
+        self.ipr.get_links.return_value = [link]
+
+        self.assertEqual('eth0', self.backend.get_ifname_by_address(
+            'fa:16:3e:20:57:c3'))
+        self.assertIsNone(self.backend.get_ifname_by_address(
+            'fa:16:3e:20:57:c4'))
+
+    @mock.patch('kuryr.lib.binding.netlink.index.LinkIndex')
+    def test_index_started_once(self, mock_link_index):
+        cfg.CONF.set_override('netlink_link_index', True, group='binding')
+        mock_link_index.return_value.failed = False
+        started = threading.Event()
+        mock_link_index.return_value.start.side_effect = (
+            lambda: started.wait(1))
+
+        threads = [threading.Thread(target=lambda: self.backend.index)
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertIs(mock_link_index.return_value, self.backend.index)
+        mock_link_index.return_value.start.assert_called_once_with()
+
+    @mock.patch.object(iproute.LOG, 'exception')
+    @mock.patch('kuryr.lib.binding.netlink.index.LinkIndex')
+    def test_index_start_failure(self, mock_link_index, mock_log):
+        cfg.CONF.set_override('netlink_link_index', True, group='binding')
+        link_index = mock_link_index.return_value
+
+        def start():
+            link_index.failed = True
+            raise OSError()
+        link_index.start.side_effect = start
+
+        self.assertIsNone(self.backend.index)
+        self.assertIsNone(self.backend.index)
+        self.assertEqual(10, self.backend.remove_device('tap1'))
+        link_index.start.assert_called_once_with()
+        mock_log.assert_called_once()
+
+    def test_get_ifname_by_address_from_index(self):
+        self.backend._index = mock.Mock(failed=False)
+        self.backend._index.get_ifname_by_address.return_value = 'eth0'
+
+        self.assertEqual('eth0', self.backend.get_ifname_by_address(
+            'fa:16:3e:20:57:c3'))
+        self.ipr.get_links.assert_not_called()
+
+    def test_remove_device_from_index(self):
+        self.backend._index = mock.Mock(failed=False)
+        self.backend._index.get_index.return_value = 20
+
+        self.assertEqual(20, self.backend.remove_device('t_c2'))
+        self.ipr.link.assert_called_once_with('del', index=20)
+        self.ipr.link_lookup.assert_not_called()
+
+    def test_remove_device_stale_index(self):
+        self.backend._index = mock.Mock(failed=False)
+        self.backend._index.get_index.return_value = 20
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.ENODEV)
+
+        self.assertIsNone(self.backend.remove_device('t_c2'))
+
+    def test_remove_device_recreated(self):
+        # t_c1 was removed and recreated before the link index saw it
+        self.backend._index = mock.Mock(failed=False)
+        self.backend._index.get_index.return_value = 20
+        self.ipr.link.side_effect = [pyroute2.NetlinkError(errno.ENODEV),
+                                     None]
+
+        self.assertEqual(11, self.backend.remove_device('t_c1'))
+        self.ipr.link.assert_has_calls([mock.call('del', index=20),
+                                        mock.call('del', index=11)])
+
+    def test_set_master_recreated(self):
+        self.indexes['brq1'] = 21
+        self.backend._index = mock.Mock(failed=False)
+        self.backend._index.get_index.side_effect = {'tap1': 20}.get
+        self.ipr.link.side_effect = [pyroute2.NetlinkError(errno.ENODEV),
+                                     None]
+
+        self.backend.set_master('tap1', 'brq1')
+
+        self.ipr.link.assert_called_with('set', index=10, master=21,
+                                         state='up')
+
+    def test_failed_index(self):
+        self.backend._index = mock.Mock(failed=True)
+
+        self.assertIsNone(self.backend.index)
+        self.assertEqual(10, self.backend.remove_device('tap1'))
+        self.backend._index.get_index.assert_not_called()
+
+    @mock.patch.object(iproute, 'netns_socket')
+    @mock.patch.object(iproute, 'netns_fd')
+    def test_create_veth_pair_in_netns(self, mock_netns_fd,
+                                       mock_netns_socket):
+        mock_netns_fd.return_value.__enter__.return_value = 42
+        ns_ipr = mock_netns_socket.return_value.__enter__.return_value
+        ns_ipr.link_lookup.return_value = [3]
+
+        self.backend.create_veth_pair('tap1', 't_c1', self.subnets,
+                                      self.fixed_ips, mtu=1450,
+                                      netns='/var/run/docker/netns/fake')
+
+        mock_netns_fd.assert_called_once_with('/var/run/docker/netns/fake')
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='tap1', kind='veth',
+                      peer={'ifname': 't_c1', 'net_ns_fd': 42}),
+            mock.call('set', index=10, state='up')])
+        ns_ipr.link_lookup.assert_called_once_with(ifname='t_c1')
+        ns_ipr.addr.assert_called_once_with('add', index=3,
+                                            address='10.0.0.5', mask=24)
+        ns_ipr.link.assert_called_once_with('set', index=3, mtu=1450,
+                                            address=None, state='up')
+
+    @mock.patch.object(iproute, 'netns_socket')
+    @mock.patch.object(iproute, 'netns_fd')
+    def test_create_link_in_netns(self, mock_netns_fd, mock_netns_socket):
+        mock_netns_fd.return_value.__enter__.return_value = 42
+        ns_ipr = mock_netns_socket.return_value.__enter__.return_value
+        ns_ipr.link_lookup.return_value = [3]
+
+        self.backend.create_link('t_c2', 'ipvlan', 'eth0', self.subnets,
+                                 self.fixed_ips, netns=42, mode=0)
+
+        self.ipr.link.assert_called_once_with(
+            'add', ifname='t_c2', kind='ipvlan', link=2, net_ns_fd=42,
+            mode=0)
+        ns_ipr.link.assert_called_once_with('set', index=3, mtu=None,
+                                            address=None, state='up')
+
+    @mock.patch('os.close')
+    @mock.patch('os.open', return_value=42)
+    def test_netns_fd(self, mock_open, mock_close):
+        with iproute.netns_fd('fake') as fd:
+            self.assertEqual(42, fd)
+        mock_open.assert_called_once_with('/var/run/netns/fake', mock.ANY)
+        mock_close.assert_called_once_with(42)
+
+        with iproute.netns_fd(7) as fd:
+            self.assertEqual(7, fd)
+        self.assertEqual(1, mock_open.call_count)
+
+    def test_ensure_bridge(self):
+        self.indexes['brq1'] = 20
+        self.backend.ensure_bridge('brq1')
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='brq1', kind='bridge',
+                      br_forward_delay=0, br_stp_state=0),
+            mock.call('set', index=20, state='up')])
+
+    def test_ensure_bridge_existing(self):
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EEXIST)
+        self.backend.ensure_bridge('brq1')
+        self.ipr.link.assert_called_once()
+
+    def test_set_master(self):
+        self.indexes['brq1'] = 20
+        self.backend.set_master('tap1', 'brq1')
+        self.ipr.link.assert_called_once_with('set', index=10, master=20,
+                                              state='up')
+
+    def test_set_master_missing_bridge(self):
+        self.assertRaises(pyroute2.NetlinkError, self.backend.set_master,
+                          'tap1', 'brq1')
+        self.ipr.link.assert_not_called()
+
+    def test_set_nomaster(self):
+        self.backend.set_master('tap1', None)
+        self.ipr.link.assert_called_once_with('set', index=10, master=0)
+
+        self.ipr.link.reset_mock()
+        self.backend.set_master('missing', None)
+        self.ipr.link.assert_not_called()
+
+    def test_list_vlan_ids(self):
+        def link(kind, vlan_id=None):
+            data = mock.Mock()
+            data.get_attr.return_value = vlan_id
+            info = mock.Mock()
+            info.get_attr.side_effect = lambda attr: {
+                'IFLA_INFO_KIND': kind, 'IFLA_INFO_DATA': data}[attr]
+            msg = mock.Mock()
+            msg.get_attr.return_value = info if kind else None
+            return msg
+
+        self.ipr.get_links.return_value = [
+            link(None), link('veth'), link('vlan', 100), link('vlan', 200)]
+
+        self.assertEqual({100, 200}, self.backend.list_vlan_ids())
+
+    def test_dump_links(self):
+        self.assertEqual((self.ipr.get_links.return_value,
+                          self.ipr.get_addr.return_value),
+                         self.backend.dump_links())
+        self.ipr.get_links.assert_called_once_with()
+        self.ipr.get_addr.assert_called_once_with()
+
+    def test_get_alias(self):
+        link = mock.Mock()
+        link.get_attr.return_value = 'alias'
+        self.ipr.get_links.return_value = [link]
+
+        self.assertEqual('alias', self.backend.get_alias('tap1'))
+        self.ipr.get_links.assert_called_once_with(10)
+        link.get_attr.assert_called_once_with('IFLA_IFALIAS')
+        self.assertIsNone(self.backend.get_alias('missing'))
+
+    def test_get_master(self):
+        link = mock.Mock()
+        link.get_attr.side_effect = [7, 0]
+        self.ipr.get_links.return_value = [link]
+
+        self.assertEqual(7, self.backend.get_master('tap1'))
+        link.get_attr.assert_called_once_with('IFLA_MASTER')
+        self.assertIsNone(self.backend.get_master('tap1'))
+        self.assertIsNone(self.backend.get_master('missing'))
+
+    def test_set_alias(self):
+        self.backend.set_alias('tap1', 'alias')
+
+        self.ipr.link.assert_called_once_with('set', index=10,
+                                              ifalias='alias')
@@ -0,0 +1,159 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import os
+import stat
+import threading
+import time
+from unittest import mock
+
+import fixtures
+from oslo_concurrency import processutils
+from oslo_config import cfg
+
+from kuryr.lib.binding.drivers import utils
+from kuryr.lib.binding import helper
+from kuryr.tests.unit import base
+
+_SCRIPT = """#!/bin/sh
+sleep $1
+echo "out $2"
+echo "err $2" >&2
+exit $3
+"""
+
+
+class TestBindingHelper(base.TestCase):
+    """Unit tests for the binding helper server and client"""
+
+    def setUp(self):
+        super(TestBindingHelper, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.bindir = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(self.bindir)
+        self.script = os.path.join(self.bindir, 'fake')
+        with open(self.script, 'w') as f:
+            f.write(_SCRIPT)
+        os.chmod(self.script, stat.S_IRWXU)
+        self.path = os.path.join(self.tmpdir, 'helper.sock')
+        self.server = helper.Server(self.path, self.bindir, concurrency=4,
+                                    timeout=1)
+        self._start_server()
+        self.client = helper.Client(self.path, timeout=1)
+        self.addCleanup(self.client.close)
+
+    def _start_server(self):
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self.server.start())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def shutdown():
+            self.server.close()
+            # The connections end once the clients are closed
+            tasks = [task for task in asyncio.all_tasks()
+                     if task is not asyncio.current_task()]
+            if tasks:
+                await asyncio.wait(tasks, timeout=5)
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        self.addCleanup(stop)
+
+    def test_frames(self):
+        frames = b''.join([helper.encode_frame({'id': 1}),
+                           helper.encode_frame({'id': 2})])
+        msgs, rest = helper.decode_frames(frames[:-1])
+        self.assertEqual([{'id': 1}], msgs)
+        msgs, rest = helper.decode_frames(rest + frames[-1:])
+        self.assertEqual([{'id': 2}], msgs)
+        self.assertEqual(b'', rest)
+
+    def test_execute(self):
+        self.assertEqual(('out a\n', 'err a\n'),
+                         self.client.execute(self.script, 0, 'a', 0))
+
+    def test_execute_failure(self):
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              self.client.execute, self.script, 0, 'a', 3)
+        self.assertEqual(3, e.exit_code)
+        self.assertEqual('err a\n', e.stderr)
+
+    def test_execute_pipelined(self):
+        start = time.monotonic()
+        slow = self.client.submit(self.script, 0.5, 'slow', 0)
+        fast = self.client.submit(self.script, 0, 'fast', 0)
+
+        self.assertEqual('out fast\n', fast.result(5)['stdout'])
+        self.assertFalse(slow.done())
+        self.assertEqual('out slow\n', slow.result(5)['stdout'])
+        # Both commands ran concurrently on the same connection
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_execute_timeout(self):
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              self.client.execute, self.script, 5, 'a', 0)
+        self.assertEqual(helper.TIMEOUT_EXIT_CODE, e.exit_code)
+
+    def test_execute_result_timeout(self):
+        with mock.patch.object(self.client, '_result_timeout',
+                               return_value=0.1):
+            self.assertRaises(helper.HelperError, self.client.execute,
+                              self.script, 0.5, 'a', 0)
+        self.assertEqual({}, self.client._pending)
+
+    def test_async_execute_cancelled(self):
+        async def run():
+            calls = [asyncio.ensure_future(self.client.async_execute(
+                self.script, 0.3, name, 0)) for name in 'abc']
+            await asyncio.sleep(0.1)
+            calls[1].cancel()
+            return await asyncio.gather(*calls, return_exceptions=True)
+
+        results = asyncio.run(run())
+        sock = self.client._sock
+
+        self.assertEqual(('out a\n', 'err a\n'), results[0])
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+        self.assertEqual(('out c\n', 'err c\n'), results[2])
+        # The response of the cancelled call did not break the connection
+        time.sleep(0.3)
+        self.assertEqual(('out d\n', 'err d\n'),
+                         self.client.execute(self.script, 0, 'd', 0))
+        self.assertIs(sock, self.client._sock)
+        self.assertEqual({}, self.client._pending)
+
+    def test_execute_outside_bindir(self):
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              self.client.execute, '/bin/true')
+        self.assertEqual(126, e.exit_code)
+
+    def test_async_execute(self):
+        self.assertEqual(('out a\n', 'err a\n'), asyncio.run(
+            self.client.async_execute(self.script, 0, 'a', 0)))
+
+    def test_execute_no_helper(self):
+        client = helper.Client(os.path.join(self.tmpdir, 'missing'), 1)
+        self.assertRaises(helper.HelperError, client.execute, self.script)
+
+    def test_drivers_execute(self):
+        cfg.CONF.set_override('helper_socket', self.path, group='binding')
+        with mock.patch.object(helper, '_CLIENT', None), \
+                mock.patch('oslo_concurrency.processutils.execute') as m:
+            self.assertEqual(('out a\n', 'err a\n'),
+                             utils.execute(self.script, 0, 'a', 0))
+            helper._CLIENT.close()
+        m.assert_not_called()
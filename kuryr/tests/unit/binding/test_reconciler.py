@@ -0,0 +1,183 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+import fixtures
+from oslo_config import cfg
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding import reconciler
+from kuryr.tests.unit import base
+
+PORT_IDS = ['%08d-0000-0000-0000-000000000000' % i for i in range(4)]
+
+
+def _port(i):
+    return {'id': PORT_IDS[i], 'mac_address': 'FA:16:3E:00:00:0%d' % i,
+            'fixed_ips': [{'subnet_id': 'subnet',
+                           'ip_address': '10.0.0.%d' % (i + 10)}]}
+
+
+def _request(i, **kwargs):
+    return binding.BindRequest('endpoint', _port(i),
+                               [{'id': 'subnet', 'cidr': '10.0.0.0/24'}],
+                               {'mtu': 1450}, **kwargs)
+
+
+def _link(index, kind='veth', mtu=1450, address=None, up=True,
+          peer_netns=None, addresses=(), alias=None, master=None):
+    return reconciler.Link(index, kind, mtu, address, up, peer_netns,
+                           set(addresses), alias, master)
+
+
+def _host_link(index, **kwargs):
+    return _link(index, master=3, **kwargs)
+
+
+def _container_link(i, **kwargs):
+    attrs = {'address': 'fa:16:3e:00:00:0%d' % i,
+             'addresses': {('10.0.0.%d' % (i + 10), 24)}}
+    attrs.update(kwargs)
+    return _link(100 + i, **attrs)
+
+
+class TestReconciler(base.TestCase):
+    """Unit tests for the veth bindings reconciler"""
+
+    @mock.patch('kuryr.lib.binding.netlink.get_backend')
+    def test_dump_links(self, mock_get_backend):
+        addr = mock.Mock()
+        addr.__getitem__ = lambda self, key: {'index': 5, 'prefixlen': 24}[key]
+        addr.get_attr.return_value = '10.0.0.5'
+        info = mock.Mock()
+        info.get_attr.return_value = 'veth'
+        link = mock.Mock()
+        link.__getitem__ = lambda self, key: {'index': 5, 'flags': 0x1003}[key]
+        link.get_attr.side_effect = lambda attr: {
+            'IFLA_IFNAME': 't_c00000001-00', 'IFLA_LINKINFO': info,
+            'IFLA_ADDRESS': 'FA:16:3E:00:00:01', 'IFLA_MTU': 1450,
+            'IFLA_LINK_NETNSID': None, 'IFLA_IFALIAS': None,
+            'IFLA_MASTER': 3}[attr]
+        mock_get_backend.return_value.dump_links.return_value = (
+            [link], [addr])
+
+        links = reconciler.dump_links()
+
+        self.assertEqual(
+            {'t_c00000001-00': _link(5, address='fa:16:3e:00:00:01',
+                                     addresses={('10.0.0.5', 24)},
+                                     master=3)},
+            links)
+
+    def test_get_plan_in_sync(self):
+        links = {'tap00000000-00': _host_link(1, peer_netns=1),
+                 'tap00000001-00': _host_link(2),
+                 't_c00000001-00': _container_link(1),
+                 'eth0': _link(3, kind=None)}
+
+        plan = reconciler.get_plan([_request(0), _request(1)], links)
+
+        self.assertEqual(reconciler.Plan([], [], []), plan)
+
+    def test_get_plan(self):
+        links = {'tap00000001-00': _host_link(2),
+                 't_c00000001-00': _container_link(1, mtu=1500),
+                 'tap00000002-00': _host_link(3),
+                 't_c00000002-00': _container_link(2, addresses=set()),
+                 'tap00000009-00': _link(4, alias='kuryr:0123'),
+                 't_c00000008-00': _link(5),
+                 'tap0000000b-00': _link(8),
+                 'tap0000000c-00': _link(9, alias='dhcp'),
+                 'tap0000000a-00': _link(6, kind='tun'),
+                 'kph1234': _link(7)}
+
+        plan = reconciler.get_plan(
+            [_request(0), _request(1), _request(2),
+             _request(3, driver='kuryr.lib.binding.drivers.ipvlan')], links)
+
+        self.assertEqual([PORT_IDS[0]], [r.port['id'] for r in plan.create])
+        self.assertEqual([PORT_IDS[1], PORT_IDS[2]],
+                         [r.port['id'] for r in plan.fix])
+        self.assertEqual(['tap00000009-00', 't_c00000008-00'], plan.delete)
+
+    @mock.patch('kuryr.lib.binding.netlink.get_backend')
+    @mock.patch('kuryr.lib.binding.port_bind_many')
+    def test_apply_plan(self, mock_bind_many, mock_get_backend):
+        self.useFixture(fixtures.MockPatchObject(reconciler, 'BATCH_SIZE',
+                                                 2))
+
+        def bind_many(batch):
+            return [binding.BindResult(None, ValueError())
+                    if r.port['id'] == PORT_IDS[2]
+                    else binding.BindResult('ok', None) for r in batch]
+        mock_bind_many.side_effect = bind_many
+        backend = mock_get_backend.return_value
+        backend.remove_device.side_effect = [None, pyroute2.NetlinkError(1)]
+
+        counts = reconciler.apply_plan(reconciler.Plan(
+            [_request(0), _request(1), _request(2)], [_request(3)],
+            ['tap1', 'tap2']))
+
+        self.assertEqual({'created': 2, 'fixed': 1, 'deleted': 1,
+                          'failed': 2}, counts)
+        self.assertEqual(2, mock_bind_many.call_count)
+        backend.create_veth_pair.assert_called_once_with(
+            'tap00000003-00', 't_c00000003-00', _request(3).subnets,
+            _port(3)['fixed_ips'], mtu=1450, hwaddr='fa:16:3e:00:00:03')
+        backend.remove_device.assert_has_calls([mock.call('tap1'),
+                                                mock.call('tap2')])
+
+    @mock.patch('kuryr.lib.binding.reconciler.apply_plan')
+    @mock.patch.object(reconciler.LOG, 'warning')
+    @mock.patch('kuryr.lib.binding.reconciler.dump_links')
+    def test_reconcile(self, mock_dump_links, mock_warning, mock_apply_plan):
+        mock_dump_links.return_value = {
+            'tap00000009-00': _link(4, alias='kuryr:0123')}
+        mock_apply_plan.return_value = {'created': 1, 'fixed': 0,
+                                        'deleted': 0, 'failed': 0}
+
+        plan, counts = reconciler.reconcile([_request(0)])
+
+        self.assertEqual([], plan.delete)
+        self.assertEqual(1, len(plan.create))
+        mock_apply_plan.assert_called_once_with(plan)
+        self.assertEqual(1, counts['created'])
+        mock_warning.assert_not_called()
+
+        plan, _ = reconciler.reconcile([_request(0)], delete=True)
+        self.assertEqual(['tap00000009-00'], plan.delete)
+        mock_warning.assert_called_once()
+
+        mock_warning.reset_mock()
+        cfg.CONF.set_override('rebind_fast_path', True, group='binding')
+        reconciler.reconcile([_request(0)], delete=True)
+        mock_warning.assert_not_called()
+
+    def test_get_plan_host_end_released(self):
+        # e.g. the host end removed from its bridge by an operator
+        links = {'tap00000000-00': _link(1, peer_netns=1)}
+
+        plan = reconciler.get_plan([_request(0)], links)
+
+        self.assertEqual([PORT_IDS[0]], [r.port['id'] for r in plan.create])
+        self.assertEqual([], plan.delete)
+
+    def test_get_plan_foreign_veth(self):
+        # e.g. the root end of a Neutron linuxbridge DHCP namespace
+        links = {'tap1a2b3c4d-5e': _link(1, peer_netns=2),
+                 'tap00000009-00': _link(2, alias='other consumer')}
+
+        plan = reconciler.get_plan([_request(0)], links)
+
+        self.assertEqual([], plan.delete)
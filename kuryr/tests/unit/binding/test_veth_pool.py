@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+from unittest import mock
+
+from oslo_config import cfg
+import pyroute2
+
+from kuryr.lib.binding import veth_pool
+from kuryr.tests.unit import base
+
+
+class TestVethPool(base.TestCase):
+    """Unit tests for the warm veth pool"""
+
+    def setUp(self):
+        super(TestVethPool, self).setUp()
+        self.backend = mock.Mock()
+        self.backend.list_ifnames.return_value = []
+        patcher = mock.patch('kuryr.lib.binding.netlink.get_backend',
+                             return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = veth_pool.VethPool(3, low_watermark=1)
+
+    def test_refill(self):
+        self.pool._refill()
+
+        self.assertEqual(3, self.backend.add_veth_pair.call_count)
+        ifname, peer = self.backend.add_veth_pair.call_args[0]
+        self.assertTrue(ifname.startswith('kph'))
+        self.assertEqual('kpc' + ifname[3:], peer)
+        self.assertEqual(14, len(ifname))
+        metrics = self.pool.get_metrics()
+        self.assertEqual(3, metrics['available'])
+        self.assertEqual(3, metrics['created'])
+        self.assertEqual(1, metrics['refills'])
+
+    def test_take(self):
+        self.pool._pairs.extend([('kph1', 'kpc1'), ('kph2', 'kpc2')])
+
+        self.assertTrue(self.pool.take('tap1', 't_c1'))
+
+        self.backend.rename_device.assert_has_calls([
+            mock.call('kph1', 'tap1'), mock.call('kpc1', 't_c1')])
+        self.assertEqual(1, self.pool.get_metrics()['hits'])
+        self.assertFalse(self.pool._refill_needed.is_set())
+
+        self.assertTrue(self.pool.take('tap2', 't_c2'))
+        self.assertTrue(self.pool._refill_needed.is_set())
+
+    def test_take_empty(self):
+        self.assertFalse(self.pool.take('tap1', 't_c1'))
+
+        self.backend.rename_device.assert_not_called()
+        self.assertEqual(1, self.pool.get_metrics()['misses'])
+        self.assertTrue(self.pool._refill_needed.is_set())
+
+    def test_take_existing_names(self):
+        self.pool._pairs.append(('kph1', 'kpc1'))
+        self.backend.rename_device.side_effect = pyroute2.NetlinkError(
+            errno.EEXIST)
+
+        self.assertFalse(self.pool.take('tap1', 't_c1'))
+
+        self.assertEqual([('kph1', 'kpc1')], list(self.pool._pairs))
+        self.backend.remove_device.assert_not_called()
+
+    def test_take_broken_pair(self):
+        self.pool._pairs.append(('kph1', 'kpc1'))
+        self.backend.rename_device.side_effect = [
+            None, pyroute2.NetlinkError(errno.ENODEV)]
+
+        self.assertFalse(self.pool.take('tap1', 't_c1'))
+
+        self.assertEqual(0, len(self.pool._pairs))
+        self.backend.remove_device.assert_called_once_with('tap1')
+
+    def test_adopt_parked_pairs(self):
+        self.backend.list_ifnames.return_value = [
+            'lo', 'kph1', 'kpc1', 'kph2', 'tap3']
+
+        self.pool._adopt_parked_pairs()
+
+        self.assertEqual([('kph1', 'kpc1')], list(self.pool._pairs))
+
+    @mock.patch.object(veth_pool, '_POOL', None)
+    def test_get_pool_disabled(self):
+        self.assertIsNone(veth_pool.get_pool())
+
+    @mock.patch.object(veth_pool.VethPool, 'start')
+    @mock.patch.object(veth_pool, '_POOL', None)
+    def test_get_pool(self, mock_start):
+        cfg.CONF.set_override('veth_pool_size', 5, group='binding')
+        cfg.CONF.set_override('veth_pool_low_watermark', 2, group='binding')
+
+        pool = veth_pool.get_pool()
+
+        self.assertEqual(5, pool.size)
+        self.assertEqual(2, pool.low_watermark)
+        self.assertIs(pool, veth_pool.get_pool())
+        mock_start.assert_called_once_with()
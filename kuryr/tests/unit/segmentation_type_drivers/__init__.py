@@ -0,0 +1,65 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+from kuryr.lib import exceptions
+from kuryr.lib import segmentation_type_drivers as seg_drivers
+from kuryr.lib.segmentation_type_drivers import vlan
+from kuryr.lib.segmentation_type_drivers import vni
+from kuryr.tests.unit import base
+
+
+class TestSegmentationDrivers(base.TestCase):
+    """Unit tests for the segmentation driver registry"""
+
+    def setUp(self):
+        super(TestSegmentationDrivers, self).setUp()
+        self.addCleanup(setattr, seg_drivers, '_driver', None)
+        seg_drivers._driver = None
+
+    def test_binding_driver_default(self):
+        cfg.CONF.set_override('default_driver',
+                              'kuryr.lib.binding.drivers.vlan',
+                              group='binding')
+
+        self.assertIsInstance(seg_drivers._get_driver(),
+                              vlan.SegmentationDriver)
+
+    def test_configured_driver(self):
+        cfg.CONF.set_override('segmentation_driver', 'vni', group='binding')
+
+        self.assertEqual(1, seg_drivers.allocate_segmentation_id())
+        self.assertIsInstance(seg_drivers._get_driver(),
+                              vni.SegmentationDriver)
+        self.assertEqual([2, 3], seg_drivers.allocate_segmentation_ids(2))
+
+    def test_no_driver(self):
+        cfg.CONF.set_override('default_driver',
+                              'kuryr.lib.binding.drivers.veth',
+                              group='binding')
+
+        self.assertRaises(
+            exceptions.SegmentationDriverBindingDriverCompatibilityFailure,
+            seg_drivers.allocate_segmentation_id)
+
+    def test_pool_key(self):
+        cfg.CONF.set_override('segmentation_driver', 'vlan', group='binding')
+
+        self.assertEqual(1, seg_drivers.allocate_segmentation_id(
+            pool_key='trunk-1'))
+        self.assertEqual(1, seg_drivers.allocate_segmentation_id(
+            pool_key='trunk-2'))
+        seg_drivers.release_segmentation_id(1, pool_key='trunk-2')
+        self.assertEqual(
+            {'allocated': 0, 'available': 4094},
+            seg_drivers.get_segmentation_pool_usage()['trunk-2'])
@@ -0,0 +1,319 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+
+import fixtures
+
+from kuryr.lib import exceptions
+from kuryr.lib.segmentation_type_drivers import allocator
+from kuryr.tests.unit import base
+
+
+class BitmapAllocatorTest(base.TestCase):
+    """Unit tests for the bitmap ID allocator"""
+
+    def setUp(self):
+        super(BitmapAllocatorTest, self).setUp()
+        self.allocator = allocator.BitmapAllocator(1, 10)
+
+    def test_allocate(self):
+        ids = [self.allocator.allocate() for _ in range(10)]
+
+        self.assertEqual(list(range(1, 11)), ids)
+        self.assertEqual(0, len(self.allocator))
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          self.allocator.allocate)
+
+    def test_release(self):
+        ids = self.allocator.allocate_many(3)
+        self.allocator.release(ids[1])
+        self.allocator.release(ids[0])
+
+        self.assertNotIn(ids[0], self.allocator)
+        self.assertEqual(9, len(self.allocator))
+        # Released IDs are reused in the order they were released
+        self.assertEqual([2, 1, 4], self.allocator.allocate_many(3))
+
+    def test_release_not_allocated(self):
+        self.allocator.release(5)
+        self.allocator.release(42)
+
+        self.assertEqual(10, len(self.allocator))
+        self.assertEqual(list(range(1, 11)),
+                         self.allocator.allocate_many(10))
+
+    def test_reserve(self):
+        self.allocator.reserve([2, 3, 42])
+        self.assertEqual([1, 4], self.allocator.allocate_many(2))
+
+        # A released ID reserved again is not handed out
+        self.allocator.release(1)
+        self.allocator.reserve([1])
+        self.assertEqual(5, self.allocator.allocate())
+
+    def test_allocate_many_not_enough(self):
+        self.allocator.allocate_many(8)
+
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          self.allocator.allocate_many, 3)
+        self.assertEqual(2, len(self.allocator))
+
+    def test_reconcile(self):
+        self.allocator.allocate_many(5)
+        self.allocator.release(2)
+
+        added, removed = self.allocator.reconcile([2, 4, 9, 42])
+
+        self.assertEqual(({2, 9}, {1, 3, 5}), (added, removed))
+        self.assertEqual([1, 3, 5, 6], self.allocator.allocate_many(4))
+
+    def test_iter_available(self):
+        self.allocator.reserve([1, 5, 10])
+        self.assertEqual([2, 3, 4, 6, 7, 8, 9],
+                         list(self.allocator.iter_available()))
+
+    def test_allocate_concurrently(self):
+        self.allocator = allocator.BitmapAllocator(1, 4094)
+        allocated = []
+
+        def allocate():
+            for _ in range(500):
+                allocated.append(self.allocator.allocate())
+
+        threads = [threading.Thread(target=allocate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, len(set(allocated)))
+        self.assertEqual(94, len(self.allocator))
+
+
+class SharedBitmapAllocatorTest(base.TestCase):
+    """Unit tests for the bitmap ID allocator shared through a file"""
+
+    def setUp(self):
+        super(SharedBitmapAllocatorTest, self).setUp()
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(tmpdir, 'vlans')
+
+    def _allocator(self, min_id=1, max_id=20):
+        shared = allocator.SharedBitmapAllocator(self.path, min_id, max_id)
+        self.addCleanup(shared.close)
+        return shared
+
+    def test_shared(self):
+        first = self._allocator()
+        second = self._allocator()
+
+        self.assertEqual([1, 2], first.allocate_many(2))
+        self.assertEqual([3, 4], second.allocate_many(2))
+        self.assertIn(3, first)
+        self.assertEqual(16, len(first))
+
+        second.release(1)
+        self.assertEqual(17, len(first))
+        # Next-fit, the released ID is only reused after wrapping around
+        self.assertEqual(5, first.allocate())
+
+    def test_wrap_around(self):
+        shared = self._allocator()
+        shared.allocate_many(20)
+        shared.release(7)
+        shared.release(3)
+
+        self.assertEqual([3, 7], shared.allocate_many(2))
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          shared.allocate)
+
+    def test_reopen(self):
+        shared = self._allocator()
+        shared.reserve([1, 2])
+        shared.close()
+
+        self.assertEqual(3, self._allocator().allocate())
+
+    def test_range_mismatch(self):
+        self._allocator()
+        self.assertRaises(exceptions.SegmentationStateFailure,
+                          allocator.SharedBitmapAllocator, self.path, 1, 30)
+        self.assertRaises(exceptions.SegmentationStateFailure,
+                          allocator.SharedBitmapAllocator, self.path, 2, 21)
+
+    def test_allocate_concurrently(self):
+        allocators = [self._allocator(1, 4094) for _ in range(4)]
+        allocated = []
+
+        def allocate(shared):
+            for _ in range(250):
+                allocated.append(shared.allocate())
+
+        threads = [threading.Thread(target=allocate, args=(shared,))
+                   for shared in allocators * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2000, len(set(allocated)))
+        self.assertEqual(2094, len(allocators[0]))
+
+    def test_fork(self):
+        shared = self._allocator()
+        shared.allocate()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                shared.allocate()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(3, shared.allocate())
+
+    def test_reconcile(self):
+        shared = self._allocator()
+        shared.allocate_many(5)
+
+        added, removed = shared.reconcile([2, 4, 9, 42])
+
+        self.assertEqual(({9}, {1, 3, 5}), (added, removed))
+        self.assertEqual([2, 4, 9], sorted(
+            set(range(1, 21)) - set(shared.iter_available())))
+        self.assertEqual(17, len(shared))
+
+    def _interrupt(self, shared, op, id):
+        # What a process killed in the middle of a transaction leaves
+        shared._write_header(op, id)
+        offset = id - shared.min_id
+        shared._bitmap[offset >> 3] |= 1 << (offset & 7)
+
+    def test_recover_allocation(self):
+        shared = self._allocator()
+        shared.allocate_many(2)
+        self._interrupt(shared, shared.JOURNAL_ALLOCATE, 3)
+
+        other = self._allocator()
+        self.assertEqual(18, len(other))
+        self.assertNotIn(3, other)
+
+    def test_recover_allocation_batch(self):
+        shared = self._allocator()
+        shared.allocate_many(2)
+        pid = os.fork()
+        if pid == 0:
+            # Killed after setting 3 of the IDs of the batch
+            set_id = shared._set
+            calls = []
+
+            def _set(id):
+                if len(calls) == 3:
+                    os._exit(0)
+                calls.append(id)
+                set_id(id)
+            shared._set = _set
+            try:
+                shared.allocate_many(5)
+            finally:
+                os._exit(1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(0, os.WEXITSTATUS(status))
+
+        other = self._allocator()
+        self.assertEqual(18, len(other))
+        self.assertEqual([1, 2], sorted(
+            set(range(1, 21)) - set(other.iter_available())))
+        self.assertEqual(bytes(len(other._journal)), other._journal.tobytes())
+        self.assertEqual([3, 4, 5], other.allocate_many(3))
+
+    def test_recover_update(self):
+        shared = self._allocator()
+        self._interrupt(shared, shared.JOURNAL_UPDATE, 7)
+
+        other = self._allocator()
+        self.assertEqual(19, len(other))
+        self.assertIn(7, other)
+
+
+class RangeAllocatorTest(base.TestCase):
+    """Unit tests for the free ranges ID allocator"""
+
+    def setUp(self):
+        super(RangeAllocatorTest, self).setUp()
+        self.allocator = allocator.RangeAllocator(1, 10)
+
+    def test_allocate(self):
+        ids = [self.allocator.allocate() for _ in range(10)]
+
+        self.assertEqual(list(range(1, 11)), ids)
+        self.assertEqual(0, len(self.allocator))
+        self.assertEqual([], self.allocator.free_ranges)
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          self.allocator.allocate)
+
+    def test_allocate_many_spans_ranges(self):
+        self.allocator.reserve([3, 4, 7])
+
+        self.assertEqual([1, 2, 5, 6, 8], self.allocator.allocate_many(5))
+        self.assertEqual([(9, 10)], self.allocator.free_ranges)
+
+    def test_allocate_many_not_enough(self):
+        self.allocator.allocate_many(8)
+
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          self.allocator.allocate_many, 3)
+        self.assertEqual(2, len(self.allocator))
+
+    def test_reserve(self):
+        self.allocator.reserve([1, 5, 10, 5, 0, 11])
+
+        self.assertEqual([(2, 4), (6, 9)], self.allocator.free_ranges)
+        self.assertEqual(7, len(self.allocator))
+        self.assertIn(5, self.allocator)
+        self.assertNotIn(6, self.allocator)
+        self.assertNotIn(11, self.allocator)
+
+    def test_release_merges_ranges(self):
+        self.allocator.allocate_many(10)
+
+        self.allocator.release(5)
+        self.allocator.release_many([2, 3, 7, 8])
+        self.assertEqual([(2, 3), (5, 5), (7, 8)], self.allocator.free_ranges)
+        self.allocator.release_many([4, 6])
+        self.assertEqual([(2, 8)], self.allocator.free_ranges)
+        self.assertEqual(7, len(self.allocator))
+
+    def test_release_ignores_free_ids(self):
+        self.allocator.allocate_many(6)
+
+        self.allocator.release_many(range(0, 12))
+
+        self.assertEqual([(1, 10)], self.allocator.free_ranges)
+        self.assertEqual(10, len(self.allocator))
+
+    def test_release_reuses_lowest(self):
+        self.allocator.allocate_many(5)
+        self.allocator.release_many([4, 2])
+
+        self.assertEqual([2, 4, 6], self.allocator.allocate_many(3))
+
+    def test_large_range(self):
+        vnis = allocator.RangeAllocator(1, 2 ** 24 - 1)
+
+        ids = vnis.allocate_many(100000)
+        vnis.release_many(ids[::2])
+        vnis.release_many(ids[1::2])
+
+        self.assertEqual([(1, 2 ** 24 - 1)], vnis.free_ranges)
@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 from unittest import mock
 
+import fixtures
 from oslo_config import cfg
 
 from kuryr.lib import constants as const
@@ -65,34 +67,95 @@ class VlanSegmentationDriverTest(base.TestCase):
                           vlan_seg_driver.allocate_segmentation_id,
                           allocated_ids)
 
-    @mock.patch('random.choice')
-    def test_allocate_segmentation_id_max_retries(self, mock_choice):
-        mock_choice.side_effect = [1, 1, 1]
+    def test_allocate_segmentation_id_reuses_released(self):
         vlan_seg_driver = vlan.SegmentationDriver()
-        allocated_ids = set([1, 2, 3])
+        first = vlan_seg_driver.allocate_segmentation_id()
+        second = vlan_seg_driver.allocate_segmentation_id()
 
-        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
-                          vlan_seg_driver.allocate_segmentation_id,
-                          allocated_ids)
-        self.assertEqual(len(mock_choice.mock_calls), 3)
+        vlan_seg_driver.release_segmentation_id(first)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(first, vlan_seg_driver.allocate_segmentation_id())
 
-    @mock.patch('random.choice')
-    def test_allocate_segmentation_id_2_retries(self, mock_choice):
+    def test_allocate_segmentation_ids(self):
         vlan_seg_driver = vlan.SegmentationDriver()
-        vlan_seg_driver.available_local_vlans = set(range(1, 10))
-        allocated_ids = set([1, 2, 3])
-        mock_choice.side_effect = [1, 1, 5]
 
-        vlan_id = vlan_seg_driver.allocate_segmentation_id(allocated_ids)
+        vlan_ids = vlan_seg_driver.allocate_segmentation_ids(3, {1, 2})
 
-        self.assertEqual(len(mock_choice.mock_calls), 3)
-        self.assertEqual(vlan_id, 5)
+        self.assertEqual([3, 4, 5], vlan_ids)
+        self.assertEqual(const.MAX_VLAN_TAG - 5,
+                         len(vlan_seg_driver.available_local_vlans))
 
     def test_release_segmentation_id(self):
         vlan_seg_driver = vlan.SegmentationDriver()
-        vlan_seg_driver.available_local_vlans = set(range(1, 10))
-        vlan_id = 20
+        vlan_id = vlan_seg_driver.allocate_segmentation_id(
+            set(range(1, 20)))
 
         vlan_seg_driver.release_segmentation_id(vlan_id)
 
+        self.assertEqual(20, vlan_id)
         self.assertIn(vlan_id, vlan_seg_driver.available_local_vlans)
+
+    def test_segmentation_state_path(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, 'vlans')
+        cfg.CONF.set_override('segmentation_state_path', path,
+                              group='binding')
+        first = vlan.SegmentationDriver()
+        second = vlan.SegmentationDriver()
+
+        vlan_id = first.allocate_segmentation_id()
+
+        self.assertNotEqual(vlan_id, second.allocate_segmentation_id())
+        self.assertNotIn(vlan_id, second.available_local_vlans)
+
+    def test_pools(self):
+        vlan_seg_driver = vlan.SegmentationDriver()
+
+        first = vlan_seg_driver.allocate_segmentation_ids(
+            const.MAX_VLAN_TAG, pool_key='trunk-1')
+        second = vlan_seg_driver.allocate_segmentation_id(pool_key='trunk-2')
+
+        self.assertEqual(1, second)
+        self.assertEqual(1, first[0])
+        self.assertRaises(exceptions.SegmentationIdAllocationFailure,
+                          vlan_seg_driver.allocate_segmentation_id,
+                          pool_key='trunk-1')
+        vlan_seg_driver.release_segmentation_ids(first[:2],
+                                                 pool_key='trunk-1')
+        self.assertEqual(
+            {'trunk-1': {'allocated': const.MAX_VLAN_TAG - 2,
+                         'available': 2},
+             'trunk-2': {'allocated': 1,
+                         'available': const.MAX_VLAN_TAG - 1}},
+            vlan_seg_driver.get_pool_usage())
+        self.assertEqual(set(range(1, const.MAX_VLAN_TAG + 1)),
+                         vlan_seg_driver.available_local_vlans)
+
+    def test_pools_state_path(self):
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        cfg.CONF.set_override('segmentation_state_path',
+                              os.path.join(tempdir, 'vlans'),
+                              group='binding')
+        vlan_seg_driver = vlan.SegmentationDriver()
+
+        vlan_seg_driver.allocate_segmentation_id()
+        vlan_seg_driver.allocate_segmentation_id(pool_key='eth/1')
+
+        self.assertEqual(['vlans', 'vlans.eth%2F1'],
+                         sorted(os.listdir(tempdir)))
+        self.assertNotIn(
+            1, vlan.SegmentationDriver().get_available_vlans('eth/1'))
+
+    @mock.patch('kuryr.lib.binding.netlink.get_backend')
+    def test_reconcile(self, mock_get_backend):
+        backend = mock_get_backend.return_value
+        backend.list_vlan_ids.side_effect = [{2, 3}, {5}, OSError]
+        vlan_seg_driver = vlan.SegmentationDriver()
+        vlan_seg_driver.allocate_segmentation_ids(2)
+
+        added, removed = vlan_seg_driver.reconcile(['/ns1', '/ns2'])
+
+        self.assertEqual(({3, 5}, {1}), (added, removed))
+        backend.list_vlan_ids.assert_has_calls([
+            mock.call(), mock.call(netns='/ns1'), mock.call(netns='/ns2')])
+        self.assertEqual(1, vlan_seg_driver.allocate_segmentation_id())
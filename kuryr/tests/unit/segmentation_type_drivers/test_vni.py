@@ -0,0 +1,49 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from kuryr.lib import constants as const
+from kuryr.lib.segmentation_type_drivers import vni
+from kuryr.tests.unit import base
+
+
+class VniSegmentationDriverTest(base.TestCase):
+    """Unit tests for the VNI segmentation driver"""
+
+    def setUp(self):
+        super(VniSegmentationDriverTest, self).setUp()
+        self.driver = vni.SegmentationDriver()
+
+    def test_allocate_segmentation_id(self):
+        allocated_ids = set([1, 2, 3])
+
+        vni_id = self.driver.allocate_segmentation_id(allocated_ids)
+
+        self.assertEqual(4, vni_id)
+
+    def test_allocate_segmentation_ids(self):
+        ids = self.driver.allocate_segmentation_ids(3, set([2]))
+
+        self.assertEqual([1, 3, 4], ids)
+
+    def test_release_segmentation_ids(self):
+        ids = self.driver.allocate_segmentation_ids(4)
+        self.driver.release_segmentation_ids(ids[1:3])
+        self.driver.release_segmentation_id(ids[0])
+
+        self.assertEqual([1, 2, 3, 5],
+                         self.driver.allocate_segmentation_ids(4))
+
+    def test_whole_space(self):
+        self.driver.allocate_segmentation_ids(const.MAX_VNI - 1)
+
+        self.assertEqual(const.MAX_VNI,
+                         self.driver.allocate_segmentation_id())
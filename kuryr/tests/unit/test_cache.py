@@ -0,0 +1,142 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+from kuryr.lib import cache
+from kuryr.tests.unit import base
+
+
+def _subnet(id, revision_number=1):
+    return {'id': id, 'network_id': 'net', 'cidr': '10.0.0.0/24',
+            'revision_number': revision_number}
+
+
+class TestNeutronCache(base.TestCase):
+    """Unit tests for the Neutron cache"""
+
+    def setUp(self):
+        super(TestNeutronCache, self).setUp()
+        self.client = mock.Mock()
+        self.client.show_subnet.side_effect = (
+            lambda id: {'subnet': _subnet(id)})
+        self.cache = cache.NeutronCache(self.client, ttl=60, max_size=3)
+
+    def test_get_cached(self):
+        subnet = self.cache.get_subnet('a')
+
+        self.assertEqual(subnet, self.cache.get_subnet('a'))
+        self.client.show_subnet.assert_called_once_with('a')
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    @mock.patch('time.monotonic')
+    def test_ttl(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        self.cache.get_subnet('a')
+        mock_monotonic.return_value = 160
+
+        self.cache.get_subnet('a')
+
+        self.assertEqual(2, self.client.show_subnet.call_count)
+
+    def test_lru_eviction(self):
+        for id in 'abc':
+            self.cache.get_subnet(id)
+        self.cache.get_subnet('a')
+
+        self.cache.get_subnet('d')
+
+        self.assertEqual(3, len(self.cache))
+        self.cache.get_subnet('a')
+        self.assertEqual(4, self.client.show_subnet.call_count)
+        self.cache.get_subnet('b')
+        self.assertEqual(5, self.client.show_subnet.call_count)
+
+    def test_revision_number(self):
+        self.cache.get_subnet('a')
+
+        self.cache.get_subnet('a', revision_number=1)
+        self.assertEqual(1, self.client.show_subnet.call_count)
+        self.cache.get_subnet('a', revision_number=2)
+        self.assertEqual(2, self.client.show_subnet.call_count)
+
+    def test_update_keeps_later_revision(self):
+        self.cache.update(cache.SUBNET, _subnet('a', 3))
+        self.cache.update(cache.SUBNET, _subnet('a', 2))
+
+        self.assertEqual(3, self.cache.get_subnet('a')['revision_number'])
+        self.cache.invalidate(cache.SUBNET, 'a')
+        self.assertEqual(1, self.cache.get_subnet('a')['revision_number'])
+
+    def test_get_subnets(self):
+        self.cache.get_subnet('a')
+        self.client.list_subnets.return_value = {
+            'subnets': [_subnet('c'), _subnet('b')]}
+
+        subnets = self.cache.get_subnets(['a', 'b', 'c', 'd'])
+
+        self.assertEqual(['a', 'b', 'c'], [s['id'] for s in subnets])
+        self.client.list_subnets.assert_called_once_with(id=['b', 'c', 'd'])
+
+    def test_get_subnets_batched(self):
+        self.cache.max_size = 1000
+        ids = [str(i) for i in range(cache.BATCH_SIZE * 2 + 1)]
+        self.client.list_subnets.side_effect = lambda id: {
+            'subnets': [_subnet(i) for i in id]}
+
+        subnets = self.cache.get_subnets(ids)
+
+        self.assertEqual(ids, [s['id'] for s in subnets])
+        self.assertEqual(
+            [mock.call(id=ids[:cache.BATCH_SIZE]),
+             mock.call(id=ids[cache.BATCH_SIZE:cache.BATCH_SIZE * 2]),
+             mock.call(id=ids[cache.BATCH_SIZE * 2:])],
+            self.client.list_subnets.call_args_list)
+
+    def test_get_copies(self):
+        self.cache.get_subnet('a')['cidr'] = '10.1.0.0/24'
+        self.cache.get_subnets(['a'])[0]['cidr'] = '10.2.0.0/24'
+
+        self.assertEqual('10.0.0.0/24', self.cache.get_subnet('a')['cidr'])
+        self.assertEqual(1, self.client.show_subnet.call_count)
+
+    def test_prefetch_network(self):
+        self.cache.max_size = 10
+        self.client.show_network.return_value = {
+            'network': {'id': 'net'}}
+        self.client.list_subnets.return_value = {
+            'subnets': [_subnet('a'), _subnet('b')]}
+        self.client.list_ports.return_value = {
+            'ports': [{'id': 'p', 'network_id': 'net'}]}
+
+        self.cache.prefetch_network('net')
+
+        self.assertEqual(4, len(self.cache))
+        self.cache.get_network('net')
+        self.cache.get_subnets(['a', 'b'])
+        self.cache.get_port('p')
+        self.client.list_subnets.assert_called_once_with(network_id='net')
+        self.client.list_ports.assert_called_once_with(network_id='net')
+        self.assertFalse(self.client.show_subnet.called)
+        self.assertFalse(self.client.show_port.called)
+
+    @mock.patch('kuryr.lib.utils.get_neutron_client')
+    def test_get_neutron_cache(self, mock_get_neutron_client):
+        self.addCleanup(setattr, cache, '_cache', None)
+        cache._cache = None
+
+        neutron_cache = cache.get_neutron_cache()
+
+        self.assertIs(neutron_cache, cache.get_neutron_cache())
+        self.assertEqual(300, neutron_cache.ttl)
+        self.assertIs(mock_get_neutron_client.return_value,
+                      neutron_cache.client)
@@ -0,0 +1,210 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import itertools
+from unittest import mock
+
+from oslo_config import cfg
+
+from kuryr.lib import port_pool
+from kuryr.tests.unit import base
+
+_IDS = itertools.count()
+
+
+def _create_port(body):
+    def port(attrs):
+        port = dict(attrs, id='port-{0}'.format(next(_IDS)), device_id='')
+        port.setdefault('security_groups', ['default'])
+        return port
+    if 'ports' in body:
+        return {'ports': [port(p) for p in body['ports']]}
+    return {'port': port(body['port'])}
+
+
+class TestPortPool(base.TestCase):
+    """Unit tests for the Neutron port pool"""
+
+    def setUp(self):
+        super(TestPortPool, self).setUp()
+        self.client = mock.Mock()
+        self.client.create_port.side_effect = _create_port
+        self.client.update_port.side_effect = (
+            lambda id, body: {'port': dict(body['port'], id=id,
+                                           network_id='net',
+                                           project_id='proj',
+                                           security_groups=['sg'])})
+        patcher = mock.patch('kuryr.lib.utils.get_hostname',
+                             return_value='host')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = port_pool.PortPool(3, low_watermark=1,
+                                       client=self.client)
+
+    def test_refill(self):
+        key = port_pool._get_key('net', 'proj', ['sg2', 'sg1'])
+
+        self.pool._refill(key)
+
+        self.client.create_port.assert_called_once_with({'ports': [{
+            'name': 'kuryr-pool-host',
+            'description': 'kuryr-pool security_groups=["sg1", "sg2"]',
+            'network_id': 'net',
+            'project_id': 'proj',
+            'device_owner': 'compute:kuryr',
+            'admin_state_up': True,
+            'security_groups': ['sg1', 'sg2'],
+        }] * 3})
+        metrics = self.pool.get_metrics()
+        self.assertEqual(3, metrics['available'])
+        self.assertEqual(3, metrics['created'])
+        self.assertEqual(1, metrics['refills'])
+        self.pool._refill(key)
+        self.assertEqual(1, self.client.create_port.call_count)
+
+    def test_get_port(self):
+        self.pool._refill(port_pool._get_key('net', 'proj', ['sg']))
+        self.client.create_port.reset_mock()
+
+        port = self.pool.get_port('net', 'proj', ['sg'])
+        self.pool.get_port('net', 'proj', ['sg'])
+
+        self.assertTrue(port['id'].startswith('port-'))
+        self.assertFalse(self.client.create_port.called)
+        self.assertFalse(self.client.update_port.called)
+        self.assertFalse(self.pool._refill_needed.is_set())
+
+        self.pool.get_port('net', 'proj', ['sg'],
+                           updates={'device_id': 'container'})
+        self.client.update_port.assert_called_once_with(
+            mock.ANY, {'port': {'device_id': 'container'}})
+        self.assertTrue(self.pool._refill_needed.is_set())
+        self.assertEqual(3, self.pool.get_metrics()['hits'])
+
+    def test_get_port_miss(self):
+        port = self.pool.get_port('net', 'proj', updates={'name': 'c1'})
+
+        self.assertEqual('c1', port['name'])
+        self.assertNotIn('security_groups',
+                         self.client.create_port.call_args[0][0]['port'])
+        self.assertEqual(1, self.pool.get_metrics()['misses'])
+        self.assertEqual({('net', 'proj', None)}, self.pool._refill_keys)
+        self.assertTrue(self.pool._refill_needed.is_set())
+
+    def test_release_port(self):
+        port = {'id': 'p', 'network_id': 'net', 'project_id': 'proj',
+                'security_groups': ['sg'], 'device_id': 'container'}
+
+        self.pool.release_port(port)
+
+        self.client.update_port.assert_called_once_with('p', {'port': {
+            'name': 'kuryr-pool-host',
+            'description': 'kuryr-pool security_groups=["sg"]',
+            'device_id': '', 'device_owner': 'compute:kuryr',
+            'binding:host_id': '', 'binding:profile': {},
+            'admin_state_up': True, 'allowed_address_pairs': [],
+            'security_groups': ['sg']}})
+        self.assertEqual(1, self.pool.get_metrics()['recycled'])
+        self.assertEqual('p', self.pool.get_port('net', 'proj', ['sg'])['id'])
+
+    def test_release_port_security_groups_changed(self):
+        port = self.pool.get_port('net', 'proj', ['sg'],
+                                  updates={'security_groups': ['other']})
+        self.assertEqual(['other'], port['security_groups'])
+
+        self.pool.release_port(port)
+
+        body = self.client.update_port.call_args[0][1]['port']
+        self.assertEqual(['sg'], body['security_groups'])
+        self.assertEqual(port['id'],
+                         self.pool.get_port('net', 'proj', ['sg'])['id'])
+
+    def test_default_security_groups(self):
+        key = port_pool._get_key('net', 'proj', None)
+        self.client.update_port.side_effect = lambda id, body: {
+            'port': dict({'description': port_pool._get_description(key),
+                          'security_groups': ['default']},
+                         id=id, network_id='net', project_id='proj',
+                         **body['port'])}
+        self.client.list_security_groups.return_value = {
+            'security_groups': [{'id': 'default'}]}
+        self.pool._refill(key)
+        port = self.pool.get_port('net', 'proj',
+                                  updates={'device_id': 'container'})
+        # Neutron filled the security groups of the port
+        self.assertEqual(['default'], port['security_groups'])
+
+        self.pool.release_port(port)
+
+        self.assertEqual(3, len(self.pool._ports[('net', 'proj', None)]))
+        self.assertNotIn(('net', 'proj', ('default',)), self.pool._ports)
+        self.assertEqual(
+            ['default'],
+            self.client.update_port.call_args[0][1]['port'][
+                'security_groups'])
+        self.client.list_security_groups.assert_called_once_with(
+            name='default', project_id='proj', fields=['id'])
+
+        self.client.list_ports.return_value = iter([{'ports': [
+            dict(port, id='a', device_id='')]}])
+        self.pool.reclaim()
+        self.assertEqual(4, len(self.pool._ports[('net', 'proj', None)]))
+
+    def test_get_port_update_failure(self):
+        self.pool._refill(port_pool._get_key('net', 'proj', ['sg']))
+        self.client.update_port.side_effect = ValueError()
+
+        self.assertRaises(ValueError, self.pool.get_port, 'net', 'proj',
+                          ['sg'], updates={'device_id': 'container'})
+
+        self.client.delete_port.assert_called_once_with(
+            self.client.update_port.call_args[0][0])
+        self.assertEqual(2, self.pool.get_metrics()['available'])
+
+    def test_release_port_pool_full(self):
+        self.pool._refill(port_pool._get_key('net', 'proj', ['sg']))
+
+        self.pool.release_port({'id': 'p', 'network_id': 'net',
+                                'project_id': 'proj',
+                                'security_groups': ['sg']})
+
+        self.client.delete_port.assert_called_once_with('p')
+        self.assertFalse(self.client.update_port.called)
+
+    def test_reclaim(self):
+        self.client.list_ports.return_value = iter([{'ports': [
+            {'id': 'a', 'network_id': 'net', 'project_id': 'proj',
+             'security_groups': ['sg'], 'device_id': ''},
+            {'id': 'b', 'network_id': 'net', 'project_id': 'proj',
+             'security_groups': ['sg'], 'device_id': 'in-use'},
+        ]}])
+
+        self.pool.reclaim()
+
+        self.client.list_ports.assert_called_once_with(
+            retrieve_all=False, limit=mock.ANY,
+            device_owner='compute:kuryr', name='kuryr-pool-host')
+        self.assertEqual(1, self.pool.get_metrics()['reclaimed'])
+        self.assertEqual('a', self.pool.get_port('net', 'proj', ['sg'])['id'])
+
+    @mock.patch.object(port_pool.PortPool, 'start')
+    def test_get_pool(self, mock_start):
+        self.addCleanup(setattr, port_pool, '_POOL', None)
+        self.assertIsNone(port_pool.get_pool())
+        cfg.CONF.set_override('port_pool_size', 5, group='neutron')
+        cfg.CONF.set_override('port_pool_low_watermark', 8, group='neutron')
+
+        pool = port_pool.get_pool()
+
+        self.assertIs(pool, port_pool.get_pool())
+        self.assertEqual((5, 5), (pool.size, pool.low_watermark))
+        mock_start.assert_called_once_with()
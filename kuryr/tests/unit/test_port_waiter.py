@@ -0,0 +1,129 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import time
+from unittest import mock
+
+from oslo_config import cfg
+
+from kuryr.lib import exceptions
+from kuryr.lib import port_waiter
+from kuryr.tests.unit import base
+
+
+class FakeNeutron(object):
+    """Neutron client stub whose ports become ACTIVE after some polls"""
+
+    def __init__(self, polls_to_active):
+        self.polls_to_active = polls_to_active
+        self.requests = []
+
+    def list_ports(self, id, fields):
+        self.requests.append(list(id))
+        ports = []
+        for port_id in id:
+            polls = self.polls_to_active.get(port_id)
+            if polls is None:
+                continue
+            self.polls_to_active[port_id] = polls - 1
+            status = 'ACTIVE' if polls <= 1 else 'DOWN'
+            ports.append({'id': port_id, 'status': status})
+        return {'ports': ports}
+
+
+class TestPortWaiter(base.TestCase):
+    """Unit tests for the batched port waiter"""
+
+    def setUp(self):
+        super(TestPortWaiter, self).setUp()
+        self.neutron = FakeNeutron({'a': 1, 'b': 2, 'c': 1000})
+        self.waiter = port_waiter.PortWaiter(self.neutron, interval=0.01,
+                                             max_interval=0.02)
+
+    def test_wait(self):
+        inactive = self.waiter.wait(['a', 'b'], timeout=5)
+
+        self.assertEqual(set(), inactive)
+        # No more polls of a port once it is ACTIVE
+        self.assertEqual(1, sum(r.count('a') for r in self.neutron.requests))
+        self.assertEqual(2, sum(r.count('b') for r in self.neutron.requests))
+        self.assertEqual({}, self.waiter._pending)
+
+    def test_wait_batched(self):
+        self.neutron.polls_to_active = {str(i): 1 for i in range(250)}
+
+        self.assertEqual(set(), self.waiter.wait(
+            self.neutron.polls_to_active, timeout=5))
+
+        requested = [i for r in self.neutron.requests for i in r]
+        self.assertEqual(250, len(requested))
+        self.assertEqual(250, len(set(requested)))
+        self.assertLessEqual(max(len(r) for r in self.neutron.requests),
+                             port_waiter.BATCH_SIZE)
+
+    def test_watch_staggered(self):
+        self.neutron.polls_to_active = {str(i): 1000 for i in range(10)}
+        waiter = port_waiter.PortWaiter(self.neutron, interval=0.1,
+                                        max_interval=0.2)
+        start = time.monotonic()
+        for port_id in self.neutron.polls_to_active:
+            waiter.watch(port_id)
+            time.sleep(0.02)
+        elapsed = time.monotonic() - start
+        polls = waiter.polls
+        for port_id in self.neutron.polls_to_active:
+            waiter._pending.pop(port_id, None)
+
+        # New ports do not make the waiter poll more than once per tick
+        self.assertLessEqual(polls, int(elapsed / 0.1))
+
+    def test_wait_timeout(self):
+        inactive = self.waiter.wait(['a', 'c'], timeout=0.1)
+
+        self.assertEqual({'c'}, inactive)
+        self.assertNotIn('c', self.waiter._pending)
+
+    def test_wait_timeout_fatal(self):
+        cfg.CONF.set_override('vif_plugging_is_fatal', True, group='neutron')
+
+        self.assertRaises(exceptions.InactiveResourceException,
+                          self.waiter.wait, ['c'], timeout=0.1)
+
+    def test_wait_deleted(self):
+        self.assertRaises(exceptions.NoResourceException,
+                          self.waiter.wait, ['a', 'gone'], timeout=5)
+
+    def test_wait_default_timeout(self):
+        self.assertEqual(set(), self.waiter.wait(['c']))
+        self.assertEqual([], self.neutron.requests)
+
+        cfg.CONF.set_override('vif_plugging_timeout', 5, group='neutron')
+        self.assertEqual(set(), self.waiter.wait(['b']))
+
+    def test_async_wait(self):
+        async def run():
+            return await asyncio.gather(
+                self.waiter.async_wait(['a'], timeout=5),
+                self.waiter.async_wait(['b', 'c'], timeout=0.1))
+
+        self.assertEqual([set(), {'c'}], asyncio.run(run()))
+
+    @mock.patch('kuryr.lib.port_waiter.PortWaiter.wait')
+    def test_wait_for_active(self, mock_wait):
+        self.addCleanup(setattr, port_waiter, '_WAITER', None)
+        port_waiter._WAITER = None
+
+        port_waiter.wait_for_active(['a'])
+
+        mock_wait.assert_called_once_with(['a'], None)
+        self.assertIs(port_waiter.get_waiter(), port_waiter.get_waiter())
@@ -0,0 +1,234 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import threading
+from unittest import mock
+
+from kuryr.lib import singleflight
+from kuryr.tests.unit import base
+
+
+def _wait_for_waiters(future, count):
+    """Waits for count threads to block on the result of a future"""
+    while len(future._condition._waiters) < count:
+        threading.Event().wait(0.01)
+
+
+class BlockingClient(object):
+    """Neutron client stub whose reads block until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def show_network(self, network_id):
+        self.calls.append(('show_network', network_id))
+        self.started.set()
+        self.release.wait(10)
+        return {'network': {'id': network_id}}
+
+    def list_subnets(self, **filters):
+        self.calls.append(('list_subnets', filters))
+        return {'subnets': []}
+
+    def create_port(self, body):
+        self.calls.append(('create_port', body))
+        return {'port': body}
+
+
+class TestSingleFlight(base.TestCase):
+    """Unit tests for the threaded single flight"""
+
+    def test_coalesced(self):
+        flight = singleflight.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        func = mock.Mock(side_effect=lambda: (started.set(), release.wait(10),
+                                              [1])[-1])
+        results = []
+
+        def call():
+            results.append(flight.do('key', func))
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        threads[0].start()
+        started.wait(10)
+        for thread in threads[1:]:
+            thread.start()
+        _wait_for_waiters(flight._calls['key'], 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        func.assert_called_once_with()
+        self.assertEqual([[1]] * 5, results)
+        self.assertEqual({}, flight._calls)
+        flight.do('key', func)
+        self.assertEqual(2, func.call_count)
+
+    def test_leader_modifies_result(self):
+        flight = singleflight.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        modified = threading.Event()
+        func = mock.Mock(side_effect=lambda: (
+            started.set(), release.wait(10), {'port': {'name': 'a'}})[-1])
+        leader = []
+        results = []
+        deepcopy = singleflight.copy.deepcopy
+
+        def waiter_deepcopy(value):
+            # The waiters copy once the leader modified its result
+            if threading.current_thread() is not leader[0]:
+                modified.wait(10)
+            return deepcopy(value)
+
+        def lead():
+            result = flight.do('key', func)
+            result['port']['name'] = 'b'
+            result['new'] = True
+            modified.set()
+
+        def call():
+            results.append(flight.do('key', func))
+        leader.append(threading.Thread(target=lead))
+        waiters = [threading.Thread(target=call) for _ in range(3)]
+        with mock.patch.object(singleflight.copy, 'deepcopy',
+                               side_effect=waiter_deepcopy):
+            leader[0].start()
+            started.wait(10)
+            for thread in waiters:
+                thread.start()
+            _wait_for_waiters(flight._calls['key'], 3)
+            release.set()
+            for thread in leader + waiters:
+                thread.join()
+
+        self.assertEqual([{'port': {'name': 'a'}}] * 3, results)
+
+    def test_exception(self):
+        flight = singleflight.SingleFlight()
+
+        self.assertRaises(ValueError, flight.do, 'key',
+                          mock.Mock(side_effect=ValueError))
+        self.assertEqual({}, flight._calls)
+
+
+class TestAsyncSingleFlight(base.TestCase):
+    """Unit tests for the asyncio single flight"""
+
+    def test_coalesced(self):
+        flight = singleflight.AsyncSingleFlight()
+        calls = []
+
+        async def func(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return {'value': value}
+
+        async def run():
+            results = await asyncio.gather(
+                *[flight.do('key', func, i) for i in range(5)])
+            results.append(await flight.do('key', func, 5))
+            return results
+
+        results = asyncio.run(run())
+
+        self.assertEqual([0, 5], calls)
+        self.assertEqual([{'value': 0}] * 5 + [{'value': 5}], results)
+        self.assertEqual({}, flight._calls)
+
+    def test_leader_modifies_result(self):
+        flight = singleflight.AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.01)
+            return {'port': {'name': 'a'}}
+
+        async def lead():
+            result = await flight.do('key', func)
+            result['port']['name'] = 'b'
+            return result
+
+        async def run():
+            return await asyncio.gather(
+                lead(), *[flight.do('key', func) for _ in range(3)])
+
+        results = asyncio.run(run())
+
+        self.assertEqual({'port': {'name': 'b'}}, results[0])
+        self.assertEqual([{'port': {'name': 'a'}}] * 3, results[1:])
+
+
+class TestCoalescingClient(base.TestCase):
+    """Unit tests for the coalescing Neutron client"""
+
+    def setUp(self):
+        super(TestCoalescingClient, self).setUp()
+        self.client = BlockingClient()
+        self.coalescing = singleflight.CoalescingClient(self.client)
+
+    def test_reads_coalesced(self):
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(
+                self.coalescing.show_network('net')))
+            for _ in range(3)]
+        threads[0].start()
+        self.client.started.wait(10)
+        for thread in threads[1:]:
+            thread.start()
+        key = ('show_network', ('net',), ())
+        _wait_for_waiters(self.coalescing._flight._calls[key], 2)
+        self.client.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([('show_network', 'net')], self.client.calls)
+        self.assertEqual([{'network': {'id': 'net'}}] * 3, results)
+        # The waiters get copies they can change
+        self.assertEqual(2, len({id(r) for r in results[1:]}))
+
+    def test_writes_not_coalesced(self):
+        self.coalescing.create_port({'port': {}})
+        self.coalescing.create_port({'port': {}})
+
+        self.assertEqual(2, len(self.client.calls))
+
+    def test_paginated_reads_not_coalesced(self):
+        client = mock.Mock()
+        coalescing = singleflight.CoalescingClient(client)
+
+        pages = coalescing.list_ports(retrieve_all=False, limit=10)
+
+        self.assertIs(client.list_ports.return_value, pages)
+        self.assertEqual({}, coalescing._flight._calls)
+
+    def test_async_call(self):
+        self.client.release.set()
+
+        async def run():
+            return await asyncio.gather(
+                self.coalescing.async_call('list_subnets', network_id='net',
+                                           id=['a', 'b']),
+                self.coalescing.async_call('list_subnets', id=['a', 'b'],
+                                           network_id='net'),
+                self.coalescing.async_call('create_port', {}))
+
+        results = asyncio.run(run())
+
+        self.assertEqual([{'subnets': []}, {'subnets': []}, {'port': {}}],
+                         results)
+        self.assertCountEqual(
+            [('list_subnets', {'network_id': 'net', 'id': ['a', 'b']}),
+             ('create_port', {})], self.client.calls)
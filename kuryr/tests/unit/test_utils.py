@@ -10,6 +10,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import ipaddress
+import random
 from unittest import mock
 
 import ddt
@@ -18,6 +20,7 @@ import socket
 from oslo_config import cfg
 
 from kuryr.lib import config as kuryr_config
+from kuryr.lib import singleflight
 from kuryr.lib import utils
 from kuryr.tests.unit import base
 
@@ -29,6 +32,8 @@ class TestKuryrUtils(base.TestCase):
         super(TestKuryrUtils, self).setUp()
         self.fake_url = 'http://127.0.0.1:9696'
         self.fake_auth_url = 'http://127.0.0.1:5000'
+        utils.reset_neutron_clients()
+        self.addCleanup(utils.reset_neutron_clients)
 
     def test_get_subnetpool_name(self):
         fake_subnet_cidr = "10.0.0.0/16"
@@ -61,12 +66,16 @@ class TestKuryrUtils(base.TestCase):
     @mock.patch('kuryr.lib.utils.get_keystone_session')
     def test_get_neutron_client(self, mock_get_keystone_session,
                                 mock_get_auth_plugin, mock_client):
-        fake_auth = 'Fake_auth_plugin'
-        fake_session = 'Fake_session_plugin'
+        fake_auth = mock.Mock(MIN_TOKEN_LIFE_SECONDS=120)
+        fake_session = mock.Mock()
         default_conf_group = 'neutron'
+        cfg.CONF.set_override('token_refresh_margin', 300,
+                              group=default_conf_group)
+        cfg.CONF.set_override('connection_pool_size', 32,
+                              group=default_conf_group)
         mock_get_auth_plugin.return_value = fake_auth
         mock_get_keystone_session.return_value = fake_session
-        utils.get_neutron_client()
+        neutron_client = utils.get_neutron_client()
         mock_get_keystone_session.assert_called_once_with(default_conf_group,
                                                           fake_auth)
         mock_get_auth_plugin.assert_called_once_with(default_conf_group)
@@ -76,6 +85,92 @@ class TestKuryrUtils(base.TestCase):
             session=fake_session,
             endpoint_type=neutron_group.endpoint_type,
             region_name=neutron_group.region_name)
+        self.assertEqual(mock_client.return_value, neutron_client)
+        self.assertEqual(300, fake_auth.MIN_TOKEN_LIFE_SECONDS)
+        adapter = fake_session.session.mount.call_args[0][1]
+        self.assertEqual(32, adapter._pool_maxsize)
+        self.assertEqual(
+            ['https://', 'http://'],
+            [c[0][0] for c in fake_session.session.mount.call_args_list])
+
+    @mock.patch('neutronclient.v2_0.client.Client')
+    @mock.patch('kuryr.lib.utils.get_auth_plugin')
+    @mock.patch('kuryr.lib.utils.get_keystone_session')
+    def test_get_neutron_client_cached(self, mock_get_keystone_session,
+                                       mock_get_auth_plugin, mock_client):
+        mock_client.side_effect = lambda **kwargs: mock.Mock()
+
+        neutron_client = utils.get_neutron_client()
+        self.assertIs(neutron_client, utils.get_neutron_client())
+        cfg.CONF.set_override('region_name', 'RegionTwo', group='neutron')
+        other_client = utils.get_neutron_client()
+        self.assertIsNot(neutron_client, other_client)
+        utils.reset_neutron_clients()
+        cfg.CONF.clear_override('region_name', group='neutron')
+        self.assertIsNot(neutron_client, utils.get_neutron_client())
+
+        self.assertEqual(3, mock_client.call_count)
+        self.assertEqual(3, mock_get_keystone_session.call_count)
+
+    @mock.patch('neutronclient.v2_0.client.Client')
+    @mock.patch('kuryr.lib.utils.get_auth_plugin')
+    @mock.patch('kuryr.lib.utils.get_keystone_session')
+    def test_get_neutron_client_coalescing(self, mock_get_keystone_session,
+                                           mock_get_auth_plugin,
+                                           mock_client):
+        cfg.CONF.set_override('coalesce_requests', True, group='neutron')
+
+        neutron_client = utils.get_neutron_client()
+
+        self.assertIsInstance(neutron_client, singleflight.CoalescingClient)
+        self.assertIs(mock_client.return_value, neutron_client.client)
+
+    def test_iter_ports(self):
+        client = mock.Mock()
+        pages = [[{'id': 'a'}, {'id': 'b'}], [{'id': 'c'}, {'id': 'd'}], []]
+        client.list_ports.side_effect = (
+            lambda **kwargs: iter([{'ports': pages.pop(0)}]))
+
+        ports = utils.iter_ports(client, fields=['binding:host_id'],
+                                 page_size=2, device_owner='compute:kuryr')
+
+        self.assertFalse(client.list_ports.called)
+        self.assertEqual(['a', 'b', 'c', 'd'], [p['id'] for p in ports])
+        client.list_ports.assert_has_calls([
+            mock.call(retrieve_all=False, limit=2,
+                      fields=['binding:host_id', 'id'],
+                      device_owner='compute:kuryr'),
+            mock.call(retrieve_all=False, limit=2, marker='b',
+                      fields=['binding:host_id', 'id'],
+                      device_owner='compute:kuryr'),
+            mock.call(retrieve_all=False, limit=2, marker='d',
+                      fields=['binding:host_id', 'id'],
+                      device_owner='compute:kuryr')])
+
+    @mock.patch('kuryr.lib.utils.get_neutron_client')
+    def test_iter_subnets(self, mock_get_neutron_client):
+        client = mock_get_neutron_client.return_value
+        client.list_subnets.return_value = iter(
+            [{'subnets': [{'id': 'a', 'cidr': '10.0.0.0/24'}]}])
+
+        subnets = list(utils.iter_subnets(network_id='net'))
+
+        self.assertEqual([{'id': 'a', 'cidr': '10.0.0.0/24'}], subnets)
+        client.list_subnets.assert_called_once_with(
+            retrieve_all=False, limit=utils.NEUTRON_PAGE_SIZE,
+            network_id='net')
+
+    def test_iter_networks(self):
+        client = mock.Mock()
+        client.list_networks.return_value = iter([{'networks': []}])
+
+        self.assertEqual([], list(utils.iter_networks(client, fields=['id'])))
+        client.list_networks.assert_called_once_with(
+            retrieve_all=False, limit=utils.NEUTRON_PAGE_SIZE, fields=['id'])
+
+    def test_get_docker_netns_path(self):
+        self.assertEqual('/var/run/docker/netns/fake_sandbox',
+                         utils.get_docker_netns_path('fake_sandbox'))
 
     @mock.patch.object(socket, 'gethostname', return_value='fake_hostname')
     def test_get_hostname(self, mock_get_hostname):
@@ -107,3 +202,73 @@ class TestKuryrUtils(base.TestCase):
         self.assertEqual(
              fake_string_len,
              len(utils.get_random_string(fake_string_len)))
+
+
+class TestSubnetIndex(base.TestCase):
+    """Unit tests for the subnet longest prefix match index"""
+
+    def setUp(self):
+        super(TestSubnetIndex, self).setUp()
+        self.index = utils.SubnetIndex()
+        for cidr in ('10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24',
+                     '10.1.3.0/24', '2001:db8::/32', '2001:db8:1::/64'):
+            self.index.add(cidr, cidr)
+
+    def test_lookup(self):
+        self.assertEqual('10.1.2.0/24', self.index.lookup('10.1.2.3'))
+        self.assertEqual('10.1.0.0/16', self.index.lookup('10.1.4.3'))
+        self.assertEqual('10.0.0.0/8', self.index.lookup('10.2.0.1'))
+        self.assertIsNone(self.index.lookup('192.168.0.1'))
+        self.assertEqual('2001:db8:1::/64',
+                         self.index.lookup('2001:db8:1::5'))
+        self.assertEqual('2001:db8::/32', self.index.lookup('2001:db8:2::5'))
+        self.assertIsNone(self.index.lookup('::1'))
+
+    def test_get(self):
+        self.assertEqual(6, len(self.index))
+        self.assertIn('10.1.0.0/16', self.index)
+        self.assertNotIn('10.1.0.0/17', self.index)
+        self.assertNotIn('10.0.0.0/16', self.index)
+        self.assertNotIn('10.1.0.0/24', self.index)
+
+        self.index.add('10.1.0.0/16', 'replaced')
+        self.assertEqual('replaced', self.index.get('10.1.0.0/16'))
+        self.assertEqual(6, len(self.index))
+
+    def test_remove(self):
+        self.index.remove('10.1.0.0/16')
+        self.index.remove('10.1.2.0/24')
+
+        self.assertEqual(4, len(self.index))
+        self.assertEqual('10.0.0.0/8', self.index.lookup('10.1.2.3'))
+        self.assertEqual('10.1.3.0/24', self.index.lookup('10.1.3.3'))
+        self.assertRaises(KeyError, self.index.remove, '10.1.2.0/24')
+        self.assertRaises(KeyError, self.index.remove, '10.1.0.0/24')
+        self.assertRaises(KeyError, self.index.remove, '11.0.0.0/8')
+
+    def test_matches_linear_scan(self):
+        rand = random.Random(42)
+        networks = {}
+        index = utils.SubnetIndex()
+        for _ in range(300):
+            length = rand.randint(8, 30)
+            network = ipaddress.ip_network(
+                (rand.getrandbits(32) >> (32 - length) << (32 - length),
+                 length))
+            networks[network] = str(network)
+            index.add(network, str(network))
+        for network in list(networks)[::3]:
+            index.remove(network)
+            del networks[network]
+
+        self.assertEqual(len(networks), len(index))
+        addresses = [ipaddress.ip_address(rand.getrandbits(32))
+                     for _ in range(1000)]
+        addresses.extend(n.network_address + 1 for n in networks)
+        for address in addresses:
+            matches = [n for n in networks if address in n]
+            expected = (str(max(matches, key=lambda n: n.prefixlen))
+                        if matches else None)
+            self.assertEqual(expected, index.lookup(address))
+        for network in networks:
+            self.assertEqual(str(network), index.get(network))